@@ -8,7 +8,8 @@ from unified_planning.engines.action import (
     InstantaneousEndAction,
     DurativeAction,
     CombinationAction,
-    NoOpAction
+    NoOpAction,
+    freeze_actions,
 )
 from unified_planning.engines.node import (
     ANode,
@@ -16,7 +17,17 @@ from unified_planning.engines.node import (
     C_ANode,
     C_SNode,
 )
-from unified_planning.engines.state import State, CombinationState, ActionQueue, QueueNode
+from unified_planning.engines.node_store import (
+    NodeStore,
+    ArrayANode,
+    ArraySNode,
+    C_ArrayANode,
+    C_ArraySNode,
+)
+from unified_planning.engines.state import (State, CombinationState, ActionQueue, QueueNode, PredicateIndex,
+                                            BitState, CombinationBitState)
+from unified_planning.engines.successor_generator import SuccessorGenerator, MaskSuccessorGenerator
+from unified_planning.engines.outcome_cache import Outcomes, OutcomeTree, OutcomeCache
 from unified_planning.engines.mdp import MDP, combinationMDP
 from unified_planning.engines.mixins.compiler import CompilationKind
 from unified_planning.engines.engine import Engine
@@ -26,6 +37,7 @@ from unified_planning.engines.solvers.rtdp import (plan, RTDP)
 from unified_planning.engines.utils import create_init_stn, update_stn
 from unified_planning.engines.heuristics import TRPG
 from unified_planning.engines.linked_list import LinkedList, LinkedListNode
+from unified_planning.engines.interval_map import IntervalMap
 
 __all__ = [
     "Convert_problem",
@@ -45,6 +57,9 @@ __all__ = [
     "CombinationState",
     "ActionQueue",
     "QueueNode",
+    "PredicateIndex",
+    "BitState",
+    "CombinationBitState",
     "MDP",
     "combinationMDP",
     "CompilationKind",
@@ -61,5 +76,6 @@ __all__ = [
     "TRPG",
     "LinkedList",
     "LinkedListNode",
+    "IntervalMap",
 
 ]
\ No newline at end of file
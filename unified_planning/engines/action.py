@@ -19,6 +19,10 @@ from collections import OrderedDict
 class Action:
     """This is the `Action` interface."""
 
+    # set by `freeze` when the conversion of the problem is done
+    _id: Optional[int] = None
+    _hash: Optional[int] = None
+
     def __init__(
             self,
             _name: str,
@@ -55,9 +59,29 @@ class Action:
     def __hash__(self) -> int:
         raise NotImplementedError
 
+    def __getstate__(self):
+        # the hashes of the names differ between processes, the hash is cached again by `freeze`
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        return state
+
     def clone(self):
         raise NotImplementedError
 
+    def freeze(self, action_id: int):
+        """
+        Assigns to the `Action` its dense integer `id` in the converted problem and caches its hash.
+        The `Action` must not be modified afterwards.
+        """
+        self._hash = None
+        self._hash = hash(self)
+        self._id = action_id
+
+    @property
+    def id(self) -> Optional[int]:
+        """Returns the `Action` `id`, `None` if the `Action` is not frozen."""
+        return self._id
+
     @property
     def environment(self) -> Environment:
         """Returns this `Action` `Environment`."""
@@ -189,6 +213,8 @@ class implAction(Action):
             return False
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         res = hash(self._name)
         for ap in self._parameters.items():
             res += hash(ap)
@@ -350,6 +376,8 @@ class InstantaneousAction(implAction):
             return super().__eq__(oth)
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return super().__hash__()
 
     def clone(self):
@@ -405,6 +433,8 @@ class InstantaneousStartAction(InstantaneousAction):
             return False
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return super().__hash__() + hash(self._duration)
 
     def clone(self):
@@ -473,6 +503,8 @@ class InstantaneousEndAction(InstantaneousAction):
             return False
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return super().__hash__()
 
     def clone(self):
@@ -537,6 +569,8 @@ class DurativeAction(implAction):
             return False
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return super().__hash__() + hash(self._duration)
 
     def clone(self):
@@ -637,6 +671,8 @@ class CombinationAction(Action):
             return False
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         res = hash(self._name)
         for ap in self._parameters.items():
             res += hash(ap)
@@ -714,7 +750,23 @@ class NoOpAction(Action):
                     and self._parameters == oth._parameters
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         res = hash(self._name)
         for ap in self._parameters.items():
             res += hash(ap)
-        return res
\ No newline at end of file
+        return res
+
+
+def freeze_actions(actions: List[Action]):
+    """
+    Freezes the `actions` that are not frozen yet with the ids following the ids of the frozen ones,
+    the hashes of the frozen `actions` are cached again.
+    """
+    next_id = max((action.id for action in actions if action.id is not None), default=-1) + 1
+    for action in actions:
+        if action.id is None:
+            action.freeze(next_id)
+            next_id += 1
+        else:
+            action.freeze(action.id)
@@ -22,6 +22,7 @@ class Convert_problem:
         self._split_durative_actions()
         self._convert_model_engine_actions()
         self._mutex_actions()
+        up.engines.action.freeze_actions(self._converted_problem.actions)
 
     def __repr__(self) -> str:
         return self._converted_problem.__repr__()
@@ -27,6 +27,7 @@ class Convert_problem_combination:
         self._mutex_actions()
         self._combination_durative_actions()
         self._add_no_op_action()
+        up.engines.action.freeze_actions(self._converted_problem.actions)
 
     def __repr__(self) -> str:
         return self._converted_problem.__repr__()
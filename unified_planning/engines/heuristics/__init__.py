@@ -1,6 +1,11 @@
 from unified_planning.engines.heuristics.trpg import TRPG
+from unified_planning.engines.heuristics.compiled_trpg import CompiledTRPG, TRPGSummary
+from unified_planning.engines.heuristics.heuristic_cache import HeuristicCache
 
 
 __all__ = [
     "TRPG",
+    "CompiledTRPG",
+    "TRPGSummary",
+    "HeuristicCache",
 ]
\ No newline at end of file
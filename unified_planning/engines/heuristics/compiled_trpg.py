@@ -0,0 +1,515 @@
+import math
+
+import numpy as np
+import unified_planning as up
+from unified_planning.engines.heuristics.trpg import logistic_evaluate, PROBABILISTIC_MODES, MIN_PROBABILITY
+from unified_planning.exceptions import UPUsageError
+from typing import List
+from unified_planning.instrumentation import instrumented
+
+
+class TRPGSummary:
+    """
+    The first layer of the TRPG of a state: its bitmask, the amount of preconditions of each action that do not
+    hold in it and the actions whose preconditions hold. The summary of a successor state is derived from it by
+    the predicates the successor changes.
+    """
+    __slots__ = ('positive', 'unsatisfied', 'ready')
+
+    def __init__(self, positive: int, unsatisfied: List[int], ready: set):
+        self.positive = positive
+        self.unsatisfied = unsatisfied
+        self.ready = ready
+
+
+class CompiledTRPG:
+    """
+    The TRPG heuristic with the static structure of the problem compiled once per `MDP`.
+
+    The fluent universe, the preconditions and effects of every action, the start/end action pairing
+    and the durations are computed in the constructor. `get_heuristic` only keeps the per-call
+    counters, the predicates are represented as bitmasks of a `PredicateIndex`.
+    The layered semantics (and the order of the probabilistic draws) are the same as `TRPG`.
+
+    A `TRPGSummary` of the state given to `get_heuristic` replaces the scans of the actions in every layer by
+    counters of their unsatisfied preconditions, updated only by the new predicates of each layer.
+
+    `evaluate_batch` runs the layers of many states together on boolean NumPy arrays (states x fluents and
+    states x actions), so the states of a batch advance together.
+    """
+
+    def __init__(self, mdp: "up.engines.MDP", mode: str = 'sample'):
+        """
+        :param mode: the way the probabilistic effects are applied, one of `PROBABILISTIC_MODES`.
+                     The modes other than 'sample' do not draw, so the values are a function of the arguments
+        """
+        if mode not in PROBABILISTIC_MODES:
+            raise UPUsageError(f"Unknown probabilistic mode {mode} of the TRPG.")
+        self.mdp = mdp
+        self._mode = mode
+        problem = mdp.problem
+
+        # compact states of the MDP are evaluated without decoding their predicates
+        self._index = mdp.predicate_index if mdp.compact_state else up.engines.PredicateIndex()
+        self._universe = self.mask(problem.initial_values.keys())
+        self._goal = self.mask(problem.goals)
+
+        self._actions = list(problem.actions)
+        position = {action: i for i, action in enumerate(self._actions)}
+
+        self._pos_pre = [self.mask(a.pos_preconditions) for a in self._actions]
+        self._neg_pre = [self.mask(a.neg_preconditions) for a in self._actions]
+        self._add = [self.mask(a.add_effects) for a in self._actions]
+        self._del = [self.mask(a.del_effects) for a in self._actions]
+        self._probabilistic = [bool(a.probabilistic_effects) for a in self._actions]
+        # the states of the probability functions are bitmasks of the index of the MDP
+        self._bit_states = mdp.compact_state
+
+        n = len(self._actions)
+        self._is_start = [False] * n
+        self._is_end = [False] * n
+        self._end_of = [-1] * n
+        self._duration = [0] * n
+        self._in_execution = [0] * n
+        self._ends = []
+
+        inExecution = None
+        for i, action in enumerate(self._actions):
+            if isinstance(action, up.engines.InstantaneousStartAction):
+                self._is_start[i] = True
+                self._end_of[i] = position[action.end_action]
+                self._duration[i] = action.duration.lower.int_constant_value()
+
+            elif isinstance(action, up.engines.InstantaneousEndAction):
+                if inExecution is None:
+                    inExecution = problem.fluent_by_name('inExecution')
+                action_object = problem.object_by_name(f'start-{action.name[4:]}')
+                self._is_end[i] = True
+                self._duration[i] = action.start_action.duration_int()
+                self._in_execution[i] = self.mask([inExecution(action_object)])
+                self._ends.append(i)
+
+        self._start_of = [-1] * n
+        for i in range(n):
+            if self._is_start[i]:
+                self._start_of[self._end_of[i]] = i
+        # the actions with each predicate as a positive or negative precondition, by the bit of the predicate
+        self._pos_watch = self._watch(self._pos_pre)
+        self._neg_watch = self._watch(self._neg_pre)
+        # the arrays of `evaluate_batch`, built on first use over the bits of the index at that time
+        self._arrays = None
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @property
+    def deterministic(self):
+        """ `True` if the values do not depend on random draws """
+        return self._mode != 'sample' or not any(self._probabilistic)
+
+    def mask(self, predicates) -> int:
+        """ Returns the bitmask of `predicates` over the fluent universe """
+        return self._index.mask(predicates)
+
+    def predicates(self, mask: int) -> frozenset:
+        """ Returns the predicates of the bitmask `mask` """
+        return self._index.predicates(mask)
+
+    @staticmethod
+    def _watch(masks: List[int]):
+        watch = {}
+        for i, mask in enumerate(masks):
+            while mask:
+                low = mask & -mask
+                watch.setdefault(low, []).append(i)
+                mask ^= low
+        return watch
+
+    def _state_mask(self, state: "up.engines.State") -> int:
+        if isinstance(state, (up.engines.BitState, up.engines.CombinationBitState)) and state.index is self._index:
+            return state.mask
+        return self.mask(state.predicates)
+
+    def _init_earliest(self, positive: int, current_time: int, lower_bounds):
+        """ The earliest time each end action can be performed, `math.inf` if its start action is not executing """
+        earliest = {}
+        for i in self._ends:
+            if not positive & self._in_execution[i]:
+                earliest[i] = math.inf
+            elif lower_bounds is None:
+                earliest[i] = current_time
+            else:
+                earliest[i] = lower_bounds[self._actions[i]]
+        return earliest
+
+    def summary(self, state: "up.engines.State", parent: TRPGSummary = None) -> TRPGSummary:
+        """
+        Returns the `TRPGSummary` of `state`
+
+        :param parent: the summary of a state close to `state`, e.g. of its parent state node. The summary of `state`
+                       is derived from it by the predicates that differ, instead of checking every action
+        """
+        positive = self._state_mask(state)
+        universe = self._universe
+        if parent is None:
+            negative = universe & ~positive
+            unsatisfied = [(pos & ~positive).bit_count() + (neg & ~negative).bit_count()
+                           for pos, neg in zip(self._pos_pre, self._neg_pre)]
+            return TRPGSummary(positive, unsatisfied, {i for i, u in enumerate(unsatisfied) if u == 0})
+
+        unsatisfied = parent.unsatisfied.copy()
+        changed = set()
+        # the added predicates hold and are no longer negative, the deleted ones the other way around
+        for bits, sign in ((positive & ~parent.positive, -1), (parent.positive & ~positive, 1)):
+            while bits:
+                low = bits & -bits
+                for i in self._pos_watch.get(low, ()):
+                    unsatisfied[i] += sign
+                    changed.add(i)
+                if low & universe:
+                    for i in self._neg_watch.get(low, ()):
+                        unsatisfied[i] -= sign
+                        changed.add(i)
+                bits ^= low
+
+        ready = set(parent.ready)
+        for i in changed:
+            if unsatisfied[i] == 0:
+                ready.add(i)
+            else:
+                ready.discard(i)
+        return TRPGSummary(positive, unsatisfied, ready)
+
+    def _apply_probabilistic_effects(self, i, positive, negative):
+        if self._bit_states:
+            state = up.engines.BitState(positive, self._index)
+        else:
+            state = up.engines.State(self.predicates(positive))
+        if self._mode == 'sample':
+            add_predicates, del_predicates = self.mdp.apply_probabilistic_effects(state, self._actions[i])
+            return positive | self.mask(add_predicates), negative | self.mask(del_predicates)
+
+        for outcomes in self.mdp.probabilistic_outcomes(state, self._actions[i]):
+            adds, deletes, add_mask, delete_mask = outcomes.relaxed(self._mode, MIN_PROBABILITY)
+            if self._bit_states:
+                positive |= add_mask
+                negative |= delete_mask
+            else:
+                positive |= self.mask(adds)
+                negative |= self.mask(deletes)
+        return positive, negative
+
+    @instrumented('heuristic')
+    def get_heuristic(self, state: "up.engines.State", current_time: int, lower_bounds=None,
+                      summary: TRPGSummary = None):
+        """
+        Calculates the heuristic of `state` at time `current_time`
+
+        :param lower_bounds: the earliest time each executing end action can be performed,
+                            if `None` the end actions can be performed from `current_time`
+        :param summary: the `TRPGSummary` of `state`, the value is the same with or without it
+        """
+        if summary is not None:
+            return self._evaluate_summary(summary, current_time, lower_bounds)
+
+        deadline = self.mdp.deadline() if self.mdp.deadline() else math.inf
+        actions = self._actions
+        pos_pre, neg_pre = self._pos_pre, self._neg_pre
+        is_start, is_end = self._is_start, self._is_end
+        duration = self._duration
+        goal = self._goal
+
+        positive = self._state_mask(state)
+        negative = self._universe & ~positive
+        earliest = self._init_earliest(positive, current_time, lower_bounds)
+
+        t = current_time
+        new_actions = list(range(len(actions)))
+        pending = [True] * len(actions)
+        legal_probabilistic = []
+
+        while t <= deadline and positive & goal != goal:
+            positive_eps = positive
+            negative_eps = negative
+
+            for i in legal_probabilistic:
+                if is_end[i]:
+                    if earliest[i] <= t:
+                        earliest[i] = t + duration[i]
+                    else:
+                        continue
+                positive_eps, negative_eps = self._apply_probabilistic_effects(i, positive_eps, negative_eps)
+
+            remaining = []
+            for i in new_actions:
+                # end action can occur only after `earliest[i]` time
+                if is_end[i] and earliest[i] > t:
+                    remaining.append(i)
+                    continue
+
+                # Checks if the preconditions of the action are held
+                if positive & pos_pre[i] != pos_pre[i] or negative & neg_pre[i] != neg_pre[i]:
+                    remaining.append(i)
+                    continue
+
+                # Sets the time when the end action can be executed
+                if is_start[i]:
+                    end = self._end_of[i]
+                    earliest[end] = min(earliest[end], t + duration[i])
+
+                # add the effects of the action to the next state
+                negative_eps |= self._del[i]
+                positive_eps |= self._add[i]
+                pending[i] = False
+
+                if self._probabilistic[i]:
+                    positive_eps, negative_eps = self._apply_probabilistic_effects(i, positive_eps, negative_eps)
+                    legal_probabilistic.append(i)
+                    # The next time the end action can be executed is after the duration time
+                    if is_end[i]:
+                        earliest[i] = t + duration[i]
+            new_actions = remaining
+
+            # advance the time, the layers only grow so a change is a new bit
+            if positive_eps != positive or negative_eps != negative:
+                positive = positive_eps
+                negative = negative_eps
+            else:
+                endpoints = [earliest[i] for i in self._ends if pending[i] and
+                             positive & pos_pre[i] == pos_pre[i] and negative & neg_pre[i] == neg_pre[i]]
+                endpoints += [earliest[i] for i in legal_probabilistic if is_end[i]]
+                t = min(endpoints) if endpoints else math.inf
+
+        return logistic_evaluate(t, deadline)
+
+    def _evaluate_summary(self, summary: TRPGSummary, current_time: int, lower_bounds=None):
+        """
+        The layers of `get_heuristic` from the summary of the state. The actions whose preconditions hold are kept
+        in `ready` and the counters of the actions are updated by the new predicates of each layer
+        """
+        deadline = self.mdp.deadline() if self.mdp.deadline() else math.inf
+        is_start, is_end = self._is_start, self._is_end
+        duration = self._duration
+        goal = self._goal
+        universe = self._universe
+        pos_watch, neg_watch = self._pos_watch, self._neg_watch
+
+        positive = summary.positive
+        negative = universe & ~positive
+        earliest = self._init_earliest(positive, current_time, lower_bounds)
+        unsatisfied = summary.unsatisfied.copy()
+        # the actions that are not performed yet and whose preconditions hold
+        ready = set(summary.ready)
+        pending = [True] * len(self._actions)
+
+        t = current_time
+        legal_probabilistic = []
+
+        while t <= deadline and positive & goal != goal:
+            positive_eps = positive
+            negative_eps = negative
+
+            for i in legal_probabilistic:
+                if is_end[i]:
+                    if earliest[i] <= t:
+                        earliest[i] = t + duration[i]
+                    else:
+                        continue
+                positive_eps, negative_eps = self._apply_probabilistic_effects(i, positive_eps, negative_eps)
+
+            # the actions are performed in the order of `get_heuristic`
+            for i in sorted(ready):
+                # end action can occur only after `earliest[i]` time
+                if is_end[i] and earliest[i] > t:
+                    continue
+
+                # Sets the time when the end action can be executed
+                if is_start[i]:
+                    end = self._end_of[i]
+                    earliest[end] = min(earliest[end], t + duration[i])
+
+                # add the effects of the action to the next state
+                negative_eps |= self._del[i]
+                positive_eps |= self._add[i]
+                pending[i] = False
+                ready.discard(i)
+
+                if self._probabilistic[i]:
+                    positive_eps, negative_eps = self._apply_probabilistic_effects(i, positive_eps, negative_eps)
+                    legal_probabilistic.append(i)
+                    # The next time the end action can be executed is after the duration time
+                    if is_end[i]:
+                        earliest[i] = t + duration[i]
+
+            # advance the time, the layers only grow so a change is a new bit
+            if positive_eps != positive or negative_eps != negative:
+                for bits, watch in ((positive_eps & ~positive, pos_watch), (negative_eps & ~negative, neg_watch)):
+                    while bits:
+                        low = bits & -bits
+                        for i in watch.get(low, ()):
+                            unsatisfied[i] -= 1
+                            if unsatisfied[i] == 0 and pending[i]:
+                                ready.add(i)
+                        bits ^= low
+                positive = positive_eps
+                negative = negative_eps
+            else:
+                endpoints = [earliest[i] for i in ready if is_end[i]]
+                endpoints += [earliest[i] for i in legal_probabilistic if is_end[i]]
+                t = min(endpoints) if endpoints else math.inf
+
+        return logistic_evaluate(t, deadline)
+
+    def _bool_array(self, mask: int, width: int) -> np.ndarray:
+        """ Returns the boolean vector of the first `width` bits of `mask` """
+        mask &= (1 << width) - 1
+        data = np.frombuffer(mask.to_bytes((width + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(data, bitorder='little')[:width].astype(bool)
+
+    @staticmethod
+    def _int_mask(array: np.ndarray) -> int:
+        """ Returns the bitmask of the boolean vector `array` """
+        return int.from_bytes(np.packbits(array, bitorder='little').tobytes(), 'little')
+
+    def _batch_arrays(self):
+        """ The static structure of the problem as NumPy arrays, rebuilt when the index grows """
+        width = len(self._index)
+        if self._arrays is None or self._arrays['width'] != width:
+            def matrix(masks):
+                return np.array([self._bool_array(m, width) for m in masks], dtype=bool).reshape(len(masks), width)
+
+            self._arrays = dict(
+                width=width,
+                pos_pre=matrix(self._pos_pre).T.astype(np.float32),
+                neg_pre=matrix(self._neg_pre).T.astype(np.float32),
+                add=matrix(self._add).astype(np.float32),
+                delete=matrix(self._del).astype(np.float32),
+                in_execution=matrix([self._in_execution[i] for i in self._ends]).T.astype(np.float32),
+                goal=self._bool_array(self._goal, width),
+                universe=self._bool_array(self._universe, width),
+                is_start=np.array(self._is_start, dtype=bool),
+                is_end=np.array(self._is_end, dtype=bool),
+                probabilistic=np.array(self._probabilistic, dtype=bool),
+                duration=np.array(self._duration, dtype=float),
+                end_of=np.array(self._end_of),
+                start_of=np.array(self._start_of),
+            )
+        return self._arrays
+
+    @instrumented('heuristic.batch')
+    def evaluate_batch(self, states: List["up.engines.State"], current_times: List[int], lower_bounds=None):
+        """
+        Calculates the heuristic of each state of `states` at its time in `current_times`, the values are the
+        same as `get_heuristic`. The probabilistic effects are applied state by state in the order of
+        `get_heuristic`, but the draws of the states of the batch are interleaved.
+
+        :param lower_bounds: the lower bounds argument of `get_heuristic` of each state, `None` for no bounds
+        """
+        actions = self._actions
+        deadline = self.mdp.deadline() if self.mdp.deadline() else math.inf
+        size = len(states)
+        if lower_bounds is None:
+            lower_bounds = [None] * size
+
+        masks = []
+        for state in states:
+            if isinstance(state, (up.engines.BitState, up.engines.CombinationBitState)) and state.index is self._index:
+                masks.append(state.mask)
+            else:
+                masks.append(self.mask(state.predicates))
+        # the bits of the predicates that are not in the problem do not change the layers and are dropped
+        arrays = self._batch_arrays()
+        width = arrays['width']
+        positive = np.array([self._bool_array(m, width) for m in masks], dtype=bool).reshape(size, width)
+        negative = arrays['universe'] & ~positive
+
+        is_start, is_end = arrays['is_start'], arrays['is_end']
+        probabilistic, duration = arrays['probabilistic'], arrays['duration']
+        goal = arrays['goal']
+
+        t = np.array(current_times, dtype=float)
+        earliest = np.full((size, len(actions)), math.inf)
+        ends = np.array(self._ends, dtype=int)
+        if len(ends):
+            executing = ((~positive).astype(np.float32) @ arrays['in_execution']) == 0
+            for s in range(size):
+                for j, i in enumerate(ends):
+                    if executing[s, j]:
+                        earliest[s, i] = current_times[s] if lower_bounds[s] is None else lower_bounds[s][actions[i]]
+        pending = np.ones((size, len(actions)), dtype=bool)
+        legal_probabilistic = [[] for _ in range(size)]
+        zero_starts = bool((is_start & (duration == 0)).any())
+
+        while True:
+            active = (t <= deadline) & ~(goal <= positive).all(axis=1)
+            if not active.any():
+                break
+            positive_eps = positive.copy()
+            negative_eps = negative.copy()
+            # the bitmasks of the states whose probabilistic effects are applied in this layer
+            eps_masks = {}
+
+            for s in np.flatnonzero(active):
+                if not legal_probabilistic[s]:
+                    continue
+                pos_mask = self._int_mask(positive[s])
+                neg_mask = self._int_mask(negative[s])
+                for i in legal_probabilistic[s]:
+                    if is_end[i]:
+                        if earliest[s, i] <= t[s]:
+                            earliest[s, i] = t[s] + duration[i]
+                        else:
+                            continue
+                    pos_mask, neg_mask = self._apply_probabilistic_effects(i, pos_mask, neg_mask)
+                eps_masks[s] = (pos_mask, neg_mask)
+
+            # the preconditions are checked on the layer, not on the effects added in it
+            legal = (((~positive).astype(np.float32) @ arrays['pos_pre']) == 0) & \
+                    (((~negative).astype(np.float32) @ arrays['neg_pre']) == 0)
+            on_time = ~is_end | (earliest <= t[:, None])
+            applied = pending & legal & on_time & active[:, None]
+
+            # sets the time when the end actions of the applied start actions can be executed
+            rows, columns = np.nonzero(applied & is_start)
+            if len(rows):
+                np.minimum.at(earliest, (rows, arrays['end_of'][columns]), t[rows] + duration[columns])
+                if zero_starts:
+                    # an end action after its start action of duration 0 is applied in the same layer
+                    start_of = arrays['start_of']
+                    late = np.zeros_like(applied)
+                    late[:, ends] = applied[:, start_of[ends]] & (start_of[ends] < ends) & \
+                        (duration[start_of[ends]] == 0)
+                    applied |= pending & legal & late & (earliest <= t[:, None]) & active[:, None]
+
+            weights = applied.astype(np.float32)
+            positive_eps |= (weights @ arrays['add']) > 0
+            negative_eps |= (weights @ arrays['delete']) > 0
+            pending &= ~applied
+
+            for s in np.flatnonzero((applied & probabilistic).any(axis=1)):
+                pos_mask, neg_mask = eps_masks.get(s) or (self._int_mask(positive[s]), self._int_mask(negative[s]))
+                for i in np.flatnonzero(applied[s]):
+                    pos_mask |= self._add[i]
+                    neg_mask |= self._del[i]
+                    if probabilistic[i]:
+                        pos_mask, neg_mask = self._apply_probabilistic_effects(i, pos_mask, neg_mask)
+                        legal_probabilistic[s].append(i)
+                        # The next time the end action can be executed is after the duration time
+                        if is_end[i]:
+                            earliest[s, i] = t[s] + duration[i]
+                eps_masks[s] = (pos_mask, neg_mask)
+            for s, (pos_mask, neg_mask) in eps_masks.items():
+                positive_eps[s] |= self._bool_array(pos_mask, width)
+                negative_eps[s] |= self._bool_array(neg_mask, width)
+
+            # advance the time of the active states whose layer did not grow
+            changed = (positive_eps != positive).any(axis=1) | (negative_eps != negative).any(axis=1)
+            positive = positive_eps
+            negative = negative_eps
+            for s in np.flatnonzero(active & ~changed):
+                endpoints = earliest[s, ends][pending[s, ends] & legal[s, ends]]
+                endpoints = list(endpoints) + [earliest[s, i] for i in legal_probabilistic[s] if is_end[i]]
+                t[s] = min(endpoints) if endpoints else math.inf
+
+        return [logistic_evaluate(t[s].item(), deadline) for s in range(size)]
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from typing import List
+
+import unified_planning as up
+from unified_planning import instrumentation
+
+
+class HeuristicCache:
+    """
+    Bounded memo of the values of a heuristic by the state, the current time and the lower bounds of the
+    executing end actions, the least recently used value is evicted when the cache is full.
+
+    The heuristic of a problem with probabilistic effects may sample their outcomes, so the values of a heuristic
+    that is not deterministic are cached only if `probabilistic` is `True`, otherwise every call is passed to it.
+    """
+
+    def __init__(self, heuristic, size: int, probabilistic: bool = False):
+        """
+        :param heuristic: the heuristic, e.g. a `CompiledTRPG`, it tells if its values are `deterministic`
+        :param size: the maximal amount of cached values
+        :param probabilistic: if `True` the values of a heuristic that samples probabilistic effects are cached too
+        """
+        assert size > 0, "the size of the heuristic cache must be positive"
+        self.heuristic = heuristic
+        self._size = size
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._enabled = probabilistic or heuristic.deterministic
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @property
+    def hit_rate(self) -> float:
+        """ The fraction of the cached calls whose value was in the cache """
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    @property
+    def deterministic(self):
+        return self.heuristic.deterministic
+
+    def summary(self, state: "up.engines.State", parent=None):
+        """ The summary of `state` of the heuristic, it is not cached """
+        return self.heuristic.summary(state, parent)
+
+    def get_heuristic(self, state: "up.engines.State", current_time: int, lower_bounds=None, summary=None):
+        """ The value of `heuristic.get_heuristic` with the same arguments """
+        if not self._enabled:
+            return self.heuristic.get_heuristic(state, current_time, lower_bounds, summary)
+
+        key = (state, current_time, frozenset(lower_bounds.items()) if lower_bounds is not None else None)
+        values = self._values
+        value = values.get(key)
+        if value is not None:
+            values.move_to_end(key)
+            self.hits += 1
+            instrumentation.count('heuristic_cache.hits')
+            return value
+
+        self.misses += 1
+        instrumentation.count('heuristic_cache.misses')
+        value = self.heuristic.get_heuristic(state, current_time, lower_bounds, summary)
+        values[key] = value
+        if len(values) > self._size:
+            values.popitem(last=False)
+        return value
+
+    def evaluate_batch(self, states: List["up.engines.State"], current_times: List[int], lower_bounds=None):
+        """ The values of `heuristic.evaluate_batch` with the same arguments, only the missing values are evaluated """
+        if not self._enabled:
+            return self.heuristic.evaluate_batch(states, current_times, lower_bounds)
+
+        if lower_bounds is None:
+            lower_bounds = [None] * len(states)
+        values = self._values
+        keys = [(state, current_time, frozenset(bounds.items()) if bounds is not None else None)
+                for state, current_time, bounds in zip(states, current_times, lower_bounds)]
+        result = [None] * len(keys)
+        missing = {}
+        for j, key in enumerate(keys):
+            value = values.get(key)
+            if value is not None:
+                values.move_to_end(key)
+                self.hits += 1
+                instrumentation.count('heuristic_cache.hits')
+                result[j] = value
+            else:
+                # the equal states of the batch are evaluated once
+                missing.setdefault(key, []).append(j)
+
+        if missing:
+            repeated = len(keys) - len(missing) - sum(value is not None for value in result)
+            self.hits += repeated
+            self.misses += len(missing)
+            instrumentation.count('heuristic_cache.hits', repeated)
+            instrumentation.count('heuristic_cache.misses', len(missing))
+            firsts = [positions[0] for positions in missing.values()]
+            evaluated = self.heuristic.evaluate_batch([states[j] for j in firsts], [current_times[j] for j in firsts],
+                                                      [lower_bounds[j] for j in firsts])
+            for (key, positions), value in zip(missing.items(), evaluated):
+                for j in positions:
+                    result[j] = value
+                values[key] = value
+                if len(values) > self._size:
+                    values.popitem(last=False)
+        return result
+
+    def clear(self):
+        """ Drops the cached values, the hit rate is kept """
+        self._values.clear()
@@ -3,12 +3,40 @@ import math
 import unified_planning as up
 from typing import Dict
 import numpy as np
+from unified_planning.exceptions import UPUsageError
+
+# The ways the heuristic applies the probabilistic effects: 'sample' draws an outcome each time an effect fires,
+# 'all' applies all the outcomes of probability at least `MIN_PROBABILITY` and 'most_likely' the most likely one
+PROBABILISTIC_MODES = ('sample', 'all', 'most_likely')
+MIN_PROBABILITY = 0.01
+
+
+def logistic_evaluate(t, deadline):
+    if t > deadline:
+        return 0
+    if t == 0:
+        return 1
+
+    c = 1
+    D_tag = deadline + c
+    z1 = math.log(t/(D_tag - t))
+    a1 = -0.5
+    a0 = 1
+    z2 = a1*z1 + a0
+    p = 1/(1+math.exp(-z2))
+    return p
 
 
 class TRPG:
 
-    def __init__(self, mdp: "up.engines.MDP", state: "up.engines.State", current_time: int):
+    def __init__(self, mdp: "up.engines.MDP", state: "up.engines.State", current_time: int, mode: str = 'sample'):
+        """
+        :param mode: the way the probabilistic effects are applied, one of `PROBABILISTIC_MODES`
+        """
+        if mode not in PROBABILISTIC_MODES:
+            raise UPUsageError(f"Unknown probabilistic mode {mode} of the TRPG.")
         self.mdp = mdp
+        self.mode = mode
         self.negative = set(mdp.problem.initial_values.keys()).difference(state.predicates)
         self.positive = set(state.predicates)
         self.new_actions = []
@@ -88,25 +116,17 @@ class TRPG:
         return self.deadline - t + 10 if t <= self.deadline else 0
 
     def logistic_evaluate(self, t):
-        if t > self.deadline:
-            return 0
-        if t == 0:
-            return 1
-
-        c = 1
-        D_tag = self.deadline + c
-        z1 = math.log(t/(D_tag - t))
-        a1 = -0.5
-        a0 = 1
-        z2 = a1*z1 + a0
-        p = 1/(1+math.exp(-z2))
-        return p
+        return logistic_evaluate(t, self.deadline)
 
 
 
     def add_probabilistic_effects(self, action, negative_eps, positive_eps):
         state = up.engines.State(positive_eps)
-        add_predicates, del_predicates = self.mdp.apply_probabilistic_effects(state, action)
+        if self.mode == 'sample':
+            add_predicates, del_predicates = self.mdp.apply_probabilistic_effects(state, action)
+        else:
+            add_predicates, del_predicates = self.mdp.relaxed_probabilistic_effects(state, action, self.mode,
+                                                                                    MIN_PROBABILITY)
         negative_eps.update(del_predicates)
         positive_eps.update(add_predicates)
 
@@ -0,0 +1,171 @@
+import math
+import operator
+from bisect import bisect_left, bisect_right
+from typing import Callable, Optional
+
+from unified_planning.engines.linked_list import LinkedListNode
+from unified_planning.instrumentation import instrumented
+
+
+class IntervalMap:
+    """
+    The values of disjoint closed intervals in the sorted arrays of their lower bounds, upper bounds and values.
+    It splits the intervals with epsilon separated bounds as `LinkedList` does and holds the same intervals and
+    values after the same updates, but the intervals an update or a query intersects are found by bisection,
+    and only these intervals are visited and replaced.
+    """
+
+    def __init__(self, epsilon: float = 0.001):
+        self.epsilon = epsilon
+        self._lowers = []
+        self._uppers = []
+        self._values = []
+        self._max_value = -math.inf
+        self._max_interval = (0, math.inf)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        """ Iterates over the (lower bound, upper bound, value) of the intervals in increasing order """
+        return zip(self._lowers, self._uppers, self._values)
+
+    @property
+    def max_value(self):
+        return self._max_value
+
+    @property
+    def max_interval(self):
+        return self._max_interval
+
+    def _intersecting(self, lower, upper):
+        """ The range [i, j) of the intervals that intersect the interval between `lower` and `upper` """
+        return bisect_left(self._uppers, lower), bisect_right(self._lowers, upper)
+
+    def interval_value(self, lower, upper) -> Optional[LinkedListNode]:
+        """ Returns the value of the intervals between the lower and upper bound
+
+        returns:  node -
+                  The sub_intervals of the interval between the lower and upper bound with corresponding values
+        """
+        i, j = self._intersecting(lower, upper)
+        head = node = None
+        for k in range(i, j):
+            if lower > upper:
+                break
+            current = LinkedListNode(max(lower, self._lowers[k]), min(upper, self._uppers[k]), self._values[k])
+            if head is None:
+                head = current
+            else:
+                node.next = current
+            node = current
+            lower = self._uppers[k] + self.epsilon
+        return head
+
+    def max_value_interval(self, lower, upper):
+        """
+        The maximal value of the intervals between the lower and upper bound and the first interval with it
+
+        :return: the value and the bounds of the interval, `None` if no interval is between the bounds
+        """
+        i, j = self._intersecting(lower, upper)
+        if i >= j:
+            return None
+        k = max(range(i, j), key=self._values.__getitem__)
+        return self._values[k], max(lower, self._lowers[k]), min(upper, self._uppers[k])
+
+    @instrumented('interval_map.update')
+    def update(self, lower_bound, upper_bound, value):
+        """ Adds `value` to the interval between `lower_bound` and `upper_bound`, as `LinkedList.update` does """
+        self._apply(lower_bound, upper_bound, value, operator.add)
+
+    @instrumented('interval_map.max_update')
+    def max_update(self, lower_bound, upper_bound, value):
+        """ Raises the values of the interval between `lower_bound` and `upper_bound` to at least `value` """
+        self._apply(lower_bound, upper_bound, value, max)
+
+    def update_max_value(self, lower_bound, upper_bound, value_candidate):
+        """
+        Works only if the rewards are not negative
+        update the max_value according to the added interval
+        """
+        if self._max_value < value_candidate:
+            self._max_value = value_candidate
+            self._max_interval = lower_bound, upper_bound
+
+    def _apply(self, lower_bound, upper_bound, value, combine: Callable):
+        """
+        Combines the values of the intervals between `lower_bound` and `upper_bound` with `value`,
+        the parts of the interval that no interval covers get `value`.
+        The intersecting intervals are split in the same pieces and order as in `LinkedList.update`.
+        """
+        lowers, uppers, values = self._lowers, self._uppers, self._values
+        epsilon = self.epsilon
+        i, j = self._intersecting(lower_bound, upper_bound)
+        if i >= j:
+            # no interval intersects, the interval is inserted as is
+            lowers.insert(i, lower_bound)
+            uppers.insert(i, upper_bound)
+            values.insert(i, value)
+            self.update_max_value(lower_bound, upper_bound, value)
+            return
+
+        new_lowers, new_uppers, new_values = [], [], []
+        end = j
+        for k in range(i, j):
+            current_lower, current_upper, current_value = lowers[k], uppers[k], values[k]
+            if current_upper < lower_bound:
+                new_lowers.append(current_lower)
+                new_uppers.append(current_upper)
+                new_values.append(current_value)
+                continue
+
+            if current_lower == lower_bound and current_upper == upper_bound:
+                combined = combine(current_value, value)
+                new_lowers.append(current_lower)
+                new_uppers.append(current_upper)
+                new_values.append(combined)
+                self.update_max_value(lower_bound, upper_bound, combined)
+                end = k + 1
+                break
+
+            common_lower = max(lower_bound, current_lower)
+            common_upper = min(upper_bound, current_upper)
+            combined = combine(current_value, value)
+            self.update_max_value(common_lower, common_upper, combined)
+
+            # the part before the intersection, of the current interval or of the uncovered interval
+            if current_lower < common_lower:
+                new_lowers.append(current_lower)
+                new_uppers.append(common_lower - epsilon)
+                new_values.append(current_value)
+            elif lower_bound < common_lower:
+                new_lowers.append(lower_bound)
+                new_uppers.append(common_lower - epsilon)
+                new_values.append(value)
+
+            new_lowers.append(common_lower)
+            new_uppers.append(common_upper)
+            new_values.append(combined)
+
+            lower_bound = common_upper + epsilon
+            if current_upper > common_upper:
+                # the part after the intersection of the current interval
+                new_lowers.append(lower_bound)
+                new_uppers.append(current_upper)
+                new_values.append(current_value)
+                end = k + 1
+                break
+            if upper_bound <= common_upper:
+                end = k + 1
+                break
+        else:
+            # the part after the last intersecting interval
+            new_lowers.append(lower_bound)
+            new_uppers.append(upper_bound)
+            new_values.append(value)
+            self.update_max_value(lower_bound, upper_bound, value)
+
+        lowers[i:end] = new_lowers
+        uppers[i:end] = new_uppers
+        values[i:end] = new_values
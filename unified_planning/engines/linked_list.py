@@ -2,6 +2,7 @@ from typing import Optional
 import math
 
 from unified_planning.engines import node
+from unified_planning.instrumentation import instrumented
 
 
 class LinkedListNode:
@@ -116,6 +117,7 @@ class LinkedList:
 
         return node
 
+    @instrumented('linked_list.update')
     def update(self, lower_bound, upper_bound, value):
         """updates the value of the list according to the lower_bound and upper_bound
         param lower_bound: lower bound of the interval to update
@@ -2,23 +2,206 @@ from typing import List
 
 import unified_planning as up
 import numpy as np
+import random
 from unified_planning.exceptions import UPPreconditionDonHoldException
+from unified_planning.instrumentation import instrumented
 from itertools import product
 
 
 class MDP:
-    def __init__(self, problem: "up.model.problem.Preoblem", discount_factor: float):
+    def __init__(self, problem: "up.model.problem.Preoblem", discount_factor: float, compact_state: bool = False,
+                 intern_states: bool = False, heuristic_cache: int = 0, cache_probabilistic: bool = False,
+                 probabilistic_mode: str = 'sample'):
+        """
+        :param compact_state: if `True` the states are `BitState`s, the grounded predicates are mapped to bits
+                              and the preconditions and effects of the actions are compiled to bitmasks
+        :param intern_states: if `True` the states created by the MDP are kept in a pool,
+                              so equal states are the same object
+        :param heuristic_cache: the size of the `HeuristicCache` of the TRPG heuristic, `0` for no cache
+        :param cache_probabilistic: if `True` the heuristic values of a problem with probabilistic effects
+                                    are cached too, although the heuristic samples the outcomes of the effects
+        :param probabilistic_mode: the way the TRPG heuristic applies the probabilistic effects,
+                                   one of `heuristics.trpg.PROBABILISTIC_MODES`
+        """
         self._problem = problem
         self._discount_factor = discount_factor
+        # the actions of problems loaded from older pickles are frozen here
+        up.engines.freeze_actions(problem.actions)
+        self._actions_by_id = {action.id: action for action in problem.actions}
+        self._trpg = None
+        self._heuristic_cache = heuristic_cache
+        self._cache_probabilistic = cache_probabilistic
+        self._probabilistic_mode = probabilistic_mode
+        self._index = None
+        self._states = {} if intern_states else None
+        self._in_execution = None
+        # the compiled (required, forbidden) predicates of `check_action_relevant`, by action,
+        # so an action of another problem with the same id is not mistaken for an action of this problem
+        self._relevance = {action: self._compile_relevance(action) for action in problem.actions}
+        # the global generators are used until the MDP is seeded
+        self._random = random
+        self._np_random = np.random
+        if compact_state:
+            self._compile_masks()
+        else:
+            self._compile_successor_generator()
+        self._outcome_cache = up.engines.OutcomeCache(self._index)
 
     @property
     def problem(self):
         return self._problem
 
+    def action(self, action_id: int):
+        """ Returns the action of the problem with the id `action_id` """
+        return self._actions_by_id[action_id]
+
+    @property
+    def random(self):
+        """ The generator of the random choices of the solvers, has the interface of the `random` module """
+        return self._random
+
+    @property
+    def np_random(self):
+        """ The generator of the outcomes of the probabilistic effects """
+        return self._np_random
+
+    def seed(self, seed: int):
+        """ Replaces the global generators by generators seeded with `seed`, so the runs are reproducible """
+        self._random = random.Random(seed)
+        self._np_random = np.random.default_rng(seed)
+
+    @property
+    def trpg(self):
+        """
+        The compiled TRPG heuristic of the problem, built on first use.
+        It is wrapped in a `HeuristicCache` if the MDP has a heuristic cache.
+        """
+        if self._trpg is None:
+            self._trpg = up.engines.heuristics.CompiledTRPG(self, self._probabilistic_mode)
+            if self._heuristic_cache:
+                self._trpg = up.engines.heuristics.HeuristicCache(self._trpg, self._heuristic_cache,
+                                                                  self._cache_probabilistic)
+        return self._trpg
+
+    @property
+    def intern_states(self):
+        return self._states is not None
+
+    def state_key(self, state: "up.engines.State"):
+        """ The key of `state` in the pool of states """
+        return state
+
+    def intern(self, state: "up.engines.State"):
+        """ Returns the state of the pool equal to `state`, `state` is added to the pool if there is none """
+        if self._states is None:
+            return state
+        return self._states.setdefault(self.state_key(state), state)
+
+    def clear_states(self):
+        """ Empties the pool of states, the states created afterwards are not identical to the earlier ones """
+        if self._states is not None:
+            self._states.clear()
+
     @property
     def discount_factor(self):
         return self._discount_factor
 
+    @property
+    def compact_state(self):
+        return self._index is not None
+
+    @property
+    def predicate_index(self):
+        """ The `PredicateIndex` of the states, `None` if the states are not compact """
+        return self._index
+
+    def _compile_masks(self):
+        """
+        Maps the grounded predicates to bits and compiles for each action the bitmasks of
+        its preconditions, effects and of the predicates checked by `check_action_relevant`
+        """
+        self._index = up.engines.PredicateIndex(self.problem.initial_values.keys())
+        self._goal_mask = self._index.mask(self.problem.goals)
+        self._masks = {}
+        self._legal_masks = []
+
+        for action in self.problem.actions:
+            masks = self._action_masks(action)
+
+            if isinstance(action, up.engines.NoOpAction):
+                continue
+
+            relevant = self._relevance[action]
+            if relevant is not None:
+                relevant = (self._index.mask(relevant[0]), self._index.mask(relevant[1]))
+
+            self._legal_masks.append((action, masks[0], masks[1], relevant))
+
+        self._successor_generator = up.engines.MaskSuccessorGenerator(
+            [(pos, neg) for _, pos, neg, _ in self._legal_masks])
+
+    def _compile_successor_generator(self):
+        """ Compiles the preconditions of the actions, except the no-op action, to a `SuccessorGenerator` """
+        self._successor_actions = [action for action in self.problem.actions
+                                   if not isinstance(action, up.engines.NoOpAction)]
+        self._successor_generator = up.engines.SuccessorGenerator(
+            [(action.pos_preconditions, action.neg_preconditions) for action in self._successor_actions])
+        self._successor_relevance = [self._relevance[action] for action in self._successor_actions]
+
+    def _compile_relevance(self, action: "up.engines.action.Action"):
+        """
+        Returns the predicates (required, forbidden) of the relevance check of the start action `action`,
+        `None` if `action` is not a start action. A start action is not relevant in a state where all its
+        required predicates, its (non inExecution) add effects and the add and probabilistic effects of its
+        end action, hold and none of its forbidden predicates, the delete effects of its end action, hold
+        """
+        if not isinstance(action, up.engines.InstantaneousStartAction):
+            return None
+
+        if self._in_execution is None:
+            self._in_execution = self.problem.fluent_by_name('inExecution')
+        required = {e for e in action.add_effects if e._content.payload != self._in_execution}
+        end_action = action.end_action
+        required |= end_action.add_effects
+        for pe in end_action.probabilistic_effects:
+            required.update(pe.fluents)
+        return frozenset(required), frozenset(end_action.del_effects)
+
+    def _action_masks(self, action: "up.engines.action.Action"):
+        """
+        Returns the bitmasks (positive preconditions, negative preconditions, add effects, delete effects,
+        inExecution predicates) of `action`, the masks are compiled on the first call
+        """
+        entry = self._masks.get(id(action))
+        if entry is None:
+            if isinstance(action, (up.engines.DurativeAction, up.engines.CombinationAction)):
+                in_execution_mask = self._index.mask(action.inExecution)
+            else:
+                in_execution_mask = 0
+
+            # combination and no-op actions have no effects of their own
+            masks = tuple(self._index.mask(getattr(action, name, ())) for name in
+                          ('pos_preconditions', 'neg_preconditions', 'add_effects', 'del_effects'))
+            # the action is kept in the entry so its id is not reused
+            entry = (action, masks + (in_execution_mask,))
+            self._masks[id(action)] = entry
+        return entry[1]
+
+    def _update_mask(self, state: "up.engines.State", mask: int, action: "up.engines.action.Action"):
+        """ The bitmask version of `update_predicate` """
+        _, _, add, delete, _ = self._action_masks(action)
+        mask = (mask | add) & ~delete
+
+        add_mask = 0
+        del_mask = 0
+        np_random = self.np_random
+        for outcomes in self._outcome_cache.outcomes(state, action):
+            index = outcomes.sample(np_random.random())
+            add_mask |= outcomes.add_masks[index]
+            del_mask |= outcomes.delete_masks[index]
+
+        return (mask | add_mask) & ~del_mask
+
     def deadline(self):
         return self.problem.deadline
 
@@ -29,7 +212,9 @@ class MDP:
         """
         predicates = self.problem.initial_values
         pos_predicates = set([key for key, value in predicates.items() if value.bool_constant_value()])
-        return up.engines.State(pos_predicates)
+        if self._index is not None:
+            return self.intern(up.engines.BitState(self._index.mask(pos_predicates), self._index))
+        return self.intern(up.engines.State(pos_predicates))
 
     def is_terminal(self, state: "up.engines.state.State"):
         """
@@ -39,8 +224,11 @@ class MDP:
         :return: True is the `state` is a terminal state, False otherwise
         """
 
+        if self._index is not None:
+            return state.mask & self._goal_mask == self._goal_mask
         return self.problem.goals.issubset(state.predicates)
 
+    @instrumented('mdp.legal_actions')
     def legal_actions(self, state: "up.engines.state.State"):
         """
         If the positive preconditions of an action are true in the state
@@ -51,15 +239,33 @@ class MDP:
         :return: the legal actions that can be preformed in the state `state`
         """
 
+        if self._index is not None:
+            return self._legal_actions_mask(state.mask)
+
         legal_actions = []
-        for action in self.problem.actions:
-            if isinstance(action, up.engines.NoOpAction):
-               continue
-            if action.pos_preconditions.issubset(state.predicates) and \
-                    action.neg_preconditions.isdisjoint(state.predicates):
-                if self.check_action_relevant(state, action):
-                    # prone action that don't add new effects
-                    legal_actions.append(action)
+        actions = self._successor_actions
+        relevance = self._successor_relevance
+        predicates = state.predicates
+        for i in self._successor_generator.applicable(predicates):
+            relevant = relevance[i]
+            # prone action that don't add new effects
+            if relevant is not None and relevant[0] <= predicates and relevant[1].isdisjoint(predicates):
+                continue
+            legal_actions.append(actions[i])
+
+        return legal_actions
+
+    def _legal_actions_mask(self, mask: int):
+        """ The bitmask version of `legal_actions` """
+        legal_actions = []
+        legal_masks = self._legal_masks
+        for i in self._successor_generator.applicable(mask):
+            action, _, _, relevant = legal_masks[i]
+            if relevant is not None:
+                required, forbidden = relevant
+                if mask & required == required and not mask & forbidden:
+                    continue
+            legal_actions.append(action)
 
         return legal_actions
 
@@ -73,13 +279,18 @@ class MDP:
 
         return new_preds
 
+    @instrumented('mdp.step')
     def step(self, state: "up.engines.State", action: "up.engines.action.Action"):
         """
                Apply the action to this state to produce the next state.
         """
-        new_preds = set(state.predicates)
-        new_preds = self.update_predicate(state, new_preds, action)
-        next_state = up.engines.State(new_preds)
+        if self._index is not None:
+            next_state = up.engines.BitState(self._update_mask(state, state.mask, action), self._index)
+        else:
+            new_preds = set(state.predicates)
+            new_preds = self.update_predicate(state, new_preds, action)
+            next_state = up.engines.State(new_preds)
+        next_state = self.intern(next_state)
 
         terminal = self.is_terminal(next_state)
         relevant_reward = 0
@@ -94,41 +305,18 @@ class MDP:
         return terminal, next_state, reward
 
     def check_action_relevant(self, state: "up.engines.State", action):
-        if not isinstance(action, up.engines.InstantaneousStartAction):
+        """ Returns False if `action` is a start action that adds no new effect in `state` """
+        relevant = self._relevance.get(action)
+        if relevant is None and action not in self._relevance:
+            relevant = self._compile_relevance(action)
+        if relevant is None:
             return True #-1
 
-        add = action.add_effects.copy()
-        # Remove inExecution - this is not considered new effect
-        for add_effect in add.copy():
-            if add_effect._content.payload == self.problem.fluent_by_name('inExecution'):
-                add.remove(add_effect)
-
-        not_relevant = add.issubset(state.predicates)
-        # not_relevant &= action.del_effects.isdisjoint(state.predicates)
-        not_relevant &= action.end_action.add_effects.issubset(state.predicates)
-        not_relevant &= action.end_action.del_effects.isdisjoint(state.predicates)
-        for pe in action.end_action.probabilistic_effects:
-            not_relevant = not_relevant & set(pe.fluents).issubset(state.predicates)
-
-        if not_relevant:
+        required, forbidden = relevant
+        if required <= state.predicates and forbidden.isdisjoint(state.predicates):
             return False #-50
         return True #-1
 
-    def probabilistic_effects(self, prob_outcomes, index):
-        """ Gets the add and delete effect of the prob_outcome index effect"""
-        add_predicates = set()
-        del_predicates = set()
-
-        probability = list(prob_outcomes.keys())[index]
-        values = list(prob_outcomes.values())[index]
-        for v in values:
-            if values[v]:
-                add_predicates.add(v)
-            else:
-                del_predicates.add(v)
-
-        return probability, add_predicates, del_predicates
-
     def apply_probabilistic_effects(self, state: "up.engines.State", action: "up.engines.Action"):
         """
 
@@ -138,22 +326,44 @@ class MDP:
         add_predicates = set()
         del_predicates = set()
 
-        for pe in action.probabilistic_effects:
-            prob_outcomes = pe.probability_function(state, None)
-            if prob_outcomes:
-                index = np.random.choice(len(prob_outcomes), p=list(prob_outcomes.keys()))
+        # the outcomes are compiled once for the predicates the probability functions test,
+        # and an outcome is drawn from one uniform sample as `np_random.choice` would draw it
+        np_random = self.np_random
+        for outcomes in self._outcome_cache.outcomes(state, action):
+            index = outcomes.sample(np_random.random())
+            add_predicates.update(outcomes.adds[index])
+            del_predicates.update(outcomes.deletes[index])
 
-                _, add, delete = self.probabilistic_effects(prob_outcomes, index)
+        return add_predicates, del_predicates
+
+    def probabilistic_outcomes(self, state: "up.engines.State", action: "up.engines.Action"):
+        """ The compiled `Outcomes` of the probabilistic effects of `action` in `state`, except the empty ones """
+        return self._outcome_cache.outcomes(state, action)
 
-                add_predicates.update(add)
-                del_predicates.update(delete)
+    def relaxed_probabilistic_effects(self, state: "up.engines.State", action: "up.engines.Action", mode: str,
+                                      min_probability: float = 0.0):
+        """
+        The effects of the outcomes of the probabilistic effects of `action` kept by the relaxation `mode`
+        of `Outcomes.relaxed`, no outcome is drawn
 
+        :return: the predicates that needs to be added and removed from the state
+        """
+        add_predicates = set()
+        del_predicates = set()
+        for outcomes in self._outcome_cache.outcomes(state, action):
+            adds, deletes, _, _ = outcomes.relaxed(mode, min_probability)
+            add_predicates.update(adds)
+            del_predicates.update(deletes)
         return add_predicates, del_predicates
 
 
 class combinationMDP(MDP):
-    def __init__(self, problem: "up.model.problem.Problem", discount_factor: float):
-        super().__init__(problem, discount_factor)
+    def __init__(self, problem: "up.model.problem.Problem", discount_factor: float, compact_state: bool = False,
+                 intern_states: bool = False, heuristic_cache: int = 0, cache_probabilistic: bool = False,
+                 probabilistic_mode: str = 'sample'):
+        super().__init__(problem, discount_factor, compact_state, intern_states, heuristic_cache,
+                         cache_probabilistic, probabilistic_mode)
+        self._noop = None
 
     def initial_state(self):
         """
@@ -162,7 +372,19 @@ class combinationMDP(MDP):
         """
         predicates = self.problem.initial_values
         pos_predicates = set([key for key, value in predicates.items() if value.bool_constant_value()])
-        return up.engines.CombinationState(pos_predicates)
+        if self._index is not None:
+            return self.intern(up.engines.CombinationBitState(self._index.mask(pos_predicates), self._index))
+        return self.intern(up.engines.CombinationState(pos_predicates))
+
+    def state_key(self, state: "up.engines.CombinationState"):
+        # the current time is not part of the equality of combination states
+        return state, state.current_time
+
+    def _combination_state(self, predicates, active_actions: "up.engines.ActionQueue", current_time: int):
+        """ Creates the next state from `predicates`, a bitmask when the states are compact """
+        if self._index is not None:
+            return self.intern(up.engines.CombinationBitState(predicates, self._index, active_actions, current_time))
+        return self.intern(up.engines.CombinationState(predicates, active_actions, current_time))
 
     def is_terminal(self, state: "up.engines.state.CombinationState"):
         """
@@ -174,6 +396,7 @@ class combinationMDP(MDP):
         """
         return super().is_terminal(state) #and not state.is_active_actions  TODO: decide if we allow or not active actions
 
+    @instrumented('mdp.step')
     def step(self, state: "up.engines.CombinationState", action: "up.engines.action.Action"):
         """
                Apply the action to this state to produce the next state.
@@ -193,7 +416,8 @@ class combinationMDP(MDP):
 
         """
 
-        new_preds = set(state.predicates)
+        compact = self._index is not None
+        new_preds = state.mask if compact else set(state.predicates)
         new_active_actions = state.active_actions.clone()
         current_time = state.current_time
 
@@ -204,13 +428,13 @@ class combinationMDP(MDP):
         else:
             if isinstance(action, up.engines.DurativeAction):
                 new_active_actions.add_action(up.engines.QueueNode(action, action.duration.lower.int_constant_value()))
-                new_preds |= action.inExecution
+                new_preds |= self._action_masks(action)[4] if compact else action.inExecution
 
             elif isinstance(action, up.engines.CombinationAction):
                 for a in action.actions:
                     new_active_actions.add_action(up.engines.QueueNode(a, a.duration.lower.int_constant_value()))
 
-                new_preds |= action.inExecution
+                new_preds |= self._action_masks(action)[4] if compact else action.inExecution
 
             delta, actions_to_perform = new_active_actions.get_next_actions()
 
@@ -220,9 +444,12 @@ class combinationMDP(MDP):
 
         # update the predicates according to the actions needs to be preformed
         for a in actions_to_perform:
-            new_preds = super().update_predicate(state, new_preds, a)
+            if compact:
+                new_preds = self._update_mask(state, new_preds, a)
+            else:
+                new_preds = super().update_predicate(state, new_preds, a)
 
-        next_state = up.engines.CombinationState(new_preds, new_active_actions, current_time)
+        next_state = self._combination_state(new_preds, new_active_actions, current_time)
 
         terminal = self.is_terminal(next_state)
 
@@ -236,6 +463,9 @@ class combinationMDP(MDP):
 
     def transition_function(self, state: "up.engines.State", action: "up.engines.Action"):
 
+        if self._index is not None:
+            return self._transition_function_mask(state, action)
+
         new_preds_init = set(state.predicates)
         new_active_actions = state.active_actions.clone()
         current_time = state.current_time
@@ -273,41 +503,78 @@ class combinationMDP(MDP):
             new_preds = new_preds_init.copy()
             new_preds |= prob['add']
             new_preds -= prob['delete']
-            next_state = up.engines.CombinationState(new_preds, new_active_actions, current_time)
+            next_state = self.intern(up.engines.CombinationState(new_preds, new_active_actions, current_time))
+            transition.append((next_state, prob['probability']))
+
+        return transition
+
+    def _transition_function_mask(self, state: "up.engines.CombinationBitState", action: "up.engines.Action"):
+        """ The bitmask version of `transition_function` """
+        new_preds_init = state.mask
+        new_active_actions = state.active_actions.clone()
+        current_time = state.current_time
+
+        if isinstance(action, up.engines.InstantaneousAction):
+            _, _, add, delete, _ = self._action_masks(action)
+            new_preds_init = (new_preds_init | add) & ~delete
+            actions_to_perform = [action]
+
+        # Deals with no-op, durative actions and combination actions
+        else:
+            if isinstance(action, up.engines.DurativeAction):
+                new_active_actions.add_action(up.engines.QueueNode(action, action.duration.lower.int_constant_value()))
+                new_preds_init |= self._action_masks(action)[4]
+
+            elif isinstance(action, up.engines.CombinationAction):
+                for a in action.actions:
+                    new_active_actions.add_action(up.engines.QueueNode(a, a.duration.lower.int_constant_value()))
+
+                new_preds_init |= self._action_masks(action)[4]
+
+            delta, actions_to_perform = new_active_actions.get_next_actions()
+
+            for a in actions_to_perform:
+                _, _, add, delete, _ = self._action_masks(a)
+                new_preds_init = (new_preds_init | add) & ~delete
+
+            if delta != -1:
+                new_active_actions.update_delta(delta)
+                current_time += delta
+
+        probs = self.all_probabilistic_effects(state, actions_to_perform)
+        transition = []
+        for prob in probs:
+            new_preds = (new_preds_init | self._index.mask(prob['add'])) & ~self._index.mask(prob['delete'])
+            next_state = self.intern(up.engines.CombinationBitState(new_preds, self._index, new_active_actions,
+                                                                    current_time))
             transition.append((next_state, prob['probability']))
 
         return transition
 
     def all_probabilistic_effects(self, state: "up.engines.State", actions: List["up.engines.Action"]):
-        pe_length = []
         pe_outcomes = []
 
-        # Get the length of each probabilistic effect greater then 0
+        # Get the outcomes of each probabilistic effect with outcomes
         for action in actions:
-            for pe in action.probabilistic_effects:
-                prob_outcomes = pe.probability_function(state, None)
-                if prob_outcomes:
-                    pe_outcomes.append(prob_outcomes)
-                    pe_length.append(len(prob_outcomes))
+            pe_outcomes.extend(self._outcome_cache.outcomes(state, action))
 
         # holds all combination of indexes
-        series = list(product(*(range(x) for x in pe_length)))
+        series = list(product(*(range(len(outcomes)) for outcomes in pe_outcomes)))
 
         effects = []
         for s in series:
             add_predicates = set()
             del_predicates = set()
             probability = 1
-            for i, p in enumerate(pe_outcomes):
-                prob, add, delete = self.probabilistic_effects(p, s[i])
-
-                add_predicates.update(add)
-                del_predicates.update(delete)
-                probability *= prob
+            for i, outcomes in enumerate(pe_outcomes):
+                add_predicates.update(outcomes.adds[s[i]])
+                del_predicates.update(outcomes.deletes[s[i]])
+                probability *= outcomes.probabilities[s[i]]
             effects.append({"probability": probability, "add": add_predicates, 'delete': del_predicates})
 
         return effects
 
+    @instrumented('combination_mdp.legal_actions')
     def legal_actions(self, state: "up.engines.state.CombinationState"):
         """
         If the positive preconditions of an action are true in the state
@@ -319,5 +586,7 @@ class combinationMDP(MDP):
         """
         legal_actions = super().legal_actions(state)
         if state.active_actions.data:
-            legal_actions.append(self.problem.action_by_name('noop'))
+            if self._noop is None:
+                self._noop = self.problem.action_by_name('noop')
+            legal_actions.append(self._noop)
         return legal_actions
\ No newline at end of file
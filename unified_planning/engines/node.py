@@ -6,14 +6,15 @@ from unified_planning.shortcuts import *
 from unified_planning.engines.utils import (
     update_stn,
 )
-from unified_planning.engines.linked_list import LinkedList
+from unified_planning.engines.interval_map import IntervalMap
+from unified_planning.instrumentation import instrumented
 
 
 class Node:
     def __init__(self, isInterval=False):
         if isInterval:
-            # The node value is per intervals, each interval is a node in the link list
-            self._linkList = LinkedList()
+            # The node value is per intervals, kept in the sorted arrays of an interval map
+            self._intervals = IntervalMap()
         else:
             self._value = 0.0
         self._count = 0.0
@@ -35,28 +36,29 @@ class Node:
     @property
     def value(self):
         if self._isInterval:
-            return self._linkList.max_value / self.count
+            return self._intervals.max_value / self.count
         return self._value
 
     def interval_value(self, lower, upper):
-        return self._linkList.interval_value(lower, upper)
+        return self._intervals.interval_value(lower, upper)
 
 
     def max_interval(self):
         if self._isInterval:
-            return self._linkList.max_interval
+            return self._intervals.max_interval
 
     def update(self, reward, lower = None, upper = None):
         self._count += 1
         if lower is None:
             self._value = (self._value * self._count + reward) / (self._count + 1)
         else:
-            self._linkList.update(lower, upper, reward)
+            self._intervals.update(lower, upper, reward)
 
 
 class SNode(Node):
     """ State node """
 
+    @instrumented('node.create_state_node')
     def __init__(self, state: "up.engines.State", depth: int, possible_actions: List["up.engines.Action"],
                  parent: "up.engines.ANode" = None):
         super().__init__()
@@ -117,16 +119,31 @@ class SNode(Node):
 class C_SNode(Node):
     """ State node with consistency STN check """
 
+    @instrumented('node.create_state_node')
     def __init__(self, state: "up.engines.State", depth: int, possible_actions: List["up.engines.Action"],
                  stn: "up.plans.stn.STNPlan", parent: "up.engines.ANode" = None,
-                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, isInterval=False):
+                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, isInterval=False, lazy=False,
+                 trail=False):
+        """
+        :param lazy: if `True` the children are created by `expand` when they are first chosen,
+                     otherwise all the consistent children are created here
+        :param trail: if `True` the children do not keep a copy of the STN, `stn` is the STN of the search
+                      and the search adds the constraints of a child in a pushed level when it descends to it
+        """
         super().__init__(isInterval)
         self._state = state
         self._depth = depth
         self._parent = parent
         self._children: Dict["up.engines.Action", "up.engines.C_ANode"] = {}
         self._possible_actions = possible_actions
-        self._add_children(stn, previous_chosen_action_node)
+        self._heuristic_summary = None
+        self._trail = trail
+        self._previous_chosen_action_node = previous_chosen_action_node
+        if lazy:
+            self._stn = stn
+        else:
+            self._stn = None
+            self._add_children(stn, previous_chosen_action_node)
 
     def __repr__(self):
         s = "state Node; depth: %d; children: %d; visits: %d; reward: %f" % (
@@ -137,6 +154,14 @@ class C_SNode(Node):
     def state(self):
         return self._state
 
+    @property
+    def heuristic_summary(self):
+        """ The `TRPGSummary` of the state, `None` if it is not computed """
+        return self._heuristic_summary
+
+    def set_heuristic_summary(self, summary: "up.engines.heuristics.TRPGSummary"):
+        self._heuristic_summary = summary
+
     @property
     def depth(self):
         return self._depth
@@ -156,9 +181,19 @@ class C_SNode(Node):
     def possible_actions(self):
         return self._possible_actions
 
+    @property
+    def previous_chosen_action_node(self):
+        return self._previous_chosen_action_node
+
+    def set_stn(self, stn: "up.plans.stn.STNPlan", previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        """ Sets the STN and the previous chosen action node the children of a lazy SNode are expanded with """
+        self._stn = stn
+        self._previous_chosen_action_node = previous_chosen_action_node
+
     def remove_action(self, action: "up.engines.Action"):
         if action in self._possible_actions:
             self._possible_actions.remove(action)
+        self._children.pop(action, None)
 
     def _add_children(self, stn: "up.plans.stn.STNPlan",
                       previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
@@ -173,9 +208,9 @@ class C_SNode(Node):
         """
         not_consistent = []
         for action in self.possible_actions:
-            child = C_ANode(action, stn.clone(), self, previous_chosen_action_node, isInterval=self.isInterval)
+            child = self._create_child(action, stn, previous_chosen_action_node)
 
-            if child.is_consistent():
+            if child is not None:
                 self.children[action] = child
             else:
                 not_consistent.append(action)
@@ -183,6 +218,44 @@ class C_SNode(Node):
         for a in not_consistent:
             self.possible_actions.remove(a)
 
+    def _new_child(self, action: "up.engines.Action", stn: "up.plans.stn.STNPlan",
+                   previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        return C_ANode(action, stn, self, previous_chosen_action_node, isInterval=self.isInterval)
+
+    def _create_child(self, action: "up.engines.Action", stn: "up.plans.stn.STNPlan",
+                      previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        """
+        Creates the child of `action` on `stn`, the STN of this node.
+        The constraints of the action are added in a pushed level of `stn` and undone after the consistency check.
+        A consistent child keeps the times the search needs, and a copy of the STN unless the node is in trail mode
+
+        :return: the created child, `None` if it is not consistent
+        """
+        stn.push()
+        child = self._new_child(action, stn, previous_chosen_action_node)
+        consistent = child.is_consistent()
+        if consistent:
+            child.update_times(stn)
+            child._stn = None if self._trail else stn.clone()
+        stn.pop()
+        return child if consistent else None
+
+    def expand(self, action: "up.engines.Action"):
+        """
+        Creates the child of the possible action `action` of a lazy SNode.
+        If the child is not consistent the action is removed from the possible actions.
+
+        :return: the created child, `None` if it is not consistent
+        """
+        child = self._create_child(action, self._stn, self._previous_chosen_action_node)
+
+        if child is not None:
+            self.children[action] = child
+            return child
+
+        self.possible_actions.remove(action)
+        return None
+
     def max_update(self, node=None):
         self._count += 1
         if node is None:
@@ -199,13 +272,23 @@ class C_SNode(Node):
         return max_v
 
     def max_update_interval(self, node):
-        update_node = self._linkList.update(node, type='Max')
-        return update_node
+        """
+        Raises the values of the intervals of the chain of `LinkedListNode` `node` to at least their values
+
+        :return: the values of the node over the interval of the chain
+        """
+        lower = node.lower_bound
+        while node is not None:
+            self._intervals.max_update(node.lower_bound, node.upper_bound, node.value)
+            upper = node.upper_bound
+            node = node.next
+        return self._intervals.interval_value(lower, upper)
 
 
 class ANode(Node):
     """ Action node """
 
+    @instrumented('node.create_action_node')
     def __init__(self, action: "up.engines.action.Action",
                  parent: "up.engines.node.SNode" = None):
         super().__init__()
@@ -235,10 +318,19 @@ class ANode(Node):
     def isLeaf(self):
         return self.children
 
+    def detach(self, child_node):
+        """
+        Keeps `child_node` as the only child of this node and detaches this node from its parent,
+        so the rest of the tree can be freed when `child_node` becomes the root of the search
+        """
+        self._parent = None
+        self._children = {child_node.state: child_node}
+
 
 class C_ANode(Node):
     """ Action node with consistency STN check """
 
+    @instrumented('node.create_action_node')
     def __init__(self, action: "up.engines.action.Action", stn: "up.plans.stn.STNPlan",
                  parent: "up.engines.node.C_SNode" = None,
                  previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, isInterval = False):
@@ -248,6 +340,8 @@ class C_ANode(Node):
         self._children: Dict["up.engines.State", "up.engines.node.SNode"] = {}
         self._stn = stn
         self._STNNode = self._add_constraints(previous_chosen_action_node)
+        self._end_time = None
+        self._lower_bounds = None
 
     def __repr__(self):
         s = "action Node; children: %d; visits: %d; reward: %f" % (len(self.children), self.count, self.value)
@@ -275,6 +369,14 @@ class C_ANode(Node):
     def isLeaf(self):
         return self.children
 
+    def detach(self, child_node):
+        """
+        Keeps `child_node` as the only child of this node and detaches this node from its parent,
+        so the rest of the tree can be freed when `child_node` becomes the root of the search
+        """
+        self._parent = None
+        self._children = {child_node.state: child_node}
+
     @property
     def stn(self):
         return self._stn
@@ -283,12 +385,45 @@ class C_ANode(Node):
     def STNNode(self):
         return self._STNNode
 
+    @property
+    def end_time(self):
+        """ The current end time of the plan with this action """
+        return self._end_time
+
+    @property
+    def lower_bounds(self):
+        """ The lower bounds of the potential end actions of the plan with this action """
+        return self._lower_bounds
+
+    def update_times(self, stn: "up.plans.stn.STNPlan" = None):
+        """ Keeps the end time and the lower bounds of `stn`, by default of the STN of this node """
+        stn = self._stn if stn is None else stn
+        self._end_time = stn.get_current_end_time()
+        self._lower_bounds = stn.get_lower_bound_potential_end_action()
+
+    def set_STNNode(self, node: "up.plans.stn.STNPlanNode"):
+        self._STNNode = node
+
+    def replay(self, stn: "up.plans.stn.STNPlan", previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        """
+        Adds the constraints of the action again to `stn`, the STN of the search in trail mode
+        at the level of the parent node, this node keeps the new STN node of the action
+
+        :return: `True` if `stn` is consistent with the action
+        """
+        self._stn = stn
+        self._STNNode = self._add_constraints(previous_chosen_action_node)
+        self._stn = None
+        return stn.is_consistent()
+
     def max_interval(self):
-        return self._linkList.max_interval
+        return self._intervals.max_interval
 
+    @instrumented('node.is_consistent', failures=True)
     def is_consistent(self):
         return self._stn.is_consistent()
 
+    @instrumented('node.add_constraints')
     def _add_constraints(self, previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
         """
 
@@ -0,0 +1,259 @@
+import math
+
+import numpy as np
+import unified_planning as up
+from typing import List
+from unified_planning.engines.node import SNode, ANode, C_SNode, C_ANode
+
+
+class NodeStore:
+    """
+    Struct of arrays of the visit counts and values of the action nodes of a search tree.
+    Each action node is an index in the arrays and the action nodes of a state node are a contiguous range,
+    so UCT and the max update of a state node are vectorized over its range.
+    """
+    def __init__(self, capacity=1024):
+        self._counts = np.zeros(capacity)
+        self._values = np.zeros(capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def values(self):
+        return self._values
+
+    def allocate(self, amount: int):
+        """ Reserves a contiguous range of `amount` action nodes and returns its start """
+        start = self._size
+        self._size += amount
+        capacity = len(self._counts)
+        if self._size > capacity:
+            grow = max(capacity, self._size - capacity)
+            self._counts = np.concatenate((self._counts, np.zeros(grow)))
+            self._values = np.concatenate((self._values, np.zeros(grow)))
+        return start
+
+    def copy_range(self, store: "NodeStore", start: int, amount: int):
+        """ Allocates a range of `amount` action nodes with the counts and values of the range at `start` of `store` """
+        new_start = self.allocate(amount)
+        self._counts[new_start:new_start + amount] = store.counts[start:start + amount]
+        self._values[new_start:new_start + amount] = store.values[start:start + amount]
+        return new_start
+
+    def adopt(self, root_node):
+        """
+        Moves the ranges of the state nodes of the subtree of `root_node` to this store,
+        the ranges of the rest of the tree are left in the old store and freed with it
+        """
+        visited = set()
+        snodes = [root_node]
+        while snodes:
+            snode = snodes.pop()
+            if id(snode) in visited:
+                continue
+            visited.add(id(snode))
+            snode.move(self)
+            for anode in snode.children.values():
+                snodes.extend(anode.children.values())
+
+    def update(self, index: int, reward: float):
+        """ The average update of `Node.update` """
+        count = self._counts[index] + 1
+        self._counts[index] = count
+        self._values[index] = (self._values[index] * count + reward) / (count + 1)
+
+    def backup(self, indices: List[int], rewards: List[float]):
+        """ Updates each of the distinct action nodes `indices` with its reward in one array update """
+        indices = np.array(indices)
+        counts = self._counts[indices] + 1
+        self._counts[indices] = counts
+        self._values[indices] = (self._values[indices] * counts + np.array(rewards)) / (counts + 1)
+
+    def remove(self, index: int):
+        """ Excludes the action node `index` from UCT and the max update """
+        self._counts[index] = 1
+        self._values[index] = -math.inf
+
+    def uct(self, start: int, end: int, parent_count: float, explore_constant: float):
+        """
+        :return: the offset in the range [`start`, `end`) of the first unvisited action node,
+                 if all of them are visited the offset of the highest upper confidence bound
+        """
+        counts = self._counts[start:end]
+        unvisited = counts == 0
+        offset = int(unvisited.argmax())
+        if unvisited[offset]:
+            return offset
+
+        ub = self._values[start:end] / counts + explore_constant * np.sqrt(math.log(parent_count) / counts)
+        return int(ub.argmax())
+
+    def max_value(self, start: int, end: int):
+        """ The maximal value of the visited action nodes in the range [`start`, `end`) """
+        counts = self._counts[start:end]
+        return float(self._values[start:end][counts > 0].max(initial=-math.inf))
+
+
+class ArrayANode(ANode):
+    """ Action node whose count and value are stored in a `NodeStore` """
+
+    def __init__(self, action: "up.engines.action.Action", store: NodeStore, index: int,
+                 parent: "up.engines.node.SNode" = None):
+        super().__init__(action, parent)
+        self._store = store
+        self._index = index
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def count(self):
+        return float(self._store.counts[self._index])
+
+    @property
+    def value(self):
+        return float(self._store.values[self._index])
+
+    def update(self, reward, lower=None, upper=None):
+        self._store.update(self._index, reward)
+
+    def move(self, store: NodeStore, index: int):
+        self._store = store
+        self._index = index
+
+
+class C_ArrayANode(C_ANode):
+    """ Action node with consistency STN check whose count and value are stored in a `NodeStore` """
+
+    def __init__(self, action: "up.engines.action.Action", stn: "up.plans.stn.STNPlan", store: NodeStore,
+                 index: int, parent: "up.engines.node.C_SNode" = None,
+                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        super().__init__(action, stn, parent, previous_chosen_action_node)
+        self._store = store
+        self._index = index
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def count(self):
+        return float(self._store.counts[self._index])
+
+    @property
+    def value(self):
+        return float(self._store.values[self._index])
+
+    def update(self, reward, lower=None, upper=None):
+        self._store.update(self._index, reward)
+
+    def move(self, store: NodeStore, index: int):
+        self._store = store
+        self._index = index
+
+
+class ArraySNode(SNode):
+    """ State node whose action nodes are the range of its possible actions in a `NodeStore` """
+
+    def __init__(self, state: "up.engines.State", depth: int, possible_actions: List["up.engines.Action"],
+                 store: NodeStore, parent: "up.engines.ANode" = None):
+        self._store = store
+        self._start = store.allocate(len(possible_actions))
+        super().__init__(state, depth, possible_actions, parent)
+
+    @property
+    def store(self):
+        return self._store
+
+    def _add_children(self):
+        for i, action in enumerate(self.possible_actions):
+            self.children[action] = ArrayANode(action, self._store, self._start + i, self)
+
+    def move(self, store: NodeStore):
+        """ Copies the range of the action nodes to `store` """
+        start = store.copy_range(self._store, self._start, len(self.possible_actions))
+        for child in self.children.values():
+            child.move(store, start + child.index - self._start)
+        self._store = store
+        self._start = start
+
+    def uct(self, explore_constant: float):
+        """ The action chosen by `Base_MCTS.uct` with one vectorized pass over the range """
+        offset = self._store.uct(self._start, self._start + len(self.possible_actions), self.count, explore_constant)
+        return self.possible_actions[offset]
+
+    def max_update(self):
+        max_v = self._store.max_value(self._start, self._start + len(self.possible_actions))
+        self._value = max_v
+        self._count += 1
+        return max_v
+
+
+class C_ArraySNode(C_SNode):
+    """
+    Lazy state node with consistency STN check whose action nodes are the range of its possible actions
+    in a `NodeStore`. The actions found inconsistent keep their index and are removed from the range in the store.
+    """
+
+    def __init__(self, state: "up.engines.State", depth: int, possible_actions: List["up.engines.Action"],
+                 stn: "up.plans.stn.STNPlan", store: NodeStore, parent: "up.engines.ANode" = None,
+                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, trail=False):
+        self._store = store
+        self._start = store.allocate(len(possible_actions))
+        # the possible actions in the order of the range, kept when actions are removed
+        self._actions = tuple(possible_actions)
+        super().__init__(state, depth, possible_actions, stn, parent, previous_chosen_action_node, lazy=True,
+                         trail=trail)
+
+    @property
+    def store(self):
+        return self._store
+
+    def _index(self, action: "up.engines.Action"):
+        return self._start + self._actions.index(action)
+
+    def move(self, store: NodeStore):
+        """ Copies the range of the action nodes to `store`, with the removed actions """
+        start = store.copy_range(self._store, self._start, len(self._actions))
+        for child in self.children.values():
+            child.move(store, start + child.index - self._start)
+        self._store = store
+        self._start = start
+
+    def remove_action(self, action: "up.engines.Action"):
+        if action in self._possible_actions:
+            self._store.remove(self._index(action))
+        super().remove_action(action)
+
+    def _new_child(self, action: "up.engines.Action", stn: "up.plans.stn.STNPlan",
+                   previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        return C_ArrayANode(action, stn, self._store, self._index(action), self, previous_chosen_action_node)
+
+    def expand(self, action: "up.engines.Action"):
+        child = self._create_child(action, self._stn, self._previous_chosen_action_node)
+
+        if child is not None:
+            self.children[action] = child
+            return child
+
+        self._store.remove(self._index(action))
+        self.possible_actions.remove(action)
+        return None
+
+    def uct(self, explore_constant: float):
+        """ The action chosen by `Base_MCTS.uct` with one vectorized pass over the range """
+        offset = self._store.uct(self._start, self._start + len(self._actions), self.count, explore_constant)
+        return self._actions[offset]
+
+    def max_update(self, node=None):
+        self._count += 1
+        max_v = self._store.max_value(self._start, self._start + len(self._actions))
+        self._value = max_v
+        return max_v
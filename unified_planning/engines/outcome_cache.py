@@ -0,0 +1,231 @@
+import math
+import sys
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional
+
+import unified_planning as up
+
+
+class Outcomes:
+    """
+    The compiled distribution returned by a probability function: the probability, the add and delete
+    predicates and, over a `PredicateIndex`, the add and delete bitmasks of each outcome
+    """
+    __slots__ = ('probabilities', 'adds', 'deletes', 'add_masks', 'delete_masks', '_cdf', '_relaxed')
+
+    def __init__(self, prob_outcomes: Dict, index: "up.engines.PredicateIndex" = None):
+        self.probabilities = list(prob_outcomes.keys())
+        self.adds = []
+        self.deletes = []
+        for values in prob_outcomes.values():
+            self.adds.append(frozenset(v for v, value in values.items() if value))
+            self.deletes.append(frozenset(v for v, value in values.items() if not value))
+
+        if index is not None:
+            self.add_masks = [index.mask(add) for add in self.adds]
+            self.delete_masks = [index.mask(delete) for delete in self.deletes]
+        else:
+            self.add_masks = self.delete_masks = None
+
+        if any(p < 0 for p in self.probabilities):
+            raise ValueError("probabilities are not non-negative")
+        if abs(math.fsum(self.probabilities) - 1) > math.sqrt(sys.float_info.epsilon):
+            raise ValueError("probabilities do not sum to 1")
+
+        # the normalized cumulative distribution, computed as `numpy.random.choice` does
+        cdf = []
+        total = 0.0
+        for p in self.probabilities:
+            total += p
+            cdf.append(total)
+        self._cdf = [c / total for c in cdf]
+        self._relaxed = {}
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def sample(self, uniform: float) -> int:
+        """
+        Returns the index of the outcome of the uniform sample `uniform` in [0, 1),
+        the index `numpy.random.choice` draws from the same sample
+        """
+        return bisect_right(self._cdf, uniform)
+
+    def relaxed(self, mode: str, min_probability: float = 0.0):
+        """
+        The union of the outcomes the relaxation `mode` keeps without drawing: 'all' keeps the outcomes whose
+        probability is at least `min_probability` and 'most_likely' the first outcome of the highest probability
+
+        :return: the add and delete predicates and, over a `PredicateIndex`, the add and delete bitmasks
+        """
+        key = (mode, min_probability)
+        relaxed = self._relaxed.get(key)
+        if relaxed is None:
+            if mode == 'most_likely':
+                kept = [max(range(len(self.probabilities)), key=self.probabilities.__getitem__)]
+            elif mode == 'all':
+                kept = [i for i, p in enumerate(self.probabilities) if p >= min_probability]
+            else:
+                raise ValueError(f"unknown relaxation {mode} of the outcomes")
+            adds = frozenset().union(*(self.adds[i] for i in kept))
+            deletes = frozenset().union(*(self.deletes[i] for i in kept))
+            add_mask = delete_mask = None
+            if self.add_masks is not None:
+                add_mask = delete_mask = 0
+                for i in kept:
+                    add_mask |= self.add_masks[i]
+                    delete_mask |= self.delete_masks[i]
+            relaxed = (adds, deletes, add_mask, delete_mask)
+            self._relaxed[key] = relaxed
+        return relaxed
+
+
+class _RecordingPredicates:
+    """ The predicates of a state that record the membership tests """
+
+    def __init__(self, state, contains: Callable):
+        self._state = state
+        self._contains = contains
+        self.queries = []
+        self.traceable = True
+
+    def __contains__(self, predicate):
+        result = bool(self._contains(predicate))
+        self.queries.append((predicate, result))
+        return result
+
+    def __iter__(self):
+        self.traceable = False
+        return iter(self._state.predicates)
+
+    def __len__(self):
+        self.traceable = False
+        return len(self._state.predicates)
+
+    def __getattr__(self, name):
+        self.traceable = False
+        return getattr(self._state.predicates, name)
+
+
+class _RecordingState:
+    """ A state whose predicates record the membership tests, any other use of the state is not traced """
+
+    def __init__(self, state, contains: Callable):
+        self._state = state
+        self.predicates = _RecordingPredicates(state, contains)
+
+    def __getattr__(self, name):
+        self.predicates.traceable = False
+        return getattr(self._state, name)
+
+
+class OutcomeTree:
+    """
+    The compiled outcomes of a probabilistic effect by the projection of the state on the predicates
+    its probability function tests. The inner nodes are the tests `predicate in state.predicates`
+    in the order the function makes them, and the leaves are the `Outcomes` the function returns.
+    The function is called only for the states whose projection is not yet in the tree, so it must
+    be a function of the state only. A function that uses the state in any other way than membership
+    tests is called for every state. Over a `PredicateIndex` the tests of the states with a bitmask
+    are made on the bitmask.
+    """
+    def __init__(self, probabilistic_effect: "up.model.effect.ProbabilisticEffect",
+                 index: "up.engines.PredicateIndex" = None):
+        self._function = probabilistic_effect.probability_function
+        self._index = index
+        # an inner node is a list [predicate, bitmask of the predicate, child if false, child if true]
+        self._root = None
+        self._traceable = True
+
+    def outcomes(self, state: "up.engines.State") -> Optional[Outcomes]:
+        """ Returns the outcomes of the probabilistic effect in `state`, `None` if it has no outcome """
+        if self._traceable:
+            node = self._root
+            mask = getattr(state, 'mask', None) if self._index is not None else None
+            if mask is not None:
+                while type(node) is list:
+                    node = node[3] if mask & node[1] else node[2]
+            else:
+                predicates = state.predicates
+                while type(node) is list:
+                    node = node[3] if node[0] in predicates else node[2]
+            if node is not None:
+                return node or None
+            return self._trace(state)
+
+        return self._compile(self._function(state, None))
+
+    def _compile(self, prob_outcomes) -> Optional[Outcomes]:
+        return Outcomes(prob_outcomes, self._index) if prob_outcomes else None
+
+    def _contains(self, state):
+        mask = getattr(state, 'mask', None) if self._index is not None else None
+        if mask is not None:
+            return lambda predicate: mask & (1 << self._index.bit(predicate))
+        predicates = state.predicates
+        return lambda predicate: predicate in predicates
+
+    def _trace(self, state) -> Optional[Outcomes]:
+        """ Calls the function on `state` and adds the projection of `state` it tests to the tree """
+        recording = _RecordingState(state, self._contains(state))
+        outcomes = self._compile(self._function(recording, None))
+        queries = recording.predicates.queries
+        if not recording.predicates.traceable:
+            self._traceable = False
+            return outcomes
+
+        # the empty distribution is kept as a leaf that is not `None`
+        leaf = outcomes if outcomes is not None else ()
+        if not queries:
+            if self._root is None:
+                self._root = leaf
+            else:
+                self._traceable = False
+            return outcomes
+
+        parent, branch = None, None
+        node = self._root
+        for predicate, result in queries:
+            if node is None:
+                bit = 1 << self._index.bit(predicate) if self._index is not None else 0
+                node = [predicate, bit, None, None]
+                if parent is None:
+                    self._root = node
+                else:
+                    parent[branch] = node
+            elif type(node) is not list or node[0] is not predicate:
+                # the function does not make the same tests in the states of the same projection
+                self._traceable = False
+                return outcomes
+            parent, branch = node, 3 if result else 2
+            node = node[branch]
+
+        if node is not None:
+            self._traceable = False
+            return outcomes
+        parent[branch] = leaf
+        return outcomes
+
+
+class OutcomeCache:
+    """ The `OutcomeTree` of each probabilistic effect of the actions of an MDP """
+
+    def __init__(self, index: "up.engines.PredicateIndex" = None):
+        self._index = index
+        self._trees: Dict["up.engines.Action", List[OutcomeTree]] = {}
+
+    def outcomes(self, state: "up.engines.State", action: "up.engines.Action") -> List[Outcomes]:
+        """ Returns the outcomes of the probabilistic effects of `action` in `state`, except the empty ones """
+        trees = self._trees.get(action)
+        if trees is None:
+            trees = [OutcomeTree(pe, self._index) for pe in action.probabilistic_effects]
+            self._trees[action] = trees
+        if not trees:
+            return []
+
+        result = []
+        for tree in trees:
+            outcomes = tree.outcomes(state)
+            if outcomes is not None:
+                result.append(outcomes)
+        return result
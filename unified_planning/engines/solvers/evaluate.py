@@ -2,6 +2,12 @@ import math
 import statistics
 
 
+def print_search_rate(iterations, seconds):
+    """ Prints the amount of search iterations of a step and the iterations per second """
+    rate = iterations / seconds if seconds > 0 else math.inf
+    print(f'Search iterations = {iterations}, iterations per second = {rate:.1f}')
+
+
 def evaluation_loop(runs, plan_func, params):
     """
     perform runs times the planner on the domain
@@ -2,23 +2,50 @@ import numpy as np
 from unified_planning.shortcuts import *
 import unified_planning as up
 import math
+import multiprocessing
 import time
-import random
+from typing import List
 from unified_planning.engines.utils import (
     create_init_stn,
     update_stn,
 )
+from unified_planning.engines.solvers.evaluate import print_search_rate
+from unified_planning import instrumentation
+from unified_planning.exceptions import UPUsageError
 from unified_planning.engines.linked_list import LinkedListNode
 
 
+# the ways a descent of the selection ends
+_DEAD_END, _DEPTH, _TERMINAL, _LEAF = range(4)
+
+
 class Base_MCTS:
     def __init__(self, mdp: "up.engines.MDP", search_depth: int,
-                 exploration_constant: float, k: int):
+                 exploration_constant: float, k: int, transposition=False, node_store=False,
+                 batch_heuristic=False, incremental_heuristic=False):
+        """
+        :param transposition: if `True` equivalent state nodes at the same depth are shared,
+                              so the tree becomes a DAG
+        :param node_store: if `True` the counts and values of the action nodes are kept in the arrays of a
+                           `NodeStore`, UCT and the backpropagation are vectorized over them
+        :param batch_heuristic: if `True` the k children of the max approach are evaluated in one
+                                `evaluate_batch` call of the heuristic
+        :param incremental_heuristic: if `True` the state nodes keep the `TRPGSummary` of their state,
+                                      the heuristic of a state is evaluated from the summary of its parent state
+        """
         self._mdp = mdp
         self._search_depth = search_depth
         self._exploration_constant = exploration_constant
         self._root_node = None
         self._k = k
+        self._transpositions = {} if transposition else None
+        self._store = up.engines.NodeStore() if node_store else None
+        self._batch_heuristic = batch_heuristic
+        self._incremental_heuristic = incremental_heuristic
+        self.iterations = 0
+        self.search_seconds = 0
+        # the (state node, action node, reward) of each level of the current descent, reused by all the iterations
+        self._path = []
 
     @property
     def mdp(self):
@@ -46,21 +73,63 @@ class Base_MCTS:
     def set_root_node(self, root_node):
         self._root_node = root_node
 
+    @property
+    def node_store(self):
+        return self._store
+
+    def set_node_store(self, root_node):
+        """
+        The action nodes of the subtree of a reused root are moved to the new store,
+        so the ranges of the detached rest of the tree are not kept
+        """
+        if self._store is not None and root_node is not None:
+            self._store.adopt(root_node)
+
+    @property
+    def transposition(self):
+        return self._transpositions is not None
+
+    def transposition_key(self, state: "up.engines.State", anode):
+        """ The key of `state` reached by the action node `anode` in the transposition table """
+        return state
+
+    def get_transposition(self, state: "up.engines.State", anode, depth: int):
+        """
+        Returns the state node stored for `state` reached by `anode` if it is in depth `depth`,
+        otherwise `None`
+        """
+        if self._transpositions is None:
+            return None
+        snode = self._transpositions.get(self.transposition_key(state, anode))
+        if snode is not None and snode.depth == depth:
+            return snode
+        return None
+
+    def add_transposition(self, snode):
+        """ Stores `snode` in the transposition table, the first node created for a key is kept """
+        if self._transpositions is not None:
+            self._transpositions.setdefault(self.transposition_key(snode.state, snode.parent), snode)
+
     def default_policy(self, state: "up.engines.State"):
         """ Choose a random action. Heustics can be used here to improve simulations. """
-        return random.choice(self.mdp.legal_actions(state))
+        return self.mdp.random.choice(self.mdp.legal_actions(state))
 
     def uct(self, snode: "up.engines.Snode", explore_constant: float):
+        if self._store is not None:
+            return snode.uct(explore_constant)
+
         anodes = snode.children
         best_ub = -float('inf')
         best_action = -1
         possible_actions = snode.possible_actions
         for action in possible_actions:
-            if anodes[action].count == 0:
+            anode = anodes.get(action)
+            # an action that is not expanded yet is not visited
+            if anode is None or anode.count == 0:
                 return action
 
-            ub = (anodes[action].value / anodes[action].count) + (
-                    explore_constant * math.sqrt(math.log(snode.count) / anodes[action].count))
+            ub = (anode.value / anode.count) + (
+                    explore_constant * math.sqrt(math.log(snode.count) / anode.count))
             # ub = anodes[action].value + (
             #         explore_constant * math.sqrt(math.log(snode.count + 1) / anodes[action].count))
             if ub > best_ub:
@@ -81,8 +150,9 @@ class Base_MCTS:
         aStar = -1
 
         for action in root_node.possible_actions:
-            if anodes[action].count > 0 and anodes[action].value > aStart_value:
-                aStart_value = anodes[action].value
+            anode = anodes.get(action)
+            if anode is not None and anode.count > 0 and anode.value > aStart_value:
+                aStart_value = anode.value
                 aStar = action
 
         if aStar == -1:
@@ -90,28 +160,168 @@ class Base_MCTS:
 
         return aStar
 
-    def search(self, timeout=1, selection_type='avg'):
+    def search(self, timeout=1, selection_type='avg', iterations=None):
         """
         Execute the MCTS algorithm from the initial state given, with timeout in seconds
+
+        :param iterations: if not `None` the search performs this amount of selections instead of stopping after `timeout`
         """
         start_time = time.time()
         current_time = time.time()
         i = 0
         selection = self.selection if selection_type == 'avg' else (self.selection_root_interval if selection_type == 'rootInterval' else self.selection_max)
-        while current_time < start_time + timeout:
+        while (current_time < start_time + timeout) if iterations is None else i < iterations:
             selection(self.root_node)
             current_time = time.time()
             i += 1
-        # print(f'i = {i}')
+        self.leave_levels()
+
+        self.iterations = i
+        self.search_seconds = time.time() - start_time
         return self.best_action(self.root_node)
 
-    def selection(self, snode: "up.engines.Snode"):
+    def is_dead_end(self, snode: "up.engines.SNode"):
+        """ Returns `True` if there are no possible actions to take in `snode` """
+        return len(snode.possible_actions) == 0
+
+    def choose_action(self, snode: "up.engines.SNode"):
+        return self.uct(snode, self.exploration_constant)
+
+    def node_heuristic(self, snode: "up.engines.SNode"):
         raise NotImplementedError
 
-    def selection_max(self, snode: "up.engines.Snode"):
+    def create_leaf(self, create_snode, state: "up.engines.State", snode: "up.engines.SNode", anode: "up.engines.ANode"):
+        """ Creates with `create_snode` the state node of `state` reached from `snode` by `anode` """
         raise NotImplementedError
 
-    def selection_root_interval(self, snode: "up.engines.Snode"):
+    def backup_leaf(self, leaf: "up.engines.SNode", value: float):
+        """ Updates a new leaf with the value of the action that reached it """
+        pass
+
+    def enter_level(self, snode: "up.engines.SNode", anode: "up.engines.ANode"):
+        """ Called when the descent moves from `snode` to its chosen action node `anode` """
+        pass
+
+    def leave_levels(self):
+        """ Undoes the levels entered by the last descent, called before a descent and after the search """
+        pass
+
+    def descend(self, snode: "up.engines.SNode", create_snode):
+        """
+        Traverse the tree from `snode` until reaching a leaf node, a terminal state, a dead end or the search depth.
+        The (state node, action node, reward) of each level are pushed to the path stack.
+
+        :param create_snode: creates the state node of a new leaf
+        :return: how the descent ended and the state node it stopped in,
+                 for a new leaf the node and the value returned by `create_snode`
+        """
+        path = self._path
+        path.clear()
+        self.leave_levels()
+        while True:
+            if self.is_dead_end(snode):
+                # Stop when there are no possible actions to take so the plan remains consistent
+                return _DEAD_END, snode
+
+            if snode.depth > self.search_depth:
+                # Stop if the search depth is reached
+                return _DEPTH, snode
+
+            action = self.choose_action(snode)
+            if action == -1:
+                # all the possible actions were found inconsistent
+                return _DEAD_END, snode
+
+            terminal, next_state, reward = self.mdp.step(snode.state, action)
+            anode = snode.children[action]
+            self.enter_level(snode, anode)
+            path.append((snode, anode, reward))
+            if terminal:
+                return _TERMINAL, None
+
+            next_snode = anode.children.get(next_state)
+            if next_snode is None:
+                next_snode = self.get_transposition(next_state, anode, snode.depth + 1)
+                if next_snode is None:
+                    leaf = self.create_leaf(create_snode, next_state, snode, anode)
+                    anode.add_child(leaf[0])
+                    self.add_transposition(leaf[0])
+                    return _LEAF, leaf
+
+                # the state was reached by another path, its node is shared
+                anode.add_child(next_snode)
+            snode = next_snode
+
+    def selection(self, snode: "up.engines.SNode"):
+        """
+        Traverse the tree until reaching a leaf node.
+        The discounted return is backpropagated as the average of the nodes on the path.
+        """
+        stop, node = self.descend(snode, self.create_Snode)
+        leaf = None
+        if stop == _DEAD_END:
+            value = -100
+        elif stop == _DEPTH:
+            value = self.node_heuristic(node)
+        elif stop == _TERMINAL:
+            value = None
+        else:
+            leaf = node[0]
+            value = self.node_heuristic(leaf)
+
+        discount_factor = self.mdp.discount_factor
+        path = self._path
+        store = self._store
+        if store is not None:
+            indices = []
+            values = []
+        for i in range(len(path) - 1, -1, -1):
+            snode, anode, reward = path[i]
+            value = reward if value is None else reward + discount_factor * value
+            if leaf is not None:
+                self.backup_leaf(leaf, value)
+                leaf = None
+            snode.update(value)
+            if store is None:
+                anode.update(value)
+            else:
+                indices.append(anode.index)
+                values.append(value)
+
+        if store is not None and indices:
+            # the action nodes of the path are distinct, they are updated together
+            store.backup(indices, values)
+        return value
+
+    def selection_max(self, snode: "up.engines.SNode"):
+        """
+        Traverse the tree until reaching a leaf node.
+        Selection with max logic -
+        average between states and maximum between possible actions
+        """
+        stop, node = self.descend(snode, self.create_Snode_max)
+        path = self._path
+        if stop == _DEAD_END:
+            value = -100
+        elif stop == _DEPTH:
+            value = self.node_heuristic(node)
+        elif stop == _TERMINAL:
+            value = None
+        else:
+            # the value of the new leaf is the maximum of its evaluated children
+            snode, anode, reward = path[-1]
+            path[-1] = (snode, anode, reward + node[1])
+            value = None
+
+        discount_factor = self.mdp.discount_factor
+        for i in range(len(path) - 1, -1, -1):
+            snode, anode, reward = path[i]
+            anode.update(reward if value is None else reward + discount_factor * value)
+            value = snode.max_update()
+
+        return value
+
+    def selection_root_interval(self, snode: "up.engines.SNode"):
         raise NotImplementedError
     def selection_root_interval_max(self, snode: "up.engines.Snode"):
         raise NotImplementedError
@@ -126,17 +336,25 @@ class MCTS(Base_MCTS):
     """
     def __init__(self, mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", root_node: "up.engines.SNode",
                  root_state: "up.engines.state.State", search_depth: int,
-                 exploration_constant: float, selection_type, k: int):
-        super().__init__(mdp, search_depth, exploration_constant, k)
+                 exploration_constant: float, selection_type, k: int, transposition=False, node_store=False,
+                 batch_heuristic=False):
+        super().__init__(mdp, search_depth, exploration_constant, k, transposition, node_store, batch_heuristic)
         self.split_mdp = split_mdp
-        create_snode = self.create_Snode_max if selection_type == 'max' else self.create_Snode
-        snode, _ = create_snode(root_state, 0)
-        self.set_root_node(root_node if root_node is not None else snode)
+        self.set_node_store(root_node)
+        if root_node is None:
+            create_snode = self.create_Snode_max if selection_type == 'max' else self.create_Snode
+            root_node, _ = create_snode(root_state, 0)
+        self.set_root_node(root_node)
+
+    def new_snode(self, state: "up.engines.State", depth: int, parent: "up.engines.ANode" = None):
+        if self._store is not None:
+            return up.engines.ArraySNode(state, depth, self.mdp.legal_actions(state), self._store, parent)
+        return up.engines.SNode(state, depth, self.mdp.legal_actions(state), parent)
 
     def create_Snode(self, state: "up.engines.State", depth: int,
                      parent: "up.engines.ANode" = None):
         """ Create a new Snode for the state `state` with parent `parent`"""
-        return up.engines.SNode(state, depth, self.mdp.legal_actions(state), parent), None
+        return self.new_snode(state, depth, parent), None
 
     def create_Snode_max(self, state: "up.engines.State", depth: int,
                          parent: "up.engines.C_ANode" = None):
@@ -145,19 +363,16 @@ class MCTS(Base_MCTS):
         In this approach k children of snode are evaluated and the initiate value of snode is set to maximum value.
 
         """
-        snode = up.engines.SNode(state, depth, self.mdp.legal_actions(state), parent)
+        snode = self.new_snode(state, depth, parent)
         best = -math.inf
 
         actions_idx = list(range(len(snode.children)))
         if self.k < len(snode.children):
             # samples k children
-            actions_idx = random.sample(range(0, len(snode.children)), self.k)
+            actions_idx = self.mdp.random.sample(range(0, len(snode.children)), self.k)
 
-        for action_idx in actions_idx:
-            # perform each action and evaluate the next state with the heuristic function
-            action = list(snode.children.keys())[action_idx]
-            terminal, next_state, reward = self.mdp.step(snode.state, action)
-            reward += self.mdp.discount_factor * self.heuristic(next_state)
+        actions = [list(snode.children.keys())[action_idx] for action_idx in actions_idx]
+        for action, reward in zip(actions, self.evaluate_children(snode, actions)):
             snode.children[action].update(reward)
             if reward > best:
                 best = reward
@@ -167,78 +382,43 @@ class MCTS(Base_MCTS):
         snode.update(best)
         return snode, best
 
-    def heuristic(self, state: "up.engines.State"):
-        current_time = 0
+    def evaluate_children(self, snode: "up.engines.SNode", actions: List["up.engines.Action"]):
+        """ Performs each action of `actions` and returns its reward with the heuristic value of the next state """
+        if not self._batch_heuristic:
+            rewards = []
+            for action in actions:
+                terminal, next_state, reward = self.mdp.step(snode.state, action)
+                rewards.append(reward + self.mdp.discount_factor * self.heuristic(next_state))
+            return rewards
+
+        steps = [self.mdp.step(snode.state, action) for action in actions]
+        next_states = [next_state for _, next_state, _ in steps]
+        values = self.split_mdp.trpg.evaluate_batch(next_states, [self.current_time(s) for s in next_states])
+        return [reward + self.mdp.discount_factor * value for (_, _, reward), value in zip(steps, values)]
+
+    @staticmethod
+    def current_time(state: "up.engines.State"):
         if isinstance(state, up.engines.CombinationState):
-            current_time = state.current_time
-        h = up.engines.heuristics.TRPG(self.split_mdp, state, current_time)
-        return h.get_heuristic()
-
-    def selection(self, snode: "up.engines.Snode"):
-        """
-        Traverse the tree until reaching a leaf node.
-        """
-        if len(snode.possible_actions) == 0 or snode.state.current_time > self.mdp.deadline():
-            # Stop when there are no possible actions to take so the plan remains consistent
-            return -100
-
-        if snode.depth > self.search_depth:
-            return self.heuristic(snode.state)
-
-        explore_constant = self.exploration_constant
-
-        # Choose a consistent action
-        action = self.uct(snode, explore_constant)
-        terminal, next_state, reward = self.mdp.step(snode.state, action)
-        anode = snode.children[action]
-        if not terminal:
-            snodes = anode.children
-            if next_state in snodes:
-                reward += self.mdp.discount_factor * self.selection(snodes[next_state])
-
-            else: # leaf
-                next_snode, _ = self.create_Snode(next_state, snode.depth + 1, anode)
-                reward += self.mdp.discount_factor * self.heuristic(next_state)
-                anode.add_child(next_snode)
-
-        snode.update(reward)
-        anode.update(reward)
-
-        return reward
-
-    def selection_max(self, snode: "up.engines.Snode"):
-        """
-        Traverse the tree until reaching a leaf node.
-        Selection with max logic -
-        average between states and maximum between possible actions
-        """
-        if len(snode.possible_actions) == 0 or snode.state.current_time > self.mdp.deadline():
-            # Stop when there are no possible actions to take so the plan remains consistent
-            return -100
+            return state.current_time
+        return 0
 
-        if snode.depth > self.search_depth:
-            # Stop if the search depth is reached
-            return self.heuristic(snode.state)
-        explore_constant = self.exploration_constant
+    def heuristic(self, state: "up.engines.State"):
+        return self.split_mdp.trpg.get_heuristic(state, self.current_time(state))
 
-        # Choose a consistent action
-        action = self.uct(snode, explore_constant)
-        terminal, next_state, reward = self.mdp.step(snode.state, action)
-        anode = snode.children[action]
-        if not terminal:
-            snodes = anode.children
-            if next_state in snodes:
-                reward += self.mdp.discount_factor * self.selection_max(snodes[next_state])
+    def transposition_key(self, state: "up.engines.State", anode: "up.engines.ANode"):
+        # the current time is not part of the equality of combination states
+        if isinstance(state, up.engines.CombinationState):
+            return state, state.current_time
+        return state
 
-            else: # leaf
-                next_snode, snode_reward = self.create_Snode_max(next_state, snode.depth + 1, anode)
-                reward += snode_reward
-                anode.add_child(next_snode)
+    def is_dead_end(self, snode: "up.engines.SNode"):
+        return len(snode.possible_actions) == 0 or snode.state.current_time > self.mdp.deadline()
 
-        anode.update(reward)
-        max_v = snode.max_update()
+    def node_heuristic(self, snode: "up.engines.SNode"):
+        return self.heuristic(snode.state)
 
-        return max_v
+    def create_leaf(self, create_snode, state: "up.engines.State", snode: "up.engines.SNode", anode: "up.engines.ANode"):
+        return create_snode(state, snode.depth + 1, anode)
 
     def simulate(self, state, depth):
         """ Simulate until a terminal state """
@@ -264,19 +444,46 @@ class MCTS(Base_MCTS):
 class C_MCTS(Base_MCTS):
     """
     TP MCTS solver implementation.
-    Contains STNs in each node
+    Contains STNs in each node, or in trail mode one STN of the search
     """
     def __init__(self, mdp, root_node: "up.engines.C_SNode", root_state: "up.engines.state.State", search_depth: int,
                  exploration_constant: float, stn: "up.plans.stn.STNPlan", selection_type, k: int,
-                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
-        super().__init__(mdp, search_depth, exploration_constant, k)
+                 previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, transposition=False,
+                 node_store=False, batch_heuristic=False, incremental_heuristic=False, stn_trail=False):
+        """
+        :param stn_trail: if `True` the action nodes keep only the times of their STN. The descent adds the
+                          constraints of the chosen actions to one STN of the search in pushed levels,
+                          which are popped before the next descent
+        """
+        # in the root interval approach the values depend on the root action, so the nodes are not shared.
+        # Its values are interval lists that are not kept in the node store.
+        # In trail mode the constraints of a node are replayed on the path of the descent,
+        # so a node is not shared by paths with other constraints
+        super().__init__(mdp, search_depth, exploration_constant, k,
+                         transposition and selection_type != 'rootInterval' and not stn_trail,
+                         node_store and selection_type != 'rootInterval', batch_heuristic, incremental_heuristic)
         self._previous_chosen_action_node = previous_chosen_action_node
-
-        create_snode = self.create_Snode_max if selection_type == 'max' else (self.create_Snode_root_interval if selection_type == 'rootInterval' else self.create_Snode)
-        snode, _ = create_snode(root_state, 0, stn,
-                                previous_chosen_action_node=previous_chosen_action_node)
-        self.set_root_node(root_node if root_node is not None else snode)
         self._stn = stn
+        self._search_stn = None
+        self._levels = 0
+        if stn_trail:
+            self._search_stn = stn.clone()
+            if selection_type == 'rootInterval':
+                # the upper bounds from the start of the plan are calculated below the levels,
+                # so the levels update them incrementally instead of calculating them again
+                self._search_stn.get_upper_bound_node(up.plans.stn.STNPlanNode(TimepointKind.GLOBAL_START))
+        self.set_node_store(root_node)
+
+        if root_node is None:
+            create_snode = self.create_Snode_max if selection_type == 'max' else (self.create_Snode_root_interval if selection_type == 'rootInterval' else self.create_Snode)
+            root_node, _ = create_snode(root_state, 0, stn,
+                                        previous_chosen_action_node=previous_chosen_action_node)
+        elif stn_trail:
+            if root_node.parent is not None:
+                # the executed action node of a reused root is the previous chosen action of the plan
+                root_node.parent.set_STNNode(previous_chosen_action_node)
+            self.replay_subtree(root_node, previous_chosen_action_node)
+        self.set_root_node(root_node)
 
     @property
     def previous_chosen_action_node(self):
@@ -286,38 +493,87 @@ class C_MCTS(Base_MCTS):
     def stn(self):
         return self._stn
 
+    @property
+    def stn_trail(self):
+        return self._search_stn is not None
+
+    def level_stn(self, anode: "up.engines.C_ANode"):
+        """ The STN of the plan with the action of `anode`, which is the current level in trail mode """
+        return anode.stn if self._search_stn is None else self._search_stn
+
+    def enter_level(self, snode: "up.engines.C_SNode", anode: "up.engines.C_ANode"):
+        stn = self._search_stn
+        if stn is not None:
+            stn.push()
+            self._levels += 1
+            anode.replay(stn, snode.previous_chosen_action_node)
+
+    def leave_levels(self):
+        while self._levels > 0:
+            self._search_stn.pop()
+            self._levels -= 1
+
+    def replay_subtree(self, snode: "up.engines.C_SNode",
+                       previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        """
+        Adds the constraints of each path of a reused subtree in trail mode to the STN of the search,
+        the actions that are not consistent with the new plan are pruned and the times of the others are updated
+        """
+        stn = self._search_stn
+        snode.set_stn(stn, previous_chosen_action_node)
+        for action, anode in list(snode.children.items()):
+            stn.push()
+            if anode.replay(stn, previous_chosen_action_node):
+                anode.update_times(stn)
+                for child in anode.children.values():
+                    self.replay_subtree(child)
+            else:
+                snode.remove_action(action)
+            stn.pop()
+
+    def new_snode(self, state: "up.engines.State", depth: int, stn: "up.plans.stn.STNPlan",
+                  parent: "up.engines.C_ANode" = None,
+                  previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
+        stn = stn if self._search_stn is None else self._search_stn
+        if self._store is not None:
+            return up.engines.C_ArraySNode(state, depth, self.mdp.legal_actions(state), stn, self._store, parent,
+                                           previous_chosen_action_node, self.stn_trail)
+        return up.engines.C_SNode(state, depth, self.mdp.legal_actions(state), stn, parent,
+                                  previous_chosen_action_node, lazy=True, trail=self.stn_trail)
+
     def create_Snode(self, state: "up.engines.State", depth: int, stn: "up.plans.stn.STNPlan",
                      parent: "up.engines.C_ANode" = None,
                      previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, isInterval=False):
         """ Create a new Snode for the state `state` with parent `parent`"""
-        return up.engines.C_SNode(state, depth, self.mdp.legal_actions(state), stn, parent,
-                                  previous_chosen_action_node, isInterval), None
+        return self.new_snode(state, depth, stn, parent, previous_chosen_action_node), None
 
     def create_Snode_root_interval(self, state: "up.engines.State", depth: int, stn: "up.plans.stn.STNPlan",
                      parent: "up.engines.C_ANode" = None,
                      previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None, isInterval=True):
         """ Create a new Snode for the state `state` with parent `parent`
         RootInterval approach """
+        stn = stn if self._search_stn is None else self._search_stn
         return up.engines.C_SNode(state, depth, self.mdp.legal_actions(state), stn, parent,
-                                  previous_chosen_action_node, isInterval), None
+                                  previous_chosen_action_node, isInterval, lazy=True, trail=self.stn_trail), None
 
     def create_Snode_max(self, state: "up.engines.State", depth: int, stn: "up.plans.stn.STNPlan",
                          parent: "up.engines.C_ANode" = None,
                          previous_chosen_action_node: "up.plans.stn.STNPlanNode" = None):
         """ Create a new Snode for the state `state` with parent `parent`
          In this approach k children of snode are evaluated and the initiate value of snode is set to maximum value."""
-        snode = up.engines.C_SNode(state, depth, self.mdp.legal_actions(state), stn, parent,
-                                   previous_chosen_action_node)
+        snode = self.new_snode(state, depth, stn, parent, previous_chosen_action_node)
         best = -math.inf
 
-        actions_idx = list(range(len(snode.children)))
-        if self.k < len(snode.children):
-            actions_idx = random.sample(range(0, len(snode.children)), self.k)
+        # expands the possible actions in a random order until k consistent children are found
+        actions = self.mdp.random.sample(snode.possible_actions, len(snode.possible_actions))
+        children = []
+        for action in actions:
+            if len(children) == self.k:
+                break
+            if snode.expand(action) is not None:
+                children.append(action)
 
-        for action_idx in actions_idx:
-            action = list(snode.children.keys())[action_idx]
-            terminal, next_state, reward = self.mdp.step(snode.state, action)
-            reward += self.mdp.discount_factor * self.heuristic_init(next_state, snode.children[action].stn)
+        for action, reward in zip(children, self.evaluate_children(snode, children)):
             snode.children[action].update(reward)
             if reward > best:
                 best = reward
@@ -328,123 +584,46 @@ class C_MCTS(Base_MCTS):
         return snode, best
 
 
-    def selection(self, snode: "up.engines.C_Snode"):
-        """
-                Traverse the tree until reaching a leaf node.
-         """
-        if len(snode.possible_actions) == 0:
-            # Stop when there are no possible actions to take so the plan remains consistent
-            return -100
-
-        if snode.depth > self.search_depth:
-            # Stop if the search depth is reached
-            # return 0
-            return self.heuristic(snode)
-
-        explore_constant = self.exploration_constant
-
-        # Choose a consistent action
-        action = self.uct(snode, explore_constant)
-        terminal, next_state, reward = self.mdp.step(snode.state, action)
-        anode = snode.children[action]
-        if not terminal:
-            snodes = anode.children
-            if next_state in snodes:
-                reward += self.mdp.discount_factor * self.selection(snodes[next_state])
-
-            else: # leaf
-                next_snode, _ = self.create_Snode(next_state, snode.depth + 1, anode.stn, anode)
-                reward += self.mdp.discount_factor * self.heuristic(next_snode)
-                anode.add_child(next_snode)
-                next_snode.update(reward)
-
-        snode.update(reward)
-        anode.update(reward)
-
-        return reward
-
-    def selection_max(self, snode: "up.engines.C_Snode"):
-        """
-        Traverse the tree until reaching a leaf node.
-        Selection with max logic -
-        average between states and maximum between possible actions
-        """
-        if len(snode.possible_actions) == 0:
-            # Stop when there are no possible actions to take so the plan remains consistent
-            return -100
-
-        if snode.depth > self.search_depth:
-            # Stop if the search depth is reached
-            return self.heuristic(snode)
-        explore_constant = self.exploration_constant
-
-        # Choose a consistent action
-        action = self.uct(snode, explore_constant)
-        terminal, next_state, reward = self.mdp.step(snode.state, action)
-        anode = snode.children[action]
-        if not terminal:
-            snodes = anode.children
-            if next_state in snodes:
-                reward += self.mdp.discount_factor * self.selection_max(snodes[next_state])
-
-            else: #leaf
-                next_snode, snode_reward = self.create_Snode_max(next_state, snode.depth + 1, anode.stn, anode)
-                reward += snode_reward
-                anode.add_child(next_snode)
-
-        anode.update(reward)
-        max_v = snode.max_update()
-
-        return max_v
-
-    def selection_root_interval(self, snode: "up.engines.C_Snode", root_STNnode: "up.plans.stn.STNPlanNode" = None):
+    def selection_root_interval(self, snode: "up.engines.C_SNode"):
         """
         Traverse the tree until reaching a leaf node.
         Selection with root interval logic -
         set the value per root action legal interval.
         The value is propagated and updated according the legal interval
         """
-        if len(snode.possible_actions) == 0:
-            # Stop when there are no possible actions to take so the plan remains consistent
-            if root_STNnode is None:
-                return 0
-            return 0, *snode.parent.stn.get_legal_interval(root_STNnode)
-
-        if snode.depth > self.search_depth:
-            # Stop if the search depth is reached
-            return self.heuristic(snode), *snode.parent.stn.get_legal_interval(root_STNnode)
-
-        explore_constant = self.exploration_constant
-        # Choose a consistent action
-        action = self.uct(snode, explore_constant)
-        terminal, next_state, reward = self.mdp.step(snode.state, action)
-
-        anode = snode.children[action]
-        if root_STNnode is None:
-            root_STNnode = anode.STNNode
-
-        if not terminal:
-            snodes = anode.children
-            if next_state in snodes:
-                next_reward, lower, upper = self.selection_root_interval(snodes[next_state], root_STNnode)
-                reward += next_reward * self.mdp.discount_factor
-
-            else: # leaf
-                next_snode, _ = self.create_Snode_root_interval(next_state, snode.depth + 1, anode.stn, anode)
-                # legal interval of the root action node in the leaf node
-                lower, upper = anode.stn.get_legal_interval(root_STNnode)
-                reward += self.heuristic(next_snode) * self.mdp.discount_factor
-                anode.add_child(next_snode)
-                next_snode.update(reward, lower, upper)
-
+        stop, node = self.descend(snode, self.create_Snode_root_interval)
+        path = self._path
+        if not path:
+            # there are no possible actions in the root
+            return 0
+
+        # the legal interval of the root action node at the end of the descent
+        root_STNnode = path[0][1].STNNode
+        leaf = None
+        if stop == _DEAD_END:
+            value = 0
+            lower, upper = self.level_stn(node.parent).get_legal_interval(root_STNnode)
+        elif stop == _DEPTH:
+            value = self.heuristic(node)
+            lower, upper = self.level_stn(node.parent).get_legal_interval(root_STNnode)
         else:
-            # when the state is terminal set the lower and upper according to anode root
-            lower, upper = anode.stn.get_legal_interval(root_STNnode)
-
-        anode.update(reward, lower, upper)
-        snode.update(reward, lower, upper)
-        return reward, lower, upper
-
+            lower, upper = self.level_stn(path[-1][1]).get_legal_interval(root_STNnode)
+            value = None
+            if stop == _LEAF:
+                leaf = node[0]
+                value = self.heuristic(leaf)
+
+        discount_factor = self.mdp.discount_factor
+        for i in range(len(path) - 1, -1, -1):
+            snode, anode, reward = path[i]
+            value = reward if value is None else reward + value * discount_factor
+            if leaf is not None:
+                leaf.update(value, lower, upper)
+                leaf = None
+            anode.update(value, lower, upper)
+            snode.update(value, lower, upper)
+
+        return value, lower, upper
 
     def selection_root_interval_max(self, snode: "up.engines.C_Snode", root_STNnode: "up.plans.stn.STNPlanNode" = None):
         if len(snode.possible_actions) == 0:
@@ -456,9 +635,11 @@ class C_MCTS(Base_MCTS):
         if snode.depth > self.search_depth:
             # Stop if the search depth is reached
             return LinkedListNode(*snode.parent.stn.get_legal_interval(root_STNnode), self.heuristic(snode))
-        explore_constant = self.exploration_constant
         # Choose a consistent action
-        action = self.uct(snode, explore_constant)
+        action = self.choose_action(snode)
+        if action == -1:
+            # all the possible actions were found inconsistent
+            return self.selection_root_interval_max(snode, root_STNnode)
         terminal, next_state, reward = self.mdp.step(snode.state, action)
         anode = snode.children[action]
         if root_STNnode is None:
@@ -482,27 +663,258 @@ class C_MCTS(Base_MCTS):
         backup_node = snode.max_update(backup_node)
         return backup_node
 
+    def choose_action(self, snode: "up.engines.C_SNode"):
+        """
+        Chooses an action of `snode` with UCT and expands its child if it is not expanded yet.
+        Actions that turn out to be inconsistent are pruned and the choice is repeated.
+
+        :return: the chosen action, -1 if none of the possible actions is consistent
+        """
+        while snode.possible_actions:
+            action = self.uct(snode, self.exploration_constant)
+            if action in snode.children or snode.expand(action) is not None:
+                return action
+        return -1
+
+    def node_heuristic(self, snode: "up.engines.C_SNode"):
+        return self.heuristic(snode)
+
+    def create_leaf(self, create_snode, state: "up.engines.State", snode: "up.engines.C_SNode", anode: "up.engines.C_ANode"):
+        return create_snode(state, snode.depth + 1, self.level_stn(anode), anode)
+
+    def backup_leaf(self, leaf: "up.engines.C_SNode", value: float):
+        leaf.update(value)
+
+    def transposition_key(self, state: "up.engines.State", anode: "up.engines.C_ANode"):
+        # the timing of the state is summarized by the times of the action node that reached it
+        return state, anode.end_time, frozenset(anode.lower_bounds.items())
+
     def heuristic(self, snode: "up.engines.C_SNode"):
         current_time = 0
         lower_bounds = None
         if snode.parent:
-            current_time = snode.parent.stn.get_current_end_time()
-            lower_bounds = snode.parent.stn.get_lower_bound_potential_end_action()
-        h = up.engines.heuristics.TRPG(self.mdp, snode.state, current_time)
-        return h.get_heuristic(lower_bounds)
+            current_time = snode.parent.end_time
+            lower_bounds = snode.parent.lower_bounds
+        summary = self.heuristic_summary(snode) if self._incremental_heuristic else None
+        return self.mdp.trpg.get_heuristic(snode.state, current_time, lower_bounds, summary)
+
+    def heuristic_init(self, state, current_time, parent: "up.engines.C_SNode" = None):
+        """ The heuristic of the successor `state` of the state node `parent` at the end time `current_time` """
+        summary = None
+        if self._incremental_heuristic and parent is not None:
+            summary = self.mdp.trpg.summary(state, self.heuristic_summary(parent))
+        return self.mdp.trpg.get_heuristic(state, current_time, summary=summary)
+
+    def heuristic_summary(self, snode: "up.engines.C_SNode"):
+        """
+        The `TRPGSummary` of the state of `snode`, kept in `snode`.
+        It is derived from the summary of the parent state node if it has one
+        """
+        summary = snode.heuristic_summary
+        if summary is None:
+            parent = snode.parent.parent if snode.parent is not None else None
+            summary = self.mdp.trpg.summary(snode.state, parent.heuristic_summary if parent is not None else None)
+            snode.set_heuristic_summary(summary)
+        return summary
+
+    def evaluate_children(self, snode: "up.engines.C_SNode", actions: List["up.engines.Action"]):
+        """
+        Performs each action of `actions`, whose children are expanded,
+        and returns its reward with the heuristic value of the next state
+        """
+        if not self._batch_heuristic:
+            rewards = []
+            for action in actions:
+                terminal, next_state, reward = self.mdp.step(snode.state, action)
+                rewards.append(reward + self.mdp.discount_factor *
+                               self.heuristic_init(next_state, snode.children[action].end_time, snode))
+            return rewards
+
+        steps = [self.mdp.step(snode.state, action) for action in actions]
+        values = self.mdp.trpg.evaluate_batch([next_state for _, next_state, _ in steps],
+                                              [snode.children[action].end_time for action in actions])
+        return [reward + self.mdp.discount_factor * value for (_, _, reward), value in zip(steps, values)]
+
+
+class RootActionSummary:
+    """
+    The statistics of a root action merged over the trees of the root-parallel search.
+    The value is the count weighted average of the trees values and the best interval is
+    the interval of the tree with the highest value.
+    """
+    def __init__(self):
+        self.count = 0
+        self.value = 0.0
+        self._max_interval = None
+        self._max_interval_value = -math.inf
+
+    def merge(self, count, value, interval):
+        self.value = (self.value * self.count + value * count) / (self.count + count)
+        self.count += count
+        if interval is not None and value > self._max_interval_value:
+            self._max_interval_value = value
+            self._max_interval = interval
+
+    def max_interval(self):
+        return self._max_interval
+
+
+# The search parameters of the root-parallel workers, set before the pool is forked
+_worker_context = None
+
+
+def _root_summary(mcts: "Base_MCTS"):
+    """ Returns the (count, value, best interval) of each visited root action keyed by its id """
+    summary = {}
+    for action in mcts.root_node.possible_actions:
+        anode = mcts.root_node.children.get(action)
+        if anode is not None and anode.count > 0:
+            summary[action.id] = (anode.count, anode.value, anode.max_interval() if anode.isInterval else None)
+    return summary
+
+
+def _search_worker(seed: int):
+    """ Grows an independent tree from the root in a worker process of the root-parallel search """
+    create_mcts, mdps, search_time, selection_type, iterations = _worker_context
+    # the split MDP gets a distinct seed, so its rollouts are not correlated with the sampling of the MDP
+    for i, mdp in enumerate(mdps):
+        mdp.seed(seed + i)
+    mcts = create_mcts()
+    mcts.search(search_time, selection_type, iterations)
+    return _root_summary(mcts), mcts.iterations, mcts.search_seconds
+
+
+def root_parallel_search(create_mcts, mdp: "up.engines.MDP", workers: int, search_time: int, selection_type='avg',
+                         iterations=None, split_mdp: "up.engines.MDP" = None):
+    """
+    Root-parallel search - each of the `workers` processes grows an independent tree
+    created by `create_mcts` with a different seed for `search_time` seconds.
+    The statistics of the root actions are merged before the best action is chosen.
+
+    :param iterations: the amount of selections of each worker, if `None` the workers are bounded by `search_time`
+    :param split_mdp: the split MDP of the heuristic, seeded in the workers with the seed of `mdp` plus one
+    :return: the best action and its merged `RootActionSummary`, (-1, None) if no action was visited
+    :raises UPUsageError: if processes cannot be forked on this platform
+    """
+    global _worker_context
+    # the workers inherit the search parameters and the MDP from the forked process
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise UPUsageError(f"the root-parallel search of --workers {workers} needs the 'fork' start method of "
+                           f"processes, which is not available on this platform, use --workers 1")
+    mdps = [mdp] if split_mdp is None else [mdp, split_mdp]
+    _worker_context = (create_mcts, mdps, search_time, selection_type, iterations)
+    seeds = [mdp.random.randrange(2 ** 32) for _ in range(workers)]
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            results = pool.map(_search_worker, seeds)
+    finally:
+        _worker_context = None
+
+    summaries = [summary for summary, _, _ in results]
+    print_search_rate(sum(i for _, i, _ in results), max(seconds for _, _, seconds in results))
+
+    merged = {}
+    for summary in summaries:
+        for action_id, (count, value, interval) in summary.items():
+            merged.setdefault(action_id, RootActionSummary()).merge(count, value, interval)
+
+    # the same choice as `best_action`, the ids of the actions are in the order of the problem actions
+    best_id = -1
+    best_value = -math.inf
+    for action_id in sorted(merged):
+        if merged[action_id].value > best_value:
+            best_value = merged[action_id].value
+            best_id = action_id
+
+    if best_id == -1:
+        return -1, None
+    return mdp.action(best_id), merged[best_id]
+
+
+def reuse_subtree(action_node, state: "up.engines.State", fix_time=None):
+    """
+    Promotes the child of the executed `action_node` for the sampled `state` to the root of the next search step,
+    the depths of the subtree are rebased to the new root.
 
-    def heuristic_init(self, state, stn):
-        current_time = stn.get_current_end_time()
-        h = up.engines.heuristics.TRPG(self.mdp, state, current_time)
-        return h.get_heuristic()
+    :param fix_time: the execution time fixed for the action in the plan, given for TP-MCTS trees.
+                     The STNs of the subtree are re-anchored to it and the actions that become inconsistent are pruned.
+                     The nodes of a trail mode tree keep no STN, `C_MCTS` replays the subtree on the new plan
+    :return: the new root node, `None` if `state` was not reached in the search
+    """
+    root_node = action_node.children.get(state)
+    if root_node is None:
+        return None
+    action_node.detach(root_node)
+
+    executed_node = None
+    if fix_time is not None and action_node.stn is not None:
+        executed_node = action_node.STNNode
+        action_node.stn.fix_action_time(executed_node, fix_time)
+
+    depth_offset = root_node.depth
+    snodes = [root_node]
+    while snodes:
+        snode = snodes.pop()
+        snode.set_depth(snode.depth - depth_offset)
+        for action, anode in list(snode.children.items()):
+            if executed_node is not None:
+                anode.stn.fix_action_time(executed_node, fix_time)
+                if not anode.is_consistent():
+                    snode.remove_action(action)
+                    continue
+                anode.update_times()
+
+            for child_state, child in list(anode.children.items()):
+                if child.parent is anode:
+                    snodes.append(child)
+                else:
+                    # a node shared by the transposition table keeps the STNs of the path that created it
+                    del anode.children[child_state]
+    return root_node
+
+
+def check_parallel_reuse(workers: int, reuse: bool):
+    """ The trees of the root-parallel workers are not kept, so there is no subtree to reuse """
+    if workers > 1 and reuse:
+        raise UPUsageError("--reuse is not supported by the root-parallel search of --workers > 1")
+
+
+def report_step(step: int, mcts: "Base_MCTS" = None):
+    """ Reports the instrumentation statistics of the plan step, `mcts` is `None` in the root-parallel search """
+    if not instrumentation.is_enabled():
+        return
+    if mcts is None:
+        instrumentation.report(step)
+        return
+    rate = mcts.iterations / mcts.search_seconds if mcts.search_seconds > 0 else None
+    instrumentation.report(step, iterations=mcts.iterations, search_seconds=mcts.search_seconds,
+                           iterations_per_second=rate, tree_depth=instrumentation.tree_depth(mcts.root_node))
 
 
 def plan(mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int, exploration_constant: float,
-         selection_type='avg', k=10):
-    stn = create_init_stn(mdp)
+         selection_type='avg', k=10, workers=1, transposition=False, iterations=None, reuse=False,
+         node_store=False, numeric_type='fraction', batch_heuristic=False, incremental_heuristic=False,
+         stn_trail=False):
+    """
+    :param workers: the number of processes of the root-parallel search, 1 searches in this process
+    :param transposition: share the nodes of equivalent states in the search tree
+    :param iterations: the amount of selections in each step, if `None` each step is bounded by `search_time`
+    :param reuse: continue the search of the next step from the subtree of the executed action and sampled state.
+                  The values of the root interval approach are relative to the root, so its trees are not reused
+    :param node_store: keep the counts and values of the action nodes in the arrays of a `NodeStore`
+    :param numeric_type: the type of the bounds and distances of the STN, `int` is exact for integral durations
+    :param batch_heuristic: evaluate the k children of the max approach in one batch of the heuristic
+    :param incremental_heuristic: evaluate the heuristic of a state from the summary of its parent state
+    :param stn_trail: keep one STN in the search instead of a copy in each action node,
+                      the constraints of the descent are added in pushed levels
+    :raises UPUsageError: if `reuse` is combined with the root-parallel search
+    """
+    check_parallel_reuse(workers, reuse)
+    stn = create_init_stn(mdp, numeric_type)
+    # the states interned by the previous runs are not reached again
+    mdp.clear_states()
     root_state = mdp.initial_state()
 
-    reuse = False
     history = []
     previous_action_node = None
     step = 0
@@ -510,9 +922,21 @@ def plan(mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int,
 
     while stn.get_current_end_time() <= mdp.deadline():
         print(f"started step {step}")
-        mcts = C_MCTS(mdp, root_node, root_state, search_depth, exploration_constant, stn, selection_type, k,
-                      previous_action_node)
-        action = mcts.search(search_time, selection_type)
+        mcts = None
+        if workers > 1:
+            create_mcts = lambda: C_MCTS(mdp, None, root_state, search_depth, exploration_constant, stn,
+                                         selection_type, k, previous_action_node, transposition, node_store,
+                                         batch_heuristic, incremental_heuristic, stn_trail)
+            action, root_action_node = root_parallel_search(create_mcts, mdp, workers, search_time, selection_type,
+                                                            iterations)
+        else:
+            mcts = C_MCTS(mdp, root_node, root_state, search_depth, exploration_constant, stn, selection_type, k,
+                          previous_action_node, transposition, node_store, batch_heuristic,
+                          incremental_heuristic, stn_trail)
+            action = mcts.search(search_time, selection_type, iterations)
+            print_search_rate(mcts.iterations, mcts.search_seconds)
+            root_action_node = mcts.root_node.children.get(action)
+        report_step(step, mcts)
 
         if action == -1:
             print("A valid plan is not found")
@@ -521,19 +945,19 @@ def plan(mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int,
         print(f"Current state is {root_state}")
         print(f"The chosen action is {action.name}")
 
-        terminal, root_state, reward = mcts.mdp.step(root_state, action)
-
-        if reuse and root_state in mcts.root_node.children[action].children:
-            root_node = mcts.root_node.children[action].children[root_state]
-            root_node.set_depth(0)
+        terminal, root_state, reward = mdp.step(root_state, action)
 
         # update STN to include the action
-        action_node = mcts.root_node.children[action] if selection_type == 'rootInterval' else None
+        action_node = root_action_node if selection_type == 'rootInterval' else None
 
         previous_action_node = update_stn(stn, action, previous_action_node, type='SetTime', action_node=action_node)
 
         assert stn.is_consistent()
 
+        root_node = None
+        if reuse and mcts is not None and selection_type != 'rootInterval':
+            root_node = reuse_subtree(root_action_node, root_state, stn.get_current_time(previous_action_node))
+
         print(f"The time of the plan so far: {stn.get_current_end_time()}")
         history.append(previous_action_node)
 
@@ -550,7 +974,20 @@ def plan(mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int,
 
 def combination_plan(mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", steps: int, search_time: int,
                      search_depth: int, exploration_constant: float,
-                     selection_type='avg', k=10):
+                     selection_type='avg', k=10, workers=1, transposition=False, iterations=None, reuse=False,
+                     node_store=False, batch_heuristic=False):
+    """
+    :param workers: the number of processes of the root-parallel search, 1 searches in this process
+    :param transposition: share the nodes of equivalent states in the search tree
+    :param iterations: the amount of selections in each step, if `None` each step is bounded by `search_time`
+    :param reuse: continue the search of the next step from the subtree of the executed action and sampled state
+    :param node_store: keep the counts and values of the action nodes in the arrays of a `NodeStore`
+    :param batch_heuristic: evaluate the k children of the max approach in one batch of the heuristic
+    :raises UPUsageError: if `reuse` is combined with the root-parallel search
+    """
+    check_parallel_reuse(workers, reuse)
+    # the states interned by the previous runs are not reached again
+    mdp.clear_states()
     root_state = mdp.initial_state()
     history = []
     step = 0
@@ -558,14 +995,28 @@ def combination_plan(mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", steps:
 
     while root_state.current_time < mdp.deadline():
         print(f"started step {step}")
+        mcts = None
 
-        mcts = MCTS(mdp, split_mdp, root_node, root_state, search_depth, exploration_constant, selection_type, k)
-        action = mcts.search(search_time, selection_type)
+        if workers > 1:
+            create_mcts = lambda: MCTS(mdp, split_mdp, None, root_state, search_depth, exploration_constant,
+                                       selection_type, k, transposition, node_store, batch_heuristic)
+            action, _ = root_parallel_search(create_mcts, mdp, workers, search_time, selection_type, iterations,
+                                             split_mdp)
+        else:
+            mcts = MCTS(mdp, split_mdp, root_node, root_state, search_depth, exploration_constant, selection_type, k,
+                        transposition, node_store, batch_heuristic)
+            action = mcts.search(search_time, selection_type, iterations)
+            print_search_rate(mcts.iterations, mcts.search_seconds)
+        report_step(step, mcts)
 
         print(f"Current state is {root_state}")
         print(f"The chosen action is {action.name}")
 
-        terminal, root_state, reward = mcts.mdp.step(root_state, action)
+        terminal, root_state, reward = mdp.step(root_state, action)
+
+        root_node = None
+        if reuse and mcts is not None:
+            root_node = reuse_subtree(mcts.root_node.children[action], root_state)
 
         history.append(action)
         print(f'current time = {root_state.current_time}')
@@ -1,7 +1,8 @@
 import unified_planning as up
 import math
 import time
-import random
+from unified_planning.engines.solvers.evaluate import print_search_rate
+from unified_planning import instrumentation
 
 
 class RTDP:
@@ -9,9 +10,12 @@ class RTDP:
         self._mdp = mdp
         self._root_state = root_state
         self._search_depth = search_depth
+        # the Q values of a state are keyed by the ids of the actions
         self.Q = {}
         self.current_time = 0
         self.split_mdp = split_mdp
+        self.iterations = 0
+        self.search_seconds = 0
 
     @property
     def mdp(self):
@@ -28,13 +32,23 @@ class RTDP:
     def update_root(self, root_state):
         self._root_state = root_state
 
-    def search(self, timeout):
+    def search(self, timeout, iterations=None):
+        """
+        :param iterations: if not `None` the search performs this amount of trials instead of stopping after `timeout`
+        """
         start_time = time.time()
         current_time = time.time()
-        while current_time < start_time + timeout:
+        i = 0
+        if iterations is not None:
+            # the trials are not cut by the time
+            timeout = math.inf
+        while (current_time < start_time + timeout) if iterations is None else i < iterations:
             self.trial(timeout, start_time)
             current_time = time.time()
+            i += 1
 
+        self.iterations = i
+        self.search_seconds = time.time() - start_time
         best_action, _ = self.best_action(self.root_state)
         return best_action
 
@@ -78,7 +92,7 @@ class RTDP:
 
         for action in self.mdp.legal_actions(state):
             Q_s_a = self.eval_action(state, action)
-            self.Q[state][action] = Q_s_a
+            self.Q[state][action.id] = Q_s_a
             if Q_s_a > best_value:
                 best_a = [action]
                 best_value = Q_s_a
@@ -89,34 +103,38 @@ class RTDP:
             if current_time > start_time + timeout:
                 break
 
-        best_a = random.choice(best_a)
+        best_a = self.mdp.random.choice(best_a)
         return best_a, best_value
 
     def best_action(self, state: "up.engines.State"):
         best_a = []
         best_value = -math.inf
 
-        for action in self.Q[state]:
-            Q_s_a = self.Q[state][action]
+        for action_id, Q_s_a in self.Q[state].items():
             if Q_s_a > best_value:
-                best_a = [action]
+                best_a = [action_id]
                 best_value = Q_s_a
             elif Q_s_a == best_value:
-                best_a.append(action)
+                best_a.append(action_id)
 
-        best_a = random.choice(best_a)
-        return best_a, best_value
+        best_a = self.mdp.random.choice(best_a)
+        return self.mdp.action(best_a), best_value
 
 
     def heuristic(self, state: "up.engines.State"):
         current_time = 0
         if isinstance(state, up.engines.CombinationState):
             current_time = state.current_time
-        h = up.engines.heuristics.TRPG(self.split_mdp, state, current_time)
-        return h.get_heuristic()
+        return self.split_mdp.trpg.get_heuristic(state, current_time)
 
 
-def plan(mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int):
+def plan(mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", steps: int, search_time: int, search_depth: int,
+         iterations=None):
+    """
+    :param iterations: the amount of trials in each step, if `None` each step is bounded by `search_time`
+    """
+    # the states interned by the previous runs are not reached again
+    mdp.clear_states()
     root_state = mdp.initial_state()
 
     step = 0
@@ -125,7 +143,9 @@ def plan(mdp: "up.engines.MDP", split_mdp: "up.engines.MDP", steps: int, search_
 
     while root_state.current_time < mdp.deadline():
         print(f"started step {step}")
-        action = rtdp.search(search_time)
+        action = rtdp.search(search_time, iterations)
+        print_search_rate(rtdp.iterations, rtdp.search_seconds)
+        instrumentation.report(step, iterations=rtdp.iterations, search_seconds=rtdp.search_seconds)
 
         print(f"Current state is {root_state}")
         print(f"The chosen action is {action.name}")
@@ -1,23 +1,25 @@
 import unified_planning as up
+from unified_planning.exceptions import UPUsageError
 from typing import Tuple, List, Set
 
 import numpy as np
 
 
 class State(up.model.state.ROState):
+    """ An immutable state, its predicates are a frozenset and its hash is computed once """
     def __init__(self, predicates: Set["up.model.fnode.Fnode"] = None):
-        self._predicates = predicates if predicates else set()
+        self._predicates = frozenset(predicates) if predicates else frozenset()
+        self._hash = hash(self._predicates)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, State):
             return self.predicates == other.predicates
         return False
 
     def __hash__(self):
-        res = hash("")
-        for p in self._predicates:
-            res += hash(p)
-        return res
+        return self._hash
 
     def __repr__(self):
         s = []
@@ -32,30 +34,33 @@ class State(up.model.state.ROState):
         return self._predicates
 
     def set_predicates(self, new_predicates: Set):
-        self._predicates = new_predicates
+        raise UPUsageError("State is immutable")
 
     def get_value(self):
         return 0
 
 
 class CombinationState(State):
+    """
+    An immutable combination state, the action queue must not be modified after the state is created.
+    The current time is not part of the equality.
+    """
     def __init__(self, predicates: Set["up.model.fnode.Fnode"] = None, active_actions: "up.engines.ActionQueue" = None, current_time: int = None):
         super().__init__(predicates)
         self._active_actions = active_actions if active_actions else ActionQueue()
         self._current_time = current_time if current_time else 0
+        self._hash += hash(self._active_actions)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, State):
             return self.predicates == other.predicates \
                 and self.active_actions == other.active_actions
         return False
 
     def __hash__(self):
-        res = hash("")
-        for p in self._predicates:
-            res += hash(p)
-        res += hash(self._active_actions)
-        return res
+        return self._hash
 
     def __repr__(self):
         s = []
@@ -82,17 +87,124 @@ class CombinationState(State):
             return False
         return True
 
-    def add_action(self, action: "up.engines.DurativeAction"):
-        self.active_actions.add_action(QueueNode(action, action.duration.lower.int_constant_value()))
 
-    def get_next_actions(self):
-        return self.active_actions.get_next_actions()
+class PredicateIndex:
+    """
+    Maps the grounded predicates of a problem to bit positions,
+    a set of predicates is represented by the integer with the bits of its predicates set
+    """
+    def __init__(self, predicates=()):
+        self._bits = {}
+        self._predicates = []
+        for p in predicates:
+            self.bit(p)
 
-    def update_actions_delta(self, delta: int):
-        self.active_actions.update_delta(delta)
+    def __len__(self):
+        return len(self._predicates)
+
+    def bit(self, predicate: "up.model.fnode.FNode") -> int:
+        """ Returns the bit position of `predicate`, a new position is assigned to unknown predicates """
+        i = self._bits.get(predicate)
+        if i is None:
+            i = len(self._predicates)
+            self._bits[predicate] = i
+            self._predicates.append(predicate)
+        return i
+
+    def mask(self, predicates) -> int:
+        """ Returns the bitmask of `predicates` """
+        m = 0
+        for p in predicates:
+            m |= 1 << self.bit(p)
+        return m
+
+    def predicates(self, mask: int) -> frozenset:
+        """ Returns the predicates of the bitmask `mask` """
+        predicates = self._predicates
+        res = []
+        while mask:
+            low = mask & -mask
+            res.append(predicates[low.bit_length() - 1])
+            mask ^= low
+        return frozenset(res)
+
+
+class BitState(State):
+    """
+    An immutable state holding its predicates as a bitmask over a `PredicateIndex`.
+    The `predicates` set is decoded on first access.
+    """
+    def __init__(self, mask: int, index: PredicateIndex):
+        self._mask = mask
+        self._index = index
+        self._predicates = None
+        self._hash = hash(mask)
 
-    def add_to_time(self, delta):
-        self._current_time += delta
+    def __eq__(self, other):
+        # the hash is the hash of the mask, so only the bit states over the same index can be equal
+        if isinstance(other, BitState) and other._index is self._index:
+            return self._mask == other._mask
+        return False
+
+    def __hash__(self):
+        return self._hash
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def predicates(self):
+        if self._predicates is None:
+            self._predicates = self._index.predicates(self._mask)
+        return self._predicates
+
+    def set_predicates(self, new_predicates: Set):
+        raise UPUsageError("BitState is immutable")
+
+
+class CombinationBitState(CombinationState):
+    """
+    An immutable combination state holding its predicates as a bitmask over a `PredicateIndex`.
+    The `predicates` set is decoded on first access.
+    """
+    def __init__(self, mask: int, index: PredicateIndex, active_actions: "up.engines.ActionQueue" = None,
+                 current_time: int = None):
+        super().__init__(None, active_actions, current_time)
+        self._mask = mask
+        self._index = index
+        self._predicates = None
+        self._hash = hash(mask) + hash(self._active_actions)
+
+    def __eq__(self, other):
+        # the hash is the hash of the mask, so only the bit states over the same index can be equal
+        if isinstance(other, CombinationBitState) and other._index is self._index:
+            return self._mask == other._mask and self.active_actions == other.active_actions
+        return False
+
+    def __hash__(self):
+        return self._hash
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def predicates(self):
+        if self._predicates is None:
+            self._predicates = self._index.predicates(self._mask)
+        return self._predicates
+
+    def set_predicates(self, new_predicates: Set):
+        raise UPUsageError("CombinationBitState is immutable")
 
 
 import heapq
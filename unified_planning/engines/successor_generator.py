@@ -0,0 +1,79 @@
+from typing import Dict, Hashable, List, Tuple
+
+
+class SuccessorGenerator:
+    """
+    Watch index over the preconditions of the actions, in the style of the successor generators of
+    classical planners. Each action with positive preconditions watches the one of them that the fewest
+    actions require, and it is checked only in states where its watched predicate holds.
+    A query looks up the predicates of the state in the index, so its time depends on the size of the state
+    and on the actions whose watched predicate holds, and not on the amount of actions.
+    """
+    def __init__(self, preconditions: List[Tuple]):
+        """
+        :param preconditions: the (positive, negative) preconditions of each action,
+                              the actions are known by their index in `preconditions`
+        """
+        frequency: Dict[Hashable, int] = {}
+        for pos, _ in preconditions:
+            for fact in self._facts(pos):
+                frequency[fact] = frequency.get(fact, 0) + 1
+
+        self._watch: Dict[Hashable, List[Tuple]] = {}
+        # the actions without positive preconditions are checked in every state
+        self._unwatched: List[Tuple] = []
+        for i, (pos, neg) in enumerate(preconditions):
+            facts = self._facts(pos)
+            if facts:
+                fact = min(facts, key=frequency.get)
+                self._watch.setdefault(fact, []).append((i, pos, neg))
+            else:
+                self._unwatched.append((i, pos, neg))
+
+    @staticmethod
+    def _facts(pos):
+        return pos
+
+    def applicable(self, predicates) -> List[int]:
+        """ Returns the sorted indices of the actions whose preconditions hold in the state of `predicates` """
+        result = [i for i, _, neg in self._unwatched if neg.isdisjoint(predicates)]
+        watch = self._watch
+        for fact in predicates:
+            entries = watch.get(fact)
+            if entries is not None:
+                for i, pos, neg in entries:
+                    if pos.issubset(predicates) and neg.isdisjoint(predicates):
+                        result.append(i)
+        result.sort()
+        return result
+
+
+class MaskSuccessorGenerator(SuccessorGenerator):
+    """
+    The bitmask version of `SuccessorGenerator`, the preconditions are bitmasks over a `PredicateIndex`
+    and each action watches a single bit
+    """
+    @staticmethod
+    def _facts(mask: int):
+        bits = []
+        while mask:
+            low = mask & -mask
+            bits.append(low)
+            mask ^= low
+        return bits
+
+    def applicable(self, mask: int) -> List[int]:
+        """ Returns the sorted indices of the actions whose preconditions hold in the state of `mask` """
+        result = [i for i, _, neg in self._unwatched if not mask & neg]
+        watch = self._watch
+        bits = mask
+        while bits:
+            low = bits & -bits
+            entries = watch.get(low)
+            if entries is not None:
+                for i, pos, neg in entries:
+                    if mask & pos == pos and not mask & neg:
+                        result.append(i)
+            bits ^= low
+        result.sort()
+        return result
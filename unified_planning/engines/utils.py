@@ -1,12 +1,13 @@
 import unified_planning as up
 from typing import List
-def create_init_stn(mdp: "up.engines.MDP"):
+def create_init_stn(mdp: "up.engines.MDP", numeric_type: str = 'fraction'):
     """
     Initiate a new STN with StartPlan and EndPlan nodes
     :param mdp:
+    :param numeric_type: the type of the bounds and distances of the STN, one of `STNPlan` `NUMERIC_TYPES`
     :return:
     """
-    stn = up.plans.stn.STNPlan([])
+    stn = up.plans.stn.STNPlan([], numeric_type=numeric_type)
 
     if mdp.problem.deadline:  # Add the deadline to the STN
         deadline = mdp.problem.deadline
@@ -0,0 +1,127 @@
+"""
+Counters and cumulative timers of the hot path of the search.
+
+The functions of the hot path are marked with the `instrumented` decorator, which returns them unchanged,
+so the instrumentation costs nothing while it is disabled. `enable` replaces the marked functions by
+wrappers counting the calls and the time spent in them, and `report` writes the collected statistics
+of a plan step as a JSON line.
+"""
+import functools
+import json
+import sys
+import time
+
+
+# (function, name, count_failures) of the marked functions
+_registry = []
+_enabled = False
+_output = None
+_stats = {}
+
+
+def instrumented(name: str, failures: bool = False):
+    """
+    Marks a function or method of the hot path of the search
+
+    :param name: the name of the statistics of the function in the report
+    :param failures: if `True` the calls that return `False` are counted too
+    """
+    def decorator(func):
+        _registry.append((func, name, failures))
+        return func
+    return decorator
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _wrap(func, name, failures):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        stats = _stats.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        stats['calls'] += 1
+        stats['seconds'] += time.perf_counter() - start
+        if failures and result is False:
+            stats['failures'] = stats.get('failures', 0) + 1
+        return result
+    return wrapper
+
+
+def _owner(func):
+    """ Returns the module or class that holds `func` and its attribute name """
+    owner = sys.modules[func.__module__]
+    *path, attribute = func.__qualname__.split('.')
+    for part in path:
+        owner = getattr(owner, part)
+    return owner, attribute
+
+
+def enable(path: str = None):
+    """
+    Replaces the marked functions by counting wrappers
+
+    :param path: the file the reports are appended to, if `None` they are printed
+    """
+    global _enabled, _output
+    if _enabled:
+        return
+    for func, name, failures in _registry:
+        owner, attribute = _owner(func)
+        setattr(owner, attribute, _wrap(func, name, failures))
+    _output = path
+    _enabled = True
+
+
+def disable():
+    """ Restores the marked functions and drops the collected statistics """
+    global _enabled, _output
+    if not _enabled:
+        return
+    for func, _, _ in _registry:
+        owner, attribute = _owner(func)
+        setattr(owner, attribute, func)
+    _output = None
+    _enabled = False
+    _stats.clear()
+
+
+def count(name: str, amount: int = 1):
+    """ Increases the counter `name` of the current step """
+    if _enabled:
+        _stats[name] = _stats.get(name, 0) + amount
+
+
+def tree_depth(root_node) -> int:
+    """ Returns the depth of the deepest state node under `root_node`, relative to `root_node` """
+    depth = 0
+    visited = set()
+    snodes = [root_node]
+    while snodes:
+        snode = snodes.pop()
+        depth = max(depth, snode.depth - root_node.depth)
+        for anode in snode.children.values():
+            for child in anode.children.values():
+                if id(child) not in visited:
+                    visited.add(id(child))
+                    snodes.append(child)
+    return depth
+
+
+def report(step: int, **values):
+    """
+    Writes the statistics of the plan step `step` as a JSON line and starts the statistics of the next step
+
+    :param values: additional values of the step, e.g. the number of iterations
+    """
+    if not _enabled:
+        return
+    line = json.dumps({'step': step, **values, **_stats}, default=str)
+    if _output is None:
+        print(line)
+    else:
+        with open(_output, 'a') as file:
+            file.write(line + '\n')
+    _stats.clear()
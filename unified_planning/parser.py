@@ -13,5 +13,21 @@ parser.add_argument('-e', '--exploration_constant', help='the exploration consta
 parser.add_argument('-ge', '--garbage_amount', help='how many garbage actions to add to the domain', nargs='?', default=0, type=int)
 parser.add_argument('-oe', '--object_amount', help='how many different objects in the domain', nargs='?', default=1, type=int)
 parser.add_argument('-k', '--k', help='K random actions in the max planner', nargs='?', default=10, type=int)
+parser.add_argument('-cs', '--compact_state', help='represent the states as bitmasks of the grounded predicates', action='store_true')
+parser.add_argument('-w', '--workers', help='number of processes of the root-parallel MCTS search', nargs='?', default=1, type=int)
+parser.add_argument('-tt', '--transposition', help='share the MCTS nodes of equivalent states', action='store_true')
+parser.add_argument('-rs', '--seed', help='seed of the random generators of the run', nargs='?', default=None, type=int)
+parser.add_argument('-it', '--iterations', help='amount of search iterations in each step instead of the search time', nargs='?', default=None, type=int)
+parser.add_argument('-in', '--instrument', help='file the per step instrumentation statistics are written to as JSON lines', nargs='?', default=None)
+parser.add_argument('-ru', '--reuse', help='reuse the subtree of the executed action in the next MCTS step', action='store_true')
+parser.add_argument('-ns', '--node_store', help='keep the MCTS action node statistics in NumPy arrays', action='store_true')
+parser.add_argument('-is', '--intern_states', help='keep the states in a pool so equal states are the same object', action='store_true')
+parser.add_argument('-nt', '--numeric_type', help='numeric type of the STN bounds', nargs='?', default='fraction', choices=['fraction', 'int', 'float'])
+parser.add_argument('-hc', '--heuristic_cache', help='size of the LRU cache of the heuristic values, 0 for no cache', nargs='?', default=0, type=int)
+parser.add_argument('-cp', '--cache_probabilistic', help='cache the heuristic values of domains with probabilistic effects too', action='store_true')
+parser.add_argument('-bh', '--batch_heuristic', help='evaluate the k children of the max approach in one batch of the heuristic', action='store_true')
+parser.add_argument('-pm', '--probabilistic_mode', help='how the heuristic applies the probabilistic effects', nargs='?', default='sample', choices=['sample', 'all', 'most_likely'])
+parser.add_argument('-ih', '--incremental_heuristic', help='evaluate the heuristic of a state node from the summary of its parent', action='store_true')
+parser.add_argument('-tr', '--stn_trail', help='keep one STN in the MCTS search and undo the constraints of each descent instead of an STN copy in each node', action='store_true')
 
 args = parser.parse_args()
\ No newline at end of file
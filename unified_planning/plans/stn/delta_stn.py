@@ -14,6 +14,7 @@
 #
 
 
+import math
 from collections import deque
 from dataclasses import dataclass
 from numbers import Real
@@ -21,11 +22,15 @@ from typing import Deque, Dict, List, Optional, Any, Generic, Set, Tuple, TypeVa
 import networkx as nx
 
 import unified_planning
+from unified_planning.exceptions import UPUsageError
 
 # from unified_planning.plans.stn import Graph
 
 T = TypeVar("T", bound=Real)
 
+# The old value in the trail of a key that was not in its dictionary
+_MISSING = object()
+
 
 @dataclass
 class DeltaNeighbors(Generic[T]):
@@ -65,6 +70,9 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         distances: Optional[Dict[Any, T]] = None,
         is_sat: bool = True,
         epsilon: T = cast(T, 0),
+        successors: Optional[Dict[Any, Optional[DeltaNeighbors[T]]]] = None,
+        forward_source: Any = None,
+        forward_distances: Optional[Dict[Any, T]] = None,
     ):
         self._constraints: Dict[Any, Optional[DeltaNeighbors[T]]] = (
             constraints if constraints is not None else {}
@@ -72,6 +80,23 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         self._distances: Dict[Any, T] = distances if distances is not None else {}
         self._is_sat = is_sat
         self._epsilon: T = epsilon
+        # The reverse of `_constraints`: for the constraint `x - y <= b` the
+        # neighbor `(x, b)` is in the list of `y`. It is built by the first
+        # `shortest_path` query and maintained from then on.
+        self._successors: Optional[Dict[Any, Optional[DeltaNeighbors[T]]]] = successors
+        # The shortest path distances from `_forward_source`, `None` when they
+        # must be recalculated.
+        self._forward_source = forward_source
+        self._forward_distances: Optional[Dict[Any, T]] = forward_distances
+        # `True` when the dictionaries may be shared with a copy of this STN,
+        # they are copied before this STN changes them.
+        self._shared = False
+        # Incremented when `_forward_distances` is replaced or invalidated.
+        self._forward_version = 0
+        # The undo trail of the pushed levels: the (dictionary attribute, key,
+        # old value) of each change, `None` when no level is pushed.
+        self._trail: Optional[List[Tuple[str, Any, Any]]] = None
+        self._levels: List[Tuple[int, bool, bool, int]] = []
 
     def __repr__(self) -> str:
         res = []
@@ -97,13 +122,34 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         """
         Returns another `DeltaSimpleTemporalNetwork` with all the constraints
         already present in self.
+
+        The copy is copy-on-write: the 2 STNs share the dictionaries until one
+        of them is changed, so copying is O(1) and an STN that is copied and
+        never changed, like the STN of an expanded search node, is not duplicated.
         """
-        return DeltaSimpleTemporalNetwork(
-            self._constraints.copy(),
-            self._distances.copy(),
+        self._shared = True
+        new_stn = DeltaSimpleTemporalNetwork(
+            self._constraints,
+            self._distances,
             self._is_sat,
             self._epsilon,
+            self._successors,
+            self._forward_source,
+            self._forward_distances,
         )
+        new_stn._shared = True
+        return new_stn
+
+    def _unshare(self):
+        """Copies the dictionaries this STN may share with its copies, before changing them."""
+        if self._shared:
+            self._constraints = self._constraints.copy()
+            self._distances = self._distances.copy()
+            if self._successors is not None:
+                self._successors = self._successors.copy()
+            if self._forward_distances is not None:
+                self._forward_distances = self._forward_distances.copy()
+            self._shared = False
 
     def add(self, x: Any, y: Any, b: T):
         """
@@ -118,14 +164,81 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
             event `x`.
         """
         if self._is_sat:
-            self._distances.setdefault(x, cast(T, 0))
-            self._distances.setdefault(y, cast(T, 0))
+            self._unshare()
+            self._setdefault("_distances", x, cast(T, 0))
+            self._setdefault("_distances", y, cast(T, 0))
             x_constraints = self._constraints.get(x, None)
-            self._constraints.setdefault(y, None)
+            self._setdefault("_constraints", y, None)
             if not self._is_subsumed(x, y, b):
                 neighbor = DeltaNeighbors(y, b, x_constraints)
-                self._constraints[x] = neighbor
+                self._set("_constraints", x, neighbor)
                 self._is_sat = self._inc_check(x, y, b)
+                if self._successors is not None:
+                    self._setdefault("_successors", x, None)
+                    self._set("_successors", y, DeltaNeighbors(x, b, self._successors.get(y, None)))
+                    # an inconsistent STN has no shortest paths, so its forward distances are kept
+                    # as they are, and a `pop` of the inconsistent constraint keeps them valid
+                    if self._is_sat and self._forward_distances is not None:
+                        self._inc_forward(x, y, b)
+
+    def _set(self, name: str, key: Any, value: Any):
+        """Sets `key` of the dictionary attribute `name`, keeping the old value in the trail."""
+        d = getattr(self, name)
+        if self._trail is not None:
+            self._trail.append((name, key, d.get(key, _MISSING)))
+        d[key] = value
+
+    def _setdefault(self, name: str, key: Any, value: Any):
+        """Sets `key` of the dictionary attribute `name` if it is not set, keeping it in the trail."""
+        d = getattr(self, name)
+        if key not in d:
+            if self._trail is not None:
+                self._trail.append((name, key, _MISSING))
+            d[key] = value
+
+    def _invalidate_forward(self):
+        self._forward_distances = None
+        self._forward_version += 1
+
+    def push(self):
+        """
+        Starts a new level of changes; `pop` undoes all the changes made to this
+        STN since the matching `push`. The levels can be nested.
+        """
+        if self._trail is None:
+            self._trail = []
+        self._levels.append(
+            (len(self._trail), self._is_sat, self._successors is None, self._forward_version)
+        )
+
+    def pop(self):
+        """Undoes the changes made since the last `push`, using the trail of the changed values."""
+        if not self._levels:
+            raise UPUsageError("pop of a DeltaSimpleTemporalNetwork without a matching push.")
+        mark, is_sat, no_successors, forward_version = self._levels.pop()
+        self._unshare()
+        trail = self._trail
+        assert trail is not None
+        # The structures built or invalidated in this level are dropped instead of undone
+        skip = set()
+        if no_successors:
+            self._successors = None
+            skip.add("_successors")
+        if forward_version != self._forward_version:
+            self._invalidate_forward()
+            skip.add("_forward_distances")
+        while len(trail) > mark:
+            name, key, old = trail.pop()
+            if name in skip:
+                continue
+            d = getattr(self, name)
+            if old is _MISSING:
+                del d[key]
+            else:
+                d[key] = old
+        self._is_sat = is_sat
+        if not self._levels:
+            self._trail = None
 
     def check_stn(self) -> bool:
         """Checks the consistency of this STN."""
@@ -153,24 +266,106 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         return False
 
     def _inc_check(self, x: Any, y: Any, b: T) -> bool:
-        x_dist = self._distances[x]
+        distances = self._distances
+        trail = self._trail
+        # with float bounds, a distance is shortened only by more than the rounding epsilon
+        epsilon = self._epsilon
+        x_dist = distances[x]
         x_plus_b = x_dist + b
-        if x_plus_b < self._distances[y]:
-            self._distances[y] = x_plus_b
+        if x_plus_b < distances[y] - epsilon:
+            if trail is not None:
+                trail.append(("_distances", y, distances[y]))
+            distances[y] = x_plus_b
             queue: Deque[Any] = deque()
             queue.append(y)
             while queue:
                 c = queue.popleft()
                 n = self._constraints[c]
                 while n is not None:
-                    if self._distances[c] + n.bound < self._distances[n.dst]:
+                    if distances[c] + n.bound < distances[n.dst] - epsilon:
                         if n.dst == y and abs(n.bound - b) <= self._epsilon:
                             return False
-                        self._distances[n.dst] = self._distances[c] + n.bound
+                        if trail is not None:
+                            trail.append(("_distances", n.dst, distances[n.dst]))
+                        distances[n.dst] = distances[c] + n.bound
                         queue.append(n.dst)
                     n = n.next
         return True
 
+    def _inc_forward(self, x: Any, y: Any, b: T):
+        """
+        Updates the shortest path distances from the forward source after the
+        constraint `x - y <= b` (the arc from `y` to `x` of length `b`) is added.
+        """
+        forward = self._forward_distances
+        assert forward is not None and self._successors is not None
+        epsilon = self._epsilon
+        self._setdefault("_forward_distances", x, cast(T, math.inf))
+        self._setdefault("_forward_distances", y, cast(T, math.inf))
+        y_dist = forward[y]
+        if y_dist + b < forward[x] - epsilon:
+            self._set("_forward_distances", x, y_dist + b)
+            queue: Deque[Any] = deque()
+            queue.append(x)
+            while queue:
+                c = queue.popleft()
+                n = self._successors[c]
+                while n is not None:
+                    if forward[c] + n.bound < forward.get(n.dst, math.inf) - epsilon:
+                        self._set("_forward_distances", n.dst, forward[c] + n.bound)
+                        queue.append(n.dst)
+                    n = n.next
+
+    def _calculate_forward(self, source: Any):
+        """
+        Calculates the shortest path distances from `source` to every event with
+        the Bellman-Ford (queue based) algorithm on the consistent STN.
+        """
+        if self._successors is None:
+            self._successors = {y: None for y in self._constraints}
+            for x, neighbor in self._constraints.items():
+                while neighbor is not None:
+                    self._successors[neighbor.dst] = DeltaNeighbors(
+                        x, neighbor.bound, self._successors[neighbor.dst]
+                    )
+                    neighbor = neighbor.next
+        epsilon = self._epsilon
+        forward: Dict[Any, T] = {source: cast(T, 0)}
+        queue: Deque[Any] = deque()
+        queue.append(source)
+        while queue:
+            c = queue.popleft()
+            n = self._successors.get(c, None)
+            while n is not None:
+                if forward[c] + n.bound < forward.get(n.dst, math.inf) - epsilon:
+                    forward[n.dst] = forward[c] + n.bound
+                    queue.append(n.dst)
+                n = n.next
+        self._forward_source = source
+        self._forward_distances = forward
+        self._forward_version += 1
+
+    def shortest_path(self, start_node: Any, target_node: Any) -> T:
+        """
+        Returns the length of the shortest path from `start_node` to `target_node`,
+        this is the maximum time that can elapse from `start_node` to `target_node`.
+
+        The distances from `start_node` are calculated on the first query and
+        then maintained incrementally when constraints are added, so later
+        queries from the same `start_node` are a lookup.
+
+        :param start_node: starts the path from start_node.
+        :param target_node: ends the path at target_node.
+        :return: the shortest path between start_node and target_node,
+            `math.inf` if there is no path.
+        """
+        if not self._is_sat:
+            raise UPUsageError("The shortest path is not defined in an inconsistent STN.")
+        if self._forward_distances is None or self._forward_source != start_node:
+            self._calculate_forward(start_node)
+        assert self._forward_distances is not None
+        return self._forward_distances.get(target_node, cast(T, math.inf))
+
     def insert_interval(
         self,
         left_event: Any,
@@ -202,8 +397,9 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         if right_bound is not None:
             self.add(right_event, left_event, right_bound)
         if left_bound is None and right_bound is None:
-            self._distances.setdefault(left_event, cast(T, 0))
-            self._distances.setdefault(right_event, cast(T, 0))
+            self._unshare()
+            self._setdefault("_distances", left_event, cast(T, 0))
+            self._setdefault("_distances", right_event, cast(T, 0))
 
     def get_constraints(self) -> Dict[Any, List[Tuple[T, Any]]]:
         """
@@ -228,13 +424,83 @@ class DeltaSimpleTemporalNetwork(Generic[T]):
         return constraints
 
     def remove_endPlan_constraint(self, x: Any, end_plan):
+        self._unshare()
         neighbor = self._constraints[x]
         new_constraints: DeltaNeighbors = None
+        removed = False
+        tight = False
+        forward = self._forward_distances
         while neighbor is not None:
             if neighbor.dst != end_plan:
                 new_constraints = DeltaNeighbors(neighbor.dst, neighbor.bound, new_constraints)
+            else:
+                removed = True
+                # the forward distances may depend on a removed arc on a shortest path
+                if forward is not None and self._is_sat and x != self._forward_source and \
+                        forward.get(x, math.inf) < math.inf and \
+                        forward.get(neighbor.dst, math.inf) + neighbor.bound <= forward[x] + self._epsilon:
+                    tight = True
             neighbor = neighbor.next
-        self._constraints[x] = new_constraints
+        self._set("_constraints", x, new_constraints)
+
+        if removed and self._successors is not None:
+            neighbor = self._successors.get(end_plan, None)
+            new_successors: DeltaNeighbors = None
+            while neighbor is not None:
+                # the events are compared as dictionary keys, like `_constraints[x]`
+                if hash(neighbor.dst) != hash(x) or neighbor.dst != x:
+                    new_successors = DeltaNeighbors(neighbor.dst, neighbor.bound, new_successors)
+                neighbor = neighbor.next
+            self._set("_successors", end_plan, new_successors)
+
+        if tight:
+            self._dec_forward(x)
+
+    def _dec_forward(self, x: Any):
+        """
+        Updates the shortest path distances from the forward source after an arc
+        to `x` on a shortest path is removed. Only the events whose shortest
+        paths may pass through the arc, the events reached from `x` by tight
+        arcs, are recalculated from the rest of the distances, which do not change.
+        """
+        forward = self._forward_distances
+        assert forward is not None and self._successors is not None
+        epsilon = self._epsilon
+        source = self._forward_source
+        affected = {x}
+        queue: Deque[Any] = deque()
+        queue.append(x)
+        while queue:
+            c = queue.popleft()
+            n = self._successors.get(c, None)
+            while n is not None:
+                if n.dst not in affected and n.dst != source and \
+                        forward[c] + n.bound <= forward.get(n.dst, math.inf) + epsilon:
+                    affected.add(n.dst)
+                    queue.append(n.dst)
+                n = n.next
+
+        # the distances of the affected events through the events that are not affected
+        for c in affected:
+            distance = cast(T, math.inf)
+            n = self._constraints.get(c, None)
+            while n is not None:
+                if n.dst not in affected and forward.get(n.dst, math.inf) + n.bound < distance:
+                    distance = forward[n.dst] + n.bound
+                n = n.next
+            self._set("_forward_distances", c, distance)
+            if distance < math.inf:
+                queue.append(c)
+
+        # the distances through the other affected events, the events that are not affected cannot get shorter
+        while queue:
+            c = queue.popleft()
+            n = self._successors.get(c, None)
+            while n is not None:
+                if n.dst in affected and forward[c] + n.bound < forward[n.dst] - epsilon:
+                    self._set("_forward_distances", n.dst, forward[c] + n.bound)
+                    queue.append(n.dst)
+                n = n.next
 
     def calculate_shortest_path1(self, start_node):
         vertices = self._constraints.keys()
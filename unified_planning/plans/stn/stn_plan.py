@@ -20,6 +20,7 @@ import unified_planning
 import unified_planning as up
 from unified_planning.environment import Environment
 from unified_planning.exceptions import UPUsageError
+from unified_planning.instrumentation import instrumented
 from unified_planning.plans.stn import DeltaSimpleTemporalNetwork
 from unified_planning.model import TimepointKind
 from unified_planning.plans.plan import ActionInstance
@@ -100,6 +101,34 @@ class STNPlanNode:
         return None
 
 
+def _fraction_bound(bound: Real) -> Fraction:
+    return Fraction(float(bound))
+
+
+def _int_bound(bound: Real) -> Real:
+    value = float(bound)
+    return int(value) if value.is_integer() else value
+
+
+def _float_bound(bound: Real) -> float:
+    return float(bound)
+
+
+# The numeric types of the bounds and distances of the STN of an `STNPlan`:
+# the function converting a bound and the epsilon of the `DeltaSimpleTemporalNetwork`.
+# `int` keeps the integral bounds as exact ints and the others as floats.
+NUMERIC_TYPES: Dict[str, Tuple[Callable[[Real], Real], Real]] = {
+    "fraction": (_fraction_bound, 0),
+    "int": (_int_bound, 1e-9),
+    "float": (_float_bound, 1e-9),
+}
+
+
+def _time(value: Real) -> Real:
+    """Returns the time of an STN value, the numerator of a `Fraction`."""
+    return value.numerator if isinstance(value, Fraction) else value
+
+
 def flatten_dict_structure(
     d: Dict[STNPlanNode, List[Tuple[Optional[Real], Optional[Real], STNPlanNode]]]
 ) -> Iterator[Tuple[STNPlanNode, Optional[Real], Optional[Real], STNPlanNode]]:
@@ -136,6 +165,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         ],
         environment: Optional["Environment"] = None,
         _stn: Optional[DeltaSimpleTemporalNetwork[Fraction]] = None,
+        numeric_type: str = "fraction",
     ):
         """
         Constructs the `STNPlan` with 2 different possible representations:
@@ -156,8 +186,16 @@ class STNPlan(unified_planning.plans.plan.Plan):
             constraints are created; this parameters is ignored if there is
             another environment in the action instances given in the constraints.
         :param _stn: Internal parameter, not to be used!
+        :param numeric_type: The type of the bounds and distances of the STN, one
+            of `NUMERIC_TYPES`: `fraction` is exact, `int` is exact for integral
+            bounds and is faster, `float` compares the distances with an epsilon.
         :return: The created `STNPlan`.
         """
+        if numeric_type not in NUMERIC_TYPES:
+            raise UPUsageError(f"Unknown numeric type {numeric_type} of the STNPlan.")
+        self._numeric_type = numeric_type
+        self._number, epsilon = NUMERIC_TYPES[numeric_type]
+        self._potential_end_actions_trail: List[Dict[STNPlanNode, STNPlanNode]] = []
         assert (
             _stn is None or not constraints
         ), "_stn and constraints can't be both given"
@@ -206,10 +244,10 @@ class STNPlan(unified_planning.plans.plan.Plan):
             unified_planning.plans.plan.Plan.__init__(self, unified_planning.plans.plan.PlanKind.STN_PLAN, env)
 
         # Create and populate the DeltaSTN
-        self._stn = DeltaSimpleTemporalNetwork()
+        self._stn = DeltaSimpleTemporalNetwork(epsilon=epsilon)
         start_plan = STNPlanNode(TimepointKind.GLOBAL_START)
         end_plan = STNPlanNode(TimepointKind.GLOBAL_END)
-        self._stn.insert_interval(start_plan, end_plan, left_bound=Fraction(0))
+        self._stn.insert_interval(start_plan, end_plan, left_bound=self._number(0))
         if isinstance(constraints, List):
             gen: Iterator[
                 Tuple[STNPlanNode, Optional[Real], Optional[Real], STNPlanNode]
@@ -217,7 +255,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         else:
             assert isinstance(constraints, Dict), "Typing not respected"
             gen = flatten_dict_structure(constraints)
-        f0 = Fraction(0)
+        f0 = self._number(0)
         for a_node, lower_bound, upper_bound, b_node in gen:
             if (
                 a_node.environment is not None
@@ -233,8 +271,8 @@ class STNPlan(unified_planning.plans.plan.Plan):
             self._stn.insert_interval(a_node, end_plan, left_bound=f0)
             self._stn.insert_interval(start_plan, b_node, left_bound=f0)
             self._stn.insert_interval(b_node, end_plan, left_bound=f0)
-            lb = None if lower_bound is None else Fraction(float(lower_bound))
-            ub = None if upper_bound is None else Fraction(float(upper_bound))
+            lb = None if lower_bound is None else self._number(lower_bound)
+            ub = None if upper_bound is None else self._number(upper_bound)
             self._stn.insert_interval(a_node, b_node, left_bound=lb, right_bound=ub)
 
         self._potential_end_actions = {}
@@ -276,11 +314,46 @@ class STNPlan(unified_planning.plans.plan.Plan):
         else:
             return False
 
-    def clone(self):
-        new_stnPlan = STNPlan([], _stn=self._stn.copy_stn())
-        new_stnPlan._potential_end_actions = self._potential_end_actions.copy()
+    @classmethod
+    def _from_stn(
+        cls,
+        stn: DeltaSimpleTemporalNetwork[Fraction],
+        environment: "Environment",
+        potential_end_actions: Dict[STNPlanNode, STNPlanNode],
+        numeric_type: str = "fraction",
+    ) -> "STNPlan":
+        """
+        Internal constructor of the `STNPlan` of `stn` in the given `environment`;
+        unlike the `_stn` parameter of the constructor, the environment is not
+        searched in the constraints of `stn`.
+        """
+        new_stnPlan = cls.__new__(cls)
+        unified_planning.plans.plan.Plan.__init__(new_stnPlan, unified_planning.plans.plan.PlanKind.STN_PLAN, environment)
+        new_stnPlan._stn = stn
+        new_stnPlan._potential_end_actions = potential_end_actions
+        new_stnPlan._numeric_type = numeric_type
+        new_stnPlan._number = NUMERIC_TYPES[numeric_type][0]
+        new_stnPlan._potential_end_actions_trail = []
         return new_stnPlan
 
+    def push(self):
+        """
+        Starts a new level of changes of this `STNPlan`; `pop` undoes the constraints
+        added since the matching `push`, without copying the STN.
+        """
+        self._stn.push()
+        self._potential_end_actions_trail.append(self._potential_end_actions.copy())
+
+    def pop(self):
+        """Undoes the changes made to this `STNPlan` since the last `push`."""
+        self._stn.pop()
+        self._potential_end_actions = self._potential_end_actions_trail.pop()
+
+    @instrumented('stn.clone')
+    def clone(self):
+        return STNPlan._from_stn(self._stn.copy_stn(), self._environment, self._potential_end_actions.copy(),
+                                 self._numeric_type)
+
     def get_constraints(
         self,
     ) -> Dict[
@@ -406,14 +479,15 @@ class STNPlan(unified_planning.plans.plan.Plan):
                 if r_node in nodes_to_remove:
                     left_nodes.setdefault(r_node, set()).add((l_node, sum_dist))
 
-        new_stn: DeltaSimpleTemporalNetwork = DeltaSimpleTemporalNetwork()
+        new_stn: DeltaSimpleTemporalNetwork = DeltaSimpleTemporalNetwork(epsilon=NUMERIC_TYPES[self._numeric_type][1])
         for r_node, constraints in new_constraints.items():
             if not r_node in nodes_to_remove:
                 for bound, l_node in constraints:
                     if not l_node in nodes_to_remove:
                         new_stn.add(r_node, l_node, bound)
 
-        return STNPlan(constraints={}, environment=self._environment, _stn=new_stn)
+        return STNPlan(constraints={}, environment=self._environment, _stn=new_stn,
+                       numeric_type=self._numeric_type)
 
     def convert_to(
         self,
@@ -448,31 +522,30 @@ class STNPlan(unified_planning.plans.plan.Plan):
         """
         Returns the end time according to the STN when the actions are performed in the erliest time possible
         """
-        return self._stn.get_stn_model(up.plans.stn.STNPlanNode(up.model.timing.TimepointKind.GLOBAL_END)).numerator
+        return _time(self._stn.get_stn_model(up.plans.stn.STNPlanNode(up.model.timing.TimepointKind.GLOBAL_END)))
 
     def get_current_time(self, node: "up.plans.stn.STNPlanNode"):
         """
             Returns the earliest tine node can be executed according to the STN constraints
         """
-        return self._stn.get_stn_model(node).numerator
+        return _time(self._stn.get_stn_model(node))
 
+    @instrumented('stn.get_legal_interval')
     def get_legal_interval(self, node: "up.plans.stn.STNPlanNode"):
         """
         Legal interval for this node in the current plan.
         """
-        lower = self._stn.get_stn_model(node).numerator
+        lower = _time(self._stn.get_stn_model(node))
         start_plan = STNPlanNode(TimepointKind.GLOBAL_START)
-        # apsp = self._stn.calculate_shortest_path1(start_plan)
-        # upper = apsp[node].numerator
-        sp = self._stn.calculate_shortest_path(start_plan, node)
-        upper = sp.numerator
+        sp = self._stn.shortest_path(start_plan, node)
+        upper = _time(sp)
         return lower, upper
 
     def get_lower_bound_potential_end_action(self):
         lower_bounds = {}
         for action_node in self._potential_end_actions:
             action = action_node.action_instance.action
-            lower_bounds[action] = self._stn.get_stn_model(action_node).numerator
+            lower_bounds[action] = _time(self._stn.get_stn_model(action_node))
         return lower_bounds
 
     def get_upper_bound_node(self, node: "up.plans.stn.STNPlanNode"):
@@ -480,7 +553,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         Returns the latest tine node can be executed according to the STN constraints
         """
         start_plan = STNPlanNode(TimepointKind.GLOBAL_START)
-        upper = self._stn.calculate_shortest_path(start_plan, node)
+        upper = self._stn.shortest_path(start_plan, node)
         return upper
 
 
@@ -495,7 +568,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         else:
             assert isinstance(constraints, Dict), "Typing not respected"
             gen = flatten_dict_structure(constraints)
-        f0 = Fraction(0)
+        f0 = self._number(0)
         for a_node, lower_bound, upper_bound, b_node in gen:
             if (
                 a_node.environment is not None
@@ -517,8 +590,8 @@ class STNPlan(unified_planning.plans.plan.Plan):
 
             self._stn.remove_endPlan_constraint(a_node, end_plan) # TODO: remove?
             self._stn.insert_interval(b_node, end_plan, left_bound=f0)
-            lb = None if lower_bound is None else Fraction(float(lower_bound))
-            ub = None if upper_bound is None else Fraction(float(upper_bound))
+            lb = None if lower_bound is None else self._number(lower_bound)
+            ub = None if upper_bound is None else self._number(upper_bound)
             self._stn.insert_interval(a_node, b_node, left_bound=lb, right_bound=ub)
 
             for potential in self._potential_end_actions.keys():
@@ -529,7 +602,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         """ Adds the end action as a chosen action
          - The end action must be before the end plan
          - and before all potential end action not yet chosen"""
-        f0 = Fraction(0)
+        f0 = self._number(0)
         for a_node, b_node in constraints:
             if (
                 a_node.environment is not None
@@ -558,7 +631,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
                 "End action can not be inserted in this action to the STNPlan!"
             )
 
-        f0 = Fraction(0)
+        f0 = self._number(0)
         if (action.environment is not None
                     and action.environment != self._environment ):
                 raise UPUsageError(
@@ -577,7 +650,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         frac, whole = math.modf(fix_time)
         fix_time = whole if frac < 0.002 else fix_time
 
-        f_fix_time = Fraction(fix_time)
+        f_fix_time = self._number(fix_time)
         if (action.environment is not None
                     and action.environment != self._environment ):
                 raise UPUsageError(
@@ -595,7 +668,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         """
         start_plan = STNPlanNode(TimepointKind.GLOBAL_START)
         end_plan = STNPlanNode(TimepointKind.GLOBAL_END)
-        f_deadline = Fraction(deadline)
+        f_deadline = self._number(deadline)
         self._stn.insert_interval(start_plan, end_plan, right_bound=f_deadline)
 
     def add_potential_end_action(self, constraints: Union[
@@ -621,7 +694,7 @@ class STNPlan(unified_planning.plans.plan.Plan):
         else:
             assert isinstance(constraints, Dict), "Typing not respected"
             gen = flatten_dict_structure(constraints)
-        f0 = Fraction(0)
+        f0 = self._number(0)
         for a_node, lower_bound, upper_bound, b_node in gen:
             if (
                 a_node.environment is not None
@@ -635,8 +708,8 @@ class STNPlan(unified_planning.plans.plan.Plan):
                 )
             # start_plan = STNPlanNode(TimepointKind.GLOBAL_START)
             # self._stn.insert_interval(start_plan, b_node, left_bound=f0)
-            lb = None if lower_bound is None else Fraction(float(lower_bound))
-            ub = None if upper_bound is None else Fraction(float(upper_bound))
+            lb = None if lower_bound is None else self._number(lower_bound)
+            ub = None if upper_bound is None else self._number(upper_bound)
             self._stn.insert_interval(a_node, b_node, left_bound=lb, right_bound=ub)
 
             self._potential_end_actions[b_node] = a_node
@@ -43,10 +43,38 @@ def print_stats():
     print(f'Object Amount = {up.args.object_amount}')
     print(f'Garbage Action Amount = {up.args.garbage_amount}')
     print(f'K Random Actions = {up.args.k}')
+    print(f'Compact State = {up.args.compact_state}')
+    print(f'Workers = {up.args.workers}')
+    print(f'Transposition = {up.args.transposition}')
+    print(f'Seed = {up.args.seed}')
+    print(f'Iterations = {up.args.iterations}')
+    print(f'Instrument = {up.args.instrument}')
+    print(f'Reuse = {up.args.reuse}')
+    print(f'Node Store = {up.args.node_store}')
+    print(f'Intern States = {up.args.intern_states}')
+    print(f'Numeric Type = {up.args.numeric_type}')
+    print(f'Heuristic Cache = {up.args.heuristic_cache}')
+    print(f'Cache Probabilistic = {up.args.cache_probabilistic}')
+    print(f'Batch Heuristic = {up.args.batch_heuristic}')
+    print(f'Probabilistic Mode = {up.args.probabilistic_mode}')
+    print(f'Incremental Heuristic = {up.args.incremental_heuristic}')
+    print(f'STN Trail = {up.args.stn_trail}')
+
+
+def print_cache_stats(mdp):
+    """
+    Prints the hit rate of the heuristic cache of `mdp`, if it has one
+    """
+    cache = mdp.trpg
+    if isinstance(cache, up.engines.heuristics.HeuristicCache) and cache.enabled:
+        print(f'Heuristic cache hit rate = {cache.hit_rate:.3f} ({cache.hits} hits, {cache.misses} misses)')
 
 
 def run_regular(domain, runs, domain_type, deadline, search_time, search_depth, exploration_constant, object_amount, garbage_amount,
-                selection_type='avg', k=10):
+                selection_type='avg', k=10, compact_state=False, workers=1, transposition=False,
+                seed=None, iterations=None, reuse=False, node_store=False, intern_states=False,
+                numeric_type='fraction', heuristic_cache=0, cache_probabilistic=False, batch_heuristic=False,
+                probabilistic_mode='sample', incremental_heuristic=False, stn_trail=False):
     """
     Run split action to start and end actions logic - TP-MCTS approach
     """
@@ -78,10 +106,16 @@ def run_regular(domain, runs, domain_type, deadline, search_time, search_depth,
     print(f"Action amount= {len(ground_problem.actions)}, Proposition amount= {len(ground_problem.explicit_initial_values)}")
 
 
-    mdp = MDP(converted_problem, discount_factor=0.95)
+    mdp = MDP(converted_problem, discount_factor=0.95, compact_state=compact_state, intern_states=intern_states,
+              heuristic_cache=heuristic_cache, cache_probabilistic=cache_probabilistic,
+              probabilistic_mode=probabilistic_mode)
+    if seed is not None:
+        mdp.seed(seed)
 
-    params = (mdp, 90, search_time, search_depth, exploration_constant, selection_type, k)
+    params = (mdp, 90, search_time, search_depth, exploration_constant, selection_type, k, workers, transposition,
+              iterations, reuse, node_store, numeric_type, batch_heuristic, incremental_heuristic, stn_trail)
     up.engines.solvers.evaluate.evaluation_loop(runs, up.engines.solvers.mcts.plan, params)
+    print_cache_stats(mdp)
 
 
 def create_combination_domain(domain, deadline, object_amount, garbage_amount):
@@ -106,7 +140,9 @@ def create_combination_domain(domain, deadline, object_amount, garbage_amount):
 
 
 def run_combination(domain, runs, solver, deadline, search_time, search_depth, exploration_constant, object_amount, garbage_amount,
-                    selection_type='avg', k=10):
+                    selection_type='avg', k=10, compact_state=False, workers=1, transposition=False,
+                    seed=None, iterations=None, reuse=False, node_store=False, intern_states=False,
+                    heuristic_cache=0, cache_probabilistic=False, batch_heuristic=False, probabilistic_mode='sample'):
     """
     Run the combination logic - Mausem and Weld approach
     """
@@ -141,27 +177,52 @@ def run_combination(domain, runs, solver, deadline, search_time, search_depth, e
         converted_problem = convert_combination_problem._converted_problem
         split_problem = convert_combination_problem._split_problem
 
-    mdp = combinationMDP(converted_problem, discount_factor=0.95)
-    split_mdp = MDP(split_problem, discount_factor=0.95)
+    mdp = combinationMDP(converted_problem, discount_factor=0.95, compact_state=compact_state,
+                         intern_states=intern_states, heuristic_cache=heuristic_cache,
+                         cache_probabilistic=cache_probabilistic, probabilistic_mode=probabilistic_mode)
+    split_mdp = MDP(split_problem, discount_factor=0.95, compact_state=compact_state, heuristic_cache=heuristic_cache,
+                    cache_probabilistic=cache_probabilistic, probabilistic_mode=probabilistic_mode)
+    if seed is not None:
+        mdp.seed(seed)
+        # a distinct seed, so the heuristic rollouts are not correlated with the sampling of `mdp`
+        split_mdp.seed(seed + 1)
 
     if solver == 'rtdp':
-        params = (mdp, split_mdp, 90, search_time, search_depth)
+        params = (mdp, split_mdp, 90, search_time, search_depth, iterations)
         up.engines.solvers.evaluate.evaluation_loop(runs, up.engines.solvers.rtdp.plan, params)
 
     else:
-        params = (mdp, split_mdp, 90, search_time, search_depth, exploration_constant, selection_type, k)
+        params = (mdp, split_mdp, 90, search_time, search_depth, exploration_constant, selection_type, k, workers,
+                  transposition, iterations, reuse, node_store, batch_heuristic)
         up.engines.solvers.evaluate.evaluation_loop(runs, up.engines.solvers.mcts.combination_plan, params)
+    print_cache_stats(split_mdp)
+
 
 
 
+if up.args.instrument is not None:
+    up.instrumentation.enable(up.args.instrument)
 
 if up.args.domain_type == 'combination':
     run_combination(domain=up.args.domain, runs=up.args.runs, solver=up.args.solver, deadline=up.args.deadline,
                     search_time=up.args.search_time,
                     search_depth=up.args.search_depth, exploration_constant=up.args.exploration_constant,
-                    selection_type=up.args.selection_type, object_amount=up.args.object_amount, garbage_amount=up.args.garbage_amount, k=up.args.k)
+                    selection_type=up.args.selection_type, object_amount=up.args.object_amount, garbage_amount=up.args.garbage_amount, k=up.args.k,
+                    compact_state=up.args.compact_state, workers=up.args.workers,
+                    transposition=up.args.transposition, seed=up.args.seed, iterations=up.args.iterations,
+                    reuse=up.args.reuse, node_store=up.args.node_store,
+                    intern_states=up.args.intern_states, heuristic_cache=up.args.heuristic_cache,
+                    cache_probabilistic=up.args.cache_probabilistic, batch_heuristic=up.args.batch_heuristic,
+                    probabilistic_mode=up.args.probabilistic_mode)
 else:
     run_regular(domain=up.args.domain, domain_type=up.args.domain_type, runs=up.args.runs, deadline=up.args.deadline,
                 search_time=up.args.search_time,
                 search_depth=up.args.search_depth, exploration_constant=up.args.exploration_constant,
-                selection_type=up.args.selection_type, object_amount=up.args.object_amount, garbage_amount=up.args.garbage_amount, k=up.args.k)
+                selection_type=up.args.selection_type, object_amount=up.args.object_amount, garbage_amount=up.args.garbage_amount, k=up.args.k,
+                compact_state=up.args.compact_state, workers=up.args.workers,
+                transposition=up.args.transposition, seed=up.args.seed, iterations=up.args.iterations,
+                reuse=up.args.reuse, node_store=up.args.node_store,
+                intern_states=up.args.intern_states, numeric_type=up.args.numeric_type,
+                heuristic_cache=up.args.heuristic_cache, cache_probabilistic=up.args.cache_probabilistic,
+                batch_heuristic=up.args.batch_heuristic, probabilistic_mode=up.args.probabilistic_mode,
+                incremental_heuristic=up.args.incremental_heuristic, stn_trail=up.args.stn_trail)
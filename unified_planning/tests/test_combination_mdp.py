@@ -22,6 +22,24 @@ class Test_Combination_MDP(unittest.TestCase):
         cls.effect3 = combination_converted_problem.fluent_by_name('effect3')
         cls.in_execution = combination_converted_problem.fluent_by_name('inExecution')
 
+    def test_compact_state_step(self):
+        print("Running test_compact_state_step...")
+        compact_mdp = unified_planning.engines.combinationMDP(self.combination_converted_problem, discount_factor=0.95,
+                                                              compact_state=True)
+        state = self.init_state
+        compact_state = compact_mdp.initial_state()
+
+        for _ in range(3):
+            legal = self.combinationMDP.legal_actions(state)
+            compact_legal = compact_mdp.legal_actions(compact_state)
+            self.assertEqual(legal, compact_legal, 'compact state has different legal actions')
+
+            action = max(legal, key=lambda a: a.name)
+            _, state, _ = self.combinationMDP.step(state, action)
+            _, compact_state, _ = compact_mdp.step(compact_state, action)
+            self.assertEqual(state.predicates, compact_state.predicates, 'compact state has different predicates')
+            self.assertEqual(state.current_time, compact_state.current_time, 'compact state has different time')
+
     # def setUp(self) -> None:
     #
 
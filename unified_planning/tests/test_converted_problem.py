@@ -47,6 +47,20 @@ class Test_Converted_Problem(unittest.TestCase):
         self.assertFalse(effect in start_a.neg_preconditions, 'effect should not be a precondition')
         self.assertTrue(effect in start_b.neg_preconditions, 'effect should be a precondition')
 
+    def test_frozen_actions(self):
+        print("Running test_frozen_actions...")
+        for problem in [self.mutex_converted_problem, self.combination_converted_problem]:
+            self.assertEqual([action.id for action in problem.actions], list(range(len(problem.actions))),
+                             'the actions have dense ids in the order of the problem')
+            for action in problem.actions:
+                cached = hash(action)
+                action._hash = None
+                self.assertEqual(hash(action), cached, 'the cached hash is the hash of the action')
+                action.freeze(action.id)
+
+        action = self.mutex_converted_problem.actions[0]
+        self.assertNotIn('_hash', action.__getstate__(), 'the cached hash is not pickled')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+
+import unified_planning
+from unified_planning.shortcuts import *
+from unified_planning import instrumentation
+import unified_planning.domains
+import unittest
+from unified_planning.tests import combination_converted_problem
+
+
+class TestInstrumentation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model = unified_planning.domains.Stuck_Car_1o(kind='regular', deadline=15, object_amount=1, garbage_amount=0)
+        grounder = unified_planning.engines.compilers.Grounder()
+        ground_problem = grounder._compile(model.problem).problem
+        converted_problem = unified_planning.engines.Convert_problem(ground_problem)._converted_problem
+        cls.mdp = unified_planning.engines.MDP(converted_problem, discount_factor=0.95)
+
+    def test_report_step(self):
+        print("Running test_report_step...")
+        step = unified_planning.engines.MDP.step
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.jsonl')
+            instrumentation.enable(path)
+            try:
+                mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp), 'avg', 10)
+                mcts.search(iterations=20)
+                instrumentation.report(0, iterations=mcts.iterations,
+                                       tree_depth=instrumentation.tree_depth(mcts.root_node))
+            finally:
+                instrumentation.disable()
+
+            with open(path) as file:
+                stats = [json.loads(line) for line in file]
+
+        self.assertIs(unified_planning.engines.MDP.step, step, 'disable restores the original functions')
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]['iterations'], 20)
+        self.assertGreaterEqual(stats[0]['mdp.step']['calls'], 20, 'every selection performs a step')
+        self.assertEqual(stats[0]['node.create_state_node']['calls'], stats[0]['mdp.legal_actions']['calls'])
+        self.assertGreater(stats[0]['tree_depth'], 0)
+
+    def test_combination_legal_actions(self):
+        print("Running test_combination_legal_actions...")
+        mdp = unified_planning.engines.combinationMDP(combination_converted_problem, discount_factor=0.95)
+        state = mdp.initial_state()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.jsonl')
+            instrumentation.enable(path)
+            try:
+                for _ in range(3):
+                    mdp.legal_actions(state)
+                instrumentation.report(0)
+            finally:
+                instrumentation.disable()
+
+            with open(path) as file:
+                stats = json.loads(file.readline())
+
+        self.assertEqual(stats['combination_mdp.legal_actions']['calls'], 3)
+        self.assertEqual(stats['mdp.legal_actions']['calls'], 3, 'the calls of the override are not counted twice')
+
+
+if __name__ == '__main__':
+    unittest.main()
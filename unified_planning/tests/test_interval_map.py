@@ -0,0 +1,76 @@
+import random
+
+import unified_planning
+from unified_planning.shortcuts import *
+import unittest
+
+
+def linked_list_intervals(linked_list):
+    intervals = []
+    node = linked_list.head
+    while node is not None:
+        intervals.append((node.lower_bound, node.upper_bound, node.value))
+        node = node.next
+    return intervals
+
+
+class TestIntervalMap(unittest.TestCase):
+    def setUp(self) -> None:
+        self.intervalMap = IntervalMap()
+
+    def test_same_as_linked_list(self):
+        print("Running test_same_as_linked_list...")
+
+        for seed in range(300):
+            rng = random.Random(seed)
+            linked_list = LinkedList()
+            interval_map = IntervalMap()
+            for _ in range(rng.randint(1, 20)):
+                if rng.random() < 0.5:
+                    lower = rng.randint(0, 20)
+                    upper = lower + rng.randint(0, 8)
+                else:
+                    lower = round(rng.uniform(0, 20), 3)
+                    upper = lower + round(rng.uniform(0, 6), 3)
+                value = rng.randint(0, 20)
+
+                linked_list.update(lower, upper, value)
+                interval_map.update(lower, upper, value)
+
+                self.assertEqual(list(interval_map), linked_list_intervals(linked_list))
+                self.assertEqual(interval_map.max_value, linked_list.max_value)
+                self.assertEqual(interval_map.max_interval, linked_list.max_interval)
+
+    def test_interval_value(self):
+        print("Running test_interval_value...")
+
+        self.intervalMap.update(3, 5, 10)
+        self.intervalMap.update(6, 8, 10)
+        self.intervalMap.update(9, 11, 10)
+        self.intervalMap.update(7, 10, 20)
+
+        node = LinkedListNode(4, 5, 10)
+        node.next = LinkedListNode(6, 7 - self.intervalMap.epsilon, 10)
+        node.next.next = LinkedListNode(7, 7.5, 30)
+
+        self.assertTrue(self.intervalMap.interval_value(4, 7.5).equal(node))
+        self.assertIsNone(self.intervalMap.interval_value(12, 13))
+        self.assertEqual(self.intervalMap.max_value_interval(4, 8.5), (30, 7, 8))
+        self.assertIsNone(self.intervalMap.max_value_interval(0, 2))
+
+    def test_max_update(self):
+        print("Running test_max_update...")
+
+        self.intervalMap.update(3, 5, 10)
+        self.intervalMap.update(7, 9, 30)
+        self.intervalMap.max_update(4, 8, 20)
+
+        epsilon = self.intervalMap.epsilon
+        self.assertEqual(list(self.intervalMap), [(3, 4 - epsilon, 10), (4, 5, 20), (5 + epsilon, 7 - epsilon, 20),
+                                                  (7, 8, 30), (8 + epsilon, 9, 30)])
+        self.assertEqual(self.intervalMap.max_value, 30)
+        self.assertEqual(self.intervalMap.max_interval, (7, 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
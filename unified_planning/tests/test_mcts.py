@@ -0,0 +1,208 @@
+import unified_planning
+from unified_planning.shortcuts import *
+import unified_planning.domains
+import unittest
+from unittest import mock
+from unified_planning.engines.solvers.mcts import RootActionSummary, reuse_subtree, root_parallel_search, plan
+from unified_planning.exceptions import UPUsageError
+
+
+class TestMCTS(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model = unified_planning.domains.Stuck_Car_1o(kind='regular', deadline=15, object_amount=1, garbage_amount=0)
+        grounder = unified_planning.engines.compilers.Grounder()
+        ground_problem = grounder._compile(model.problem).problem
+        converted_problem = unified_planning.engines.Convert_problem(ground_problem)._converted_problem
+        cls.mdp = unified_planning.engines.MDP(converted_problem, discount_factor=0.95)
+
+    def test_root_summary_merge(self):
+        print("Running test_root_summary_merge...")
+        summary = RootActionSummary()
+        summary.merge(3, 0.5, (2, 4))
+        summary.merge(1, 0.9, (0, 1))
+        summary.merge(4, 0.1, (5, 6))
+
+        self.assertEqual(summary.count, 8, 'the counts of the trees are summed')
+        self.assertAlmostEqual(summary.value, (3 * 0.5 + 0.9 + 4 * 0.1) / 8, msg='the value is the count weighted average')
+        self.assertEqual(summary.max_interval(), (0, 1), 'the interval of the tree with the highest value is kept')
+
+    def test_root_parallel_without_fork(self):
+        print("Running test_root_parallel_without_fork...")
+        create_mcts = lambda: C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp),
+                                     'avg', 10)
+        with mock.patch('multiprocessing.get_all_start_methods', return_value=['spawn']):
+            with self.assertRaises(UPUsageError) as error:
+                root_parallel_search(create_mcts, self.mdp, 2, 1, iterations=10)
+        self.assertIn('--workers', str(error.exception))
+
+    def test_root_parallel_reuse(self):
+        print("Running test_root_parallel_reuse...")
+        with self.assertRaises(UPUsageError) as error:
+            plan(self.mdp, 1, 1, 40, 10, workers=2, reuse=True)
+        self.assertIn('--reuse', str(error.exception))
+
+    def test_transposition(self):
+        print("Running test_transposition...")
+        mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp), 'avg', 10,
+                      transposition=True)
+        mcts.search(1)
+
+        parents = {}
+        snodes = [mcts.root_node]
+        while snodes:
+            snode = snodes.pop()
+            for anode in snode.children.values():
+                for child in anode.children.values():
+                    self.assertEqual(child.depth, snode.depth + 1, 'only nodes in the same depth are shared')
+                    if id(child) not in parents:
+                        snodes.append(child)
+                    parents.setdefault(id(child), set()).add(id(anode))
+
+        self.assertTrue(any(len(p) > 1 for p in parents.values()), 'start actions commute so states are reached twice')
+
+    def test_seeded_iterations(self):
+        print("Running test_seeded_iterations...")
+        counts = []
+        for _ in range(2):
+            self.mdp.seed(3)
+            mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp), 'max', 10)
+            mcts.search(selection_type='max', iterations=100)
+            self.assertEqual(mcts.iterations, 100)
+            counts.append({action.name: anode.count for action, anode in mcts.root_node.children.items()})
+
+        self.assertEqual(counts[0], counts[1], 'a seeded search with an iteration budget is reproducible')
+
+    def test_reuse_subtree(self):
+        print("Running test_reuse_subtree...")
+        stn = create_init_stn(self.mdp)
+        state = self.mdp.initial_state()
+        mcts = C_MCTS(self.mdp, None, state, 40, 10, stn, 'avg', 10)
+        action = mcts.search(iterations=200)
+        action_node = mcts.root_node.children[action]
+        next_state = next(iter(action_node.children))
+
+        stn_node = update_stn(stn, action, None, type='SetTime')
+        root_node = reuse_subtree(action_node, next_state, stn.get_current_time(stn_node))
+
+        self.assertIs(root_node.parent, action_node)
+        self.assertIsNone(action_node.parent, 'the rest of the tree is detached')
+        self.assertEqual(root_node.depth, 0)
+        snodes = [root_node]
+        while snodes:
+            snode = snodes.pop()
+            for anode in snode.children.values():
+                self.assertTrue(anode.is_consistent(), 'inconsistent actions are pruned')
+                self.assertEqual(anode.stn.get_current_time(action_node.STNNode), stn.get_current_time(stn_node),
+                                 'the STNs of the subtree are anchored to the execution time')
+                for child in anode.children.values():
+                    self.assertEqual(child.depth, snode.depth + 1)
+                    snodes.append(child)
+
+    def test_stn_trail(self):
+        print("Running test_stn_trail...")
+        for selection_type in ['avg', 'max']:
+            trees = []
+            for stn_trail in [False, True]:
+                self.mdp.seed(3)
+                stn = create_init_stn(self.mdp)
+                before = str(stn)
+                mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, stn, selection_type, 10,
+                              stn_trail=stn_trail)
+                action = mcts.search(selection_type=selection_type, iterations=100)
+                self.assertEqual(str(stn), before, 'the search changed the STN of the plan')
+                trees.append((action, mcts))
+
+            (action, mcts), (trail_action, trail_mcts) = trees
+            self.assertEqual(action, trail_action)
+            self.assertEqual(str(trail_mcts._search_stn), str(mcts.stn), 'the levels of the last descent are not undone')
+            pairs = [(mcts.root_node, trail_mcts.root_node)]
+            while pairs:
+                snode, trail_snode = pairs.pop()
+                self.assertEqual(snode.children.keys(), trail_snode.children.keys())
+                for a, anode in snode.children.items():
+                    trail_anode = trail_snode.children[a]
+                    self.assertIsNone(trail_anode.stn, 'the action nodes of the trail mode keep no STN')
+                    self.assertEqual((trail_anode.count, trail_anode.value), (anode.count, anode.value))
+                    self.assertEqual(trail_anode.end_time, anode.stn.get_current_end_time())
+                    self.assertEqual(trail_anode.lower_bounds, anode.stn.get_lower_bound_potential_end_action())
+                    pairs.extend((child, trail_anode.children[s]) for s, child in anode.children.items())
+
+    def test_stn_trail_reuse(self):
+        print("Running test_stn_trail_reuse...")
+        counts = []
+        for stn_trail in [False, True]:
+            self.mdp.seed(3)
+            stn = create_init_stn(self.mdp)
+            state = self.mdp.initial_state()
+            mcts = C_MCTS(self.mdp, None, state, 40, 10, stn, 'avg', 10, stn_trail=stn_trail)
+            action = mcts.search(iterations=200)
+            action_node = mcts.root_node.children[action]
+            next_state = next(iter(action_node.children))
+
+            stn_node = update_stn(stn, action, None, type='SetTime')
+            root_node = reuse_subtree(action_node, next_state, stn.get_current_time(stn_node))
+            reused = C_MCTS(self.mdp, root_node, next_state, 40, 10, stn, 'avg', 10, stn_node, stn_trail=stn_trail)
+            reused.search(iterations=100)
+            counts.append({a.name: (anode.count, anode.end_time) for a, anode in root_node.children.items()})
+
+        self.assertEqual(counts[0], counts[1], 'the reused subtree is replayed on the STN of the plan')
+
+    def test_selection_backpropagates_path(self):
+        print("Running test_selection_backpropagates_path...")
+        mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp), 'avg', 10)
+        for _ in range(50):
+            mcts.selection(mcts.root_node)
+
+        self.assertEqual(mcts.root_node.count, 50)
+        self.assertEqual(sum(anode.count for anode in mcts.root_node.children.values()), 50)
+
+    def test_node_store(self):
+        print("Running test_node_store...")
+        for selection_type in ['avg', 'max']:
+            trees = []
+            for node_store in [False, True]:
+                self.mdp.seed(3)
+                mcts = C_MCTS(self.mdp, None, self.mdp.initial_state(), 40, 10, create_init_stn(self.mdp),
+                              selection_type, 10, node_store=node_store)
+                action = mcts.search(selection_type=selection_type, iterations=100)
+                trees.append((action, {a.name: (anode.count, anode.value)
+                                       for a, anode in mcts.root_node.children.items()}))
+
+            self.assertIsNotNone(mcts.node_store)
+            self.assertEqual(trees[0], trees[1], 'the array store grows the same tree as the node objects')
+
+    def test_node_store_reuse(self):
+        print("Running test_node_store_reuse...")
+        stn = create_init_stn(self.mdp)
+        state = self.mdp.initial_state()
+        mcts = C_MCTS(self.mdp, None, state, 40, 10, stn, 'avg', 10, node_store=True)
+        action = mcts.search(iterations=200)
+        action_node = mcts.root_node.children[action]
+        next_state = next(iter(action_node.children))
+        old_size = len(mcts.node_store)
+
+        stn_node = update_stn(stn, action, None, type='SetTime')
+        root_node = reuse_subtree(action_node, next_state, stn.get_current_time(stn_node))
+        expected = {a.name: (anode.count, anode.value) for a, anode in root_node.children.items()}
+
+        reused = C_MCTS(self.mdp, root_node, next_state, 40, 10, stn, 'avg', 10, stn_node, node_store=True)
+        self.assertIsNot(reused.node_store, mcts.node_store, 'the reused subtree is moved to a new store')
+        self.assertLess(len(reused.node_store), old_size, 'the ranges of the detached tree are not kept')
+        self.assertIs(root_node.store, reused.node_store)
+        self.assertEqual({a.name: (anode.count, anode.value) for a, anode in root_node.children.items()}, expected,
+                         'the counts and values are copied to the new store')
+
+        size = 0
+        snodes = [root_node]
+        while snodes:
+            snode = snodes.pop()
+            self.assertIs(snode.store, reused.node_store)
+            size += len(snode._actions)
+            for anode in snode.children.values():
+                snodes.extend(anode.children.values())
+        self.assertEqual(len(reused.node_store), size, 'the store holds only the ranges of the subtree')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unified_planning
 from unified_planning.shortcuts import *
+import itertools
+import random
+import numpy as np
 import unittest
-from unified_planning.tests import mutex_converted_problem
+from unified_planning.tests import mutex_converted_problem, OAP_converted_problem, LS_converted_problem
+from unified_planning.exceptions import UPUsageError
 
 class TestMDP(unittest.TestCase):
     @classmethod
@@ -40,6 +44,167 @@ class TestMDP(unittest.TestCase):
 
         self.assertTrue(next_state2 in legal)
 
+    def test_compact_state(self):
+        print("Running test_compact_state...")
+        compact_mdp = unified_planning.engines.MDP(self.converted_problem, discount_factor=0.95, compact_state=True)
+
+        delete_init = self.converted_problem.action_by_name("delete_init")
+        add_effect = self.converted_problem.action_by_name("add_effect")
+
+        state = self.mdp.initial_state()
+        compact_state = compact_mdp.initial_state()
+        self.assertEqual(self.mdp.legal_actions(state), compact_mdp.legal_actions(compact_state),
+                         "compact state has different legal actions")
+
+        for action in [delete_init, add_effect]:
+            _, state, _ = self.mdp.step(state, action)
+            _, compact_state, _ = compact_mdp.step(compact_state, action)
+            self.assertEqual(state.predicates, compact_state.predicates, "compact state has different predicates")
+            self.assertEqual(self.mdp.legal_actions(state), compact_mdp.legal_actions(compact_state),
+                             "compact state has different legal actions")
+
+        # the same predicates reached by another path is the same state
+        add_init = self.converted_problem.action_by_name("add_init")
+        _, compact_state, _ = compact_mdp.step(compact_state, add_init)
+        _, other_state, _ = compact_mdp.step(compact_mdp.initial_state(), add_effect)
+        self.assertTrue(other_state in {compact_state: True}, "equal compact states are not the same key")
+
+    def test_compact_state_hash(self):
+        print("Running test_compact_state_hash...")
+        predicates = list(self.mdp.initial_state().predicates)
+        index = unified_planning.engines.PredicateIndex(predicates)
+        other_index = unified_planning.engines.PredicateIndex(predicates)
+        states = []
+        for size in range(min(len(predicates), 2) + 1):
+            for subset in itertools.combinations(predicates, size):
+                states.append(unified_planning.engines.State(subset))
+                states.append(unified_planning.engines.BitState(index.mask(subset), index))
+                states.append(unified_planning.engines.BitState(other_index.mask(subset), other_index))
+                states.append(unified_planning.engines.CombinationBitState(index.mask(subset), index))
+
+        for state, other in itertools.product(states, repeat=2):
+            if state == other or other == state:
+                self.assertTrue(state == other and other == state, "the equality of states is not symmetric")
+                self.assertEqual(hash(state), hash(other), "equal states have different hashes")
+
+    def test_intern_states(self):
+        print("Running test_intern_states...")
+        intern_mdp = unified_planning.engines.MDP(self.converted_problem, discount_factor=0.95, intern_states=True)
+
+        delete_init = self.converted_problem.action_by_name("delete_init")
+        add_effect = self.converted_problem.action_by_name("add_effect")
+        add_init = self.converted_problem.action_by_name("add_init")
+
+        _, state, _ = intern_mdp.step(intern_mdp.initial_state(), delete_init)
+        _, state, _ = intern_mdp.step(state, add_effect)
+        _, state, _ = intern_mdp.step(state, add_init)
+        _, other_state, _ = intern_mdp.step(intern_mdp.initial_state(), add_effect)
+        self.assertIs(state, other_state, "equal states are the same object")
+
+        with self.assertRaises(UPUsageError):
+            state.set_predicates(set())
+
+        intern_mdp.clear_states()
+        _, other_state, _ = intern_mdp.step(intern_mdp.initial_state(), add_effect)
+        self.assertIsNot(state, other_state)
+        self.assertEqual(state, other_state)
+
+    def test_successor_generator(self):
+        print("Running test_successor_generator...")
+        actions = [action for action in self.converted_problem.actions
+                   if not isinstance(action, unified_planning.engines.NoOpAction)]
+        generator = unified_planning.engines.SuccessorGenerator(
+            [(action.pos_preconditions, action.neg_preconditions) for action in actions])
+        predicates = list(self.converted_problem.initial_values.keys())
+
+        rng = random.Random(0)
+        for _ in range(200):
+            state = set(rng.sample(predicates, rng.randint(0, len(predicates))))
+            expected = [i for i, action in enumerate(actions) if action.pos_preconditions.issubset(state)
+                        and action.neg_preconditions.isdisjoint(state)]
+            self.assertEqual(generator.applicable(state), expected, "the generator misses applicable actions")
+
+    @staticmethod
+    def relevant(problem, state, action):
+        """ The relevance of the start action `action` in `state` from its effects """
+        in_execution = problem.fluent_by_name('inExecution')
+        add = {e for e in action.add_effects if e._content.payload != in_execution}
+        end_action = action.end_action
+        not_relevant = add.issubset(state.predicates) and \
+            end_action.add_effects.issubset(state.predicates) and \
+            end_action.del_effects.isdisjoint(state.predicates) and \
+            all(set(pe.fluents).issubset(state.predicates) for pe in end_action.probabilistic_effects)
+        return not not_relevant
+
+    def test_action_relevance(self):
+        print("Running test_action_relevance...")
+        predicates = list(self.converted_problem.initial_values.keys())
+        start_actions = [action for action in self.converted_problem.actions
+                         if isinstance(action, unified_planning.engines.InstantaneousStartAction)]
+        self.assertTrue(start_actions)
+
+        rng = random.Random(0)
+        for _ in range(100):
+            state = unified_planning.engines.State(rng.sample(predicates, rng.randint(0, len(predicates))))
+            for action in start_actions:
+                self.assertEqual(self.mdp.check_action_relevant(state, action),
+                                 self.relevant(self.converted_problem, state, action),
+                                 "the compiled relevance differs from the effects of " + action.name)
+
+    def test_action_relevance_of_other_problem(self):
+        print("Running test_action_relevance_of_other_problem...")
+        ids = {action.id for action in self.converted_problem.actions}
+        for problem in [OAP_converted_problem, LS_converted_problem]:
+            predicates = list(problem.initial_values.keys())
+            start_actions = [action for action in problem.actions
+                             if isinstance(action, unified_planning.engines.InstantaneousStartAction)]
+            self.assertTrue(any(action.id in ids for action in start_actions), 'the ids of the problems collide')
+
+            rng = random.Random(0)
+            for _ in range(20):
+                state = unified_planning.engines.State(rng.sample(predicates, rng.randint(0, len(predicates))))
+                for action in start_actions:
+                    self.assertEqual(self.mdp.check_action_relevant(state, action),
+                                     self.relevant(problem, state, action),
+                                     "the relevance of an action of another problem is taken by its id")
+
+    def test_outcome_cache(self):
+        print("Running test_outcome_cache...")
+        a, b, c = (FluentExp(Fluent(name, BoolType())) for name in ('pa', 'pb', 'pc'))
+
+        def probability(state, _):
+            if a in state.predicates:
+                return {0.3: {c: True}, 0.7: {}}
+            if b in state.predicates:
+                return {}
+            return {0.5: {c: False}, 0.2: {b: True, c: True}, 0.3: {a: True}}
+
+        effect = unified_planning.model.effect.ProbabilisticEffect([c], probability)
+        index = unified_planning.engines.PredicateIndex([a, b, c])
+        tree = unified_planning.engines.OutcomeTree(effect)
+        mask_tree = unified_planning.engines.OutcomeTree(effect, index)
+        for _ in range(2):
+            for size in range(4):
+                for predicates in itertools.combinations([a, b, c], size):
+                    state = unified_planning.engines.State(predicates)
+                    expected = probability(state, None)
+                    for outcomes in (tree.outcomes(state),
+                                     mask_tree.outcomes(unified_planning.engines.BitState(index.mask(predicates), index))):
+                        if not expected:
+                            self.assertIsNone(outcomes)
+                            continue
+                        self.assertEqual(outcomes.probabilities, list(expected.keys()))
+                        self.assertEqual(outcomes.adds, [{v for v, value in values.items() if value}
+                                                         for values in expected.values()])
+                        self.assertEqual(outcomes.deletes, [{v for v, value in values.items() if not value}
+                                                            for values in expected.values()])
+
+        outcomes = tree.outcomes(unified_planning.engines.State())
+        rng = np.random.default_rng(0)
+        draws = [rng.choice(len(outcomes), p=outcomes.probabilities) for _ in range(100)]
+        rng = np.random.default_rng(0)
+        self.assertEqual([outcomes.sample(rng.random()) for _ in range(100)], draws,
+                         "the sampled outcomes differ from the outcomes drawn by numpy")
 
 
 if __name__ == '__main__':
@@ -47,6 +47,30 @@ class TestNode(unittest.TestCase):
 
         self.assertFalse(self.stn.is_consistent(), 'Long action cannot end before the short action')
 
+    def test_lazy_expansion(self):
+        print("Running test_lazy_expansion...")
+
+        state = self.mdp_LS.initial_state()
+        stn, parent = self.stn_LS, None
+        for depth in range(4):
+            eager = up.engines.C_SNode(state, depth, self.mdp_LS.legal_actions(state), stn, parent)
+            lazy = up.engines.C_SNode(state, depth, self.mdp_LS.legal_actions(state), stn, parent, lazy=True)
+            self.assertEqual(len(lazy.children), 0, 'a lazy node does not create children up front')
+
+            for action in list(lazy.possible_actions):
+                lazy.expand(action)
+
+            self.assertEqual(lazy.possible_actions, eager.possible_actions, 'the same actions are pruned')
+            self.assertEqual(list(lazy.children), list(eager.children))
+            if not eager.possible_actions:
+                break
+
+            parent = eager.children[eager.possible_actions[0]]
+            terminal, state, _ = self.mdp_LS.step(state, parent.action)
+            stn = parent.stn
+            if terminal:
+                break
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 import unified_planning
 from unified_planning.shortcuts import *
 import unittest
+from unittest import mock
+from unified_planning.exceptions import UPUsageError
 
 
 class TestSTN(unittest.TestCase):
@@ -219,6 +221,167 @@ class TestSTN(unittest.TestCase):
 
         self.assertTrue(self.stn.get_legal_interval(node)==(4,6), 'The deadline is 6')
 
+    def test_incremental_upper_bound(self):
+        print("Running test_incremental_upper_bound...")
+
+        start_plan = up.plans.stn.STNPlanNode(up.model.timing.TimepointKind.GLOBAL_START)
+        nodes = []
+        node = None
+        stn_copy = None
+        for action in [self.a_start_long, self.a_start_short, self.a_end_short, self.a_end_long]:
+            node = update_stn(self.stn, action, node)
+            nodes.append(node)
+            if stn_copy is None:
+                stn_copy = self.stn.clone()
+            # the distances are maintained between the queries and copied to the clone
+            for n in nodes:
+                self.assertEqual(self.stn._stn.shortest_path(start_plan, n),
+                                 self.stn._stn.calculate_shortest_path(start_plan, n),
+                                 'the incremental upper bound differs from Bellman-Ford')
+
+        node = update_stn(stn_copy, self.a_end_long, nodes[0])
+        for n in [nodes[0], node]:
+            self.assertEqual(stn_copy._stn.shortest_path(start_plan, n),
+                             stn_copy._stn.calculate_shortest_path(start_plan, n),
+                             'the incremental upper bound of the clone differs from Bellman-Ford')
+
+    def test_incremental_upper_bound_recomputes(self):
+        print("Running test_incremental_upper_bound_recomputes...")
+
+        DeltaSTN = up.plans.stn.DeltaSimpleTemporalNetwork
+        start_plan = up.plans.stn.STNPlanNode(up.model.timing.TimepointKind.GLOBAL_START)
+        with mock.patch.object(DeltaSTN, '_calculate_forward', autospec=True,
+                               side_effect=DeltaSTN._calculate_forward) as calculate_forward:
+            nodes = []
+            node = None
+            for action in [self.a_start_very_short, self.a_start_short, self.a_end_very_short, self.a_end_short]:
+                node = update_stn(self.stn, action, node)
+                nodes.append(node)
+                for n in nodes:
+                    self.stn.get_legal_interval(n)
+
+                # an inconsistent constraint undone by a pop keeps the distances
+                self.stn.push()
+                self.stn.fix_action_time(node, 10)
+                self.assertFalse(self.stn.is_consistent())
+                self.stn.pop()
+
+        self.assertEqual(calculate_forward.call_count, 1, 'the distances are recalculated after the first query')
+        for n in nodes:
+            self.assertEqual(self.stn._stn.shortest_path(start_plan, n),
+                             self.stn._stn.calculate_shortest_path(start_plan, n),
+                             'the incremental upper bound differs from Bellman-Ford')
+
+    def test_copy_on_write_clone(self):
+        print("Running test_copy_on_write_clone...")
+
+        node = update_stn(self.stn, self.a_start_long)
+        stn_copy = self.stn.clone()
+        before = str(self.stn)
+        self.assertIs(stn_copy._stn.distances, self.stn._stn.distances, 'the clone shares the distances')
+
+        # changing the clone does not change the original STN, and the other way around
+        node_copy = update_stn(stn_copy, self.a_end_long, node)
+        self.assertEqual(str(self.stn), before, 'the clone changed the original STN')
+        self.assertNotEqual(str(stn_copy), before, 'the constraints of the end action are not added to the clone')
+        self.assertTrue(node_copy in self.stn._potential_end_actions, 'the end action is chosen in the original STN')
+
+        node_short = update_stn(self.stn, self.a_start_short, node)
+        self.assertFalse(node_short in stn_copy._stn, 'the short action is added to the clone')
+        self.assertEqual(stn_copy.get_legal_interval(node_copy), (5, 6), 'the long action ends at 5 or 6')
+        self.assertEqual(self.stn.get_legal_interval(node_short), (0, 6), 'the end of the long action is not chosen')
+
+    def test_push_pop(self):
+        print("Running test_push_pop...")
+
+        node = update_stn(self.stn, self.a_start_long)
+        before = str(self.stn)
+        distances = dict(self.stn._stn.distances)
+        interval = self.stn.get_legal_interval(node)
+
+        self.stn.push()
+        node_end = update_stn(self.stn, self.a_end_long, node)
+        self.assertEqual(self.stn.get_legal_interval(node_end), (5, 6), 'the long action ends at 5 or 6')
+        stn_copy = self.stn.clone()
+
+        # a nested level that makes the STN inconsistent
+        self.stn.push()
+        node_short = update_stn(self.stn, self.a_start_short, node)
+        self.stn.fix_action_time(node, 2)
+        self.assertFalse(self.stn.is_consistent(), 'the long action ends after the deadline')
+        self.stn.pop()
+        self.assertTrue(self.stn.is_consistent(), 'the inconsistent constraint is not undone')
+        self.assertFalse(node_short in self.stn._stn, 'the short action is not undone')
+
+        self.stn.pop()
+        self.assertEqual(str(self.stn), before, 'the constraints of the end action are not undone')
+        self.assertEqual(self.stn.get_legal_interval(node), interval, 'the legal interval is not restored')
+        self.assertEqual(self.stn._stn.distances, distances, 'the distances are not restored')
+
+        # the clone made in a pushed level keeps the constraints of the level
+        self.assertTrue(node_end in stn_copy._stn, 'the pop changed the clone')
+        self.assertEqual(stn_copy.get_legal_interval(node_end), (5, 6), 'the pop changed the clone')
+        self.assertRaises(UPUsageError, self.stn.pop)
+
+    def test_clone_keeps_environment(self):
+        print("Running test_clone_keeps_environment...")
+
+        node = update_stn(self.stn, self.a_start_short)
+        stn_copy = self.stn.clone()
+        self.assertIs(stn_copy.environment, self.stn.environment, 'the clone is in another environment')
+        self.assertEqual(stn_copy.kind, self.stn.kind)
+        self.assertEqual(stn_copy._potential_end_actions, self.stn._potential_end_actions)
+        self.assertIsNot(stn_copy._potential_end_actions, self.stn._potential_end_actions,
+                         'the clone shares the potential end actions')
+
+        update_stn(stn_copy, self.a_end_short, node)
+        self.assertFalse(stn_copy._potential_end_actions, 'the end action is still a potential end action')
+        self.assertTrue(self.stn._potential_end_actions, 'the end action is chosen in the original STN')
+
+    def test_numeric_types(self):
+        print("Running test_numeric_types...")
+
+        intervals = {}
+        for numeric_type in up.plans.stn.stn_plan.NUMERIC_TYPES:
+            stn = create_init_stn(self.mdp, numeric_type)
+            node = update_stn(stn, self.a_start_long)
+            node_short = update_stn(stn, self.a_start_short, node)
+            stn.fix_action_time(node, 2)
+            node = update_stn(stn, self.a_end_short, node_short)
+            intervals[numeric_type] = (stn.get_legal_interval(node_short), stn.get_legal_interval(node),
+                                       stn.get_current_end_time(), stn.clone().get_current_end_time())
+            self.assertTrue(stn.is_consistent())
+
+            node = update_stn(stn, self.a_end_long, node)
+            self.assertFalse(stn.is_consistent(), 'the long action ends after the deadline')
+
+        self.assertEqual(intervals['int'], intervals['fraction'], 'the int STN differs from the fraction STN')
+        self.assertEqual(intervals['float'], intervals['fraction'], 'the float STN differs from the fraction STN')
+        self.assertRaises(UPUsageError, up.plans.stn.STNPlan, [], numeric_type='decimal')
+
+    def test_float_epsilon(self):
+        print("Running test_float_epsilon...")
+
+        DeltaSTN = up.plans.stn.DeltaSimpleTemporalNetwork
+        # 0.7 + 0.1 is 0.7999999999999999 with floats, the path is as long as the arc of 0.8
+        for incremental in [True, False]:
+            stn = DeltaSTN(epsilon=1e-9)
+            stn.add('c', 's', 0.8)
+            if incremental:
+                self.assertEqual(stn.shortest_path('s', 'c'), 0.8)
+            stn.add('b', 's', 0.7)
+            stn.add('c', 'b', 0.1)
+            self.assertEqual(stn.shortest_path('s', 'c'), 0.8, 'the rounding noise shortens the distance')
+
+        # -0.2 - 0.1 is -0.30000000000000004 with floats
+        stn = DeltaSTN(epsilon=1e-9)
+        stn.add('s', 'c', -0.3)
+        distances = dict(stn.distances)
+        stn.add('s', 'b', -0.1)
+        stn.add('b', 'c', -0.2)
+        self.assertEqual(stn.distances['s'], distances['s'], 'the rounding noise re-queues the events')
+        self.assertTrue(stn.check_stn())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,178 @@
+import random
+
+import numpy as np
+import unified_planning
+from unified_planning.shortcuts import *
+import unified_planning.domains
+import unittest
+from unified_planning.exceptions import UPUsageError
+
+
+class TestTRPG(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        model = unified_planning.domains.Stuck_Car_1o(kind='regular', deadline=15, object_amount=1, garbage_amount=0)
+        grounder = unified_planning.engines.compilers.Grounder()
+        ground_problem = grounder._compile(model.problem).problem
+        converted_problem = unified_planning.engines.Convert_problem(ground_problem)._converted_problem
+        cls.mdp = unified_planning.engines.MDP(converted_problem, discount_factor=0.95)
+
+        # states reached by random walks from the initial state
+        random.seed(0)
+        cls.states = []
+        for _ in range(30):
+            state = cls.mdp.initial_state()
+            for _ in range(random.randint(0, 8)):
+                actions = cls.mdp.legal_actions(state)
+                if not actions:
+                    break
+                terminal, state, _ = cls.mdp.step(state, random.choice(actions))
+                if terminal:
+                    break
+            cls.states.append(state)
+
+    def test_compiled_once(self):
+        print("Running test_compiled_once...")
+        self.assertTrue(self.mdp.trpg is self.mdp.trpg, "the compiled heuristic is rebuilt")
+
+    def test_same_value_as_trpg(self):
+        print("Running test_same_value_as_trpg...")
+        for i, state in enumerate(self.states):
+            for current_time in (0, 4):
+                np.random.seed(i)
+                expected = unified_planning.engines.heuristics.TRPG(self.mdp, state, current_time).get_heuristic()
+                np.random.seed(i)
+                value = self.mdp.trpg.get_heuristic(state, current_time)
+                self.assertEqual(expected, value, f"different heuristic value for {state}")
+
+    def test_same_value_with_lower_bounds(self):
+        print("Running test_same_value_with_lower_bounds...")
+        end_actions = [a for a in self.mdp.problem.actions if isinstance(a, unified_planning.engines.InstantaneousEndAction)]
+        for i, state in enumerate(self.states):
+            lower_bounds = {a: 2 + j for j, a in enumerate(end_actions)}
+            np.random.seed(i)
+            expected = unified_planning.engines.heuristics.TRPG(self.mdp, state, 1).get_heuristic(lower_bounds)
+            np.random.seed(i)
+            value = self.mdp.trpg.get_heuristic(state, 1, lower_bounds)
+            self.assertEqual(expected, value, f"different heuristic value for {state}")
+
+
+    def test_heuristic_cache(self):
+        print("Running test_heuristic_cache...")
+        states = list(dict.fromkeys(self.states))[:3]
+        cache = unified_planning.engines.heuristics.HeuristicCache(self.mdp.trpg, 2, probabilistic=True)
+
+        value = cache.get_heuristic(states[0], 0)
+        cache.get_heuristic(states[1], 0)
+        self.assertEqual(cache.get_heuristic(states[0], 0), value, "the cached value is not returned")
+        # the least recently used value is evicted
+        cache.get_heuristic(states[2], 0)
+        cache.get_heuristic(states[0], 0)
+        cache.get_heuristic(states[1], 0)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 4, 2))
+
+        # the time and the lower bounds are part of the key, not the order of the lower bounds
+        end_actions = [a for a in self.mdp.problem.actions if isinstance(a, unified_planning.engines.InstantaneousEndAction)]
+        lower_bounds = {a: 2 + j for j, a in enumerate(end_actions)}
+        cache.get_heuristic(states[1], 1)
+        cache.get_heuristic(states[1], 1, lower_bounds)
+        cache.get_heuristic(states[1], 1, dict(reversed(list(lower_bounds.items()))))
+        self.assertEqual((cache.hits, cache.misses), (3, 6))
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+        # the heuristic of the probabilistic effects is cached only on demand
+        probabilistic = any(a.probabilistic_effects for a in self.mdp.problem.actions)
+        cache = unified_planning.engines.heuristics.HeuristicCache(self.mdp.trpg, 2)
+        self.assertEqual(cache.enabled, not probabilistic)
+
+
+    def test_evaluate_batch(self):
+        print("Running test_evaluate_batch...")
+        end_actions = [a for a in self.mdp.problem.actions if isinstance(a, unified_planning.engines.InstantaneousEndAction)]
+        lower_bounds = {a: 2 + j for j, a in enumerate(end_actions)}
+        # the draws of the probabilistic effects of a single state are in the order of `get_heuristic`
+        for i, state in enumerate(self.states):
+            for current_time, bounds in ((0, None), (4, None), (1, lower_bounds)):
+                np.random.seed(i)
+                expected = self.mdp.trpg.get_heuristic(state, current_time, bounds)
+                np.random.seed(i)
+                value = self.mdp.trpg.evaluate_batch([state], [current_time], [bounds])
+                self.assertEqual([expected], value, f"different batch value for {state}")
+
+        model = unified_planning.domains.Conc(kind='regular', deadline=15, object_amount=1, garbage_amount=0)
+        ground_problem = unified_planning.engines.compilers.Grounder()._compile(model.problem).problem
+        converted_problem = unified_planning.engines.Convert_problem(ground_problem)._converted_problem
+        mdp = unified_planning.engines.MDP(converted_problem, discount_factor=0.95, compact_state=True)
+        random.seed(1)
+        states = []
+        for _ in range(20):
+            state = mdp.initial_state()
+            for _ in range(random.randint(0, 6)):
+                actions = mdp.legal_actions(state)
+                if not actions:
+                    break
+                terminal, state, _ = mdp.step(state, random.choice(actions))
+            states.append(state)
+        times = [random.randint(0, 5) for _ in states]
+        expected = [mdp.trpg.get_heuristic(state, current_time) for state, current_time in zip(states, times)]
+        self.assertEqual(expected, mdp.trpg.evaluate_batch(states, times), "different values of the batch")
+
+        cache = unified_planning.engines.heuristics.HeuristicCache(mdp.trpg, 100)
+        self.assertEqual(expected, cache.evaluate_batch(states, times), "different values of the cached batch")
+        self.assertEqual(expected, cache.evaluate_batch(states, times), "different values of the cached batch")
+        self.assertEqual(cache.hits + cache.misses, 2 * len(states))
+        self.assertEqual(cache.misses, len(set(zip(states, times))))
+
+
+    def test_probabilistic_modes(self):
+        print("Running test_probabilistic_modes...")
+        outcomes = unified_planning.engines.Outcomes({0.7: {'a': True}, 0.295: {'b': True, 'c': False},
+                                                      0.005: {'d': True}})
+        self.assertEqual(outcomes.relaxed('most_likely')[:2], ({'a'}, set()))
+        self.assertEqual(outcomes.relaxed('all', 0.01)[:2], ({'a', 'b'}, {'c'}))
+        self.assertEqual(outcomes.relaxed('all')[:2], ({'a', 'b', 'd'}, {'c'}))
+
+        self.assertFalse(self.mdp.trpg.deterministic, "the sampled heuristic is deterministic")
+        for mode in ('all', 'most_likely'):
+            trpg = unified_planning.engines.heuristics.CompiledTRPG(self.mdp, mode)
+            self.assertTrue(trpg.deterministic, f"the {mode} heuristic is not deterministic")
+            self.assertTrue(unified_planning.engines.heuristics.HeuristicCache(trpg, 10).enabled)
+            values = []
+            for state in self.states:
+                for current_time in (0, 4):
+                    expected = unified_planning.engines.heuristics.TRPG(self.mdp, state, current_time,
+                                                                        mode).get_heuristic()
+                    value = trpg.get_heuristic(state, current_time)
+                    self.assertEqual(expected, value, f"different {mode} heuristic value for {state}")
+                    self.assertEqual(value, trpg.get_heuristic(state, current_time))
+                    values.append(value)
+            # without draws the batch has the values of the single evaluations
+            times = [current_time for _ in self.states for current_time in (0, 4)]
+            states = [state for state in self.states for _ in (0, 4)]
+            self.assertEqual(values, trpg.evaluate_batch(states, times))
+
+        self.assertRaises(UPUsageError, unified_planning.engines.heuristics.CompiledTRPG, self.mdp, 'expected')
+
+
+    def test_summary(self):
+        print("Running test_summary...")
+        end_actions = [a for a in self.mdp.problem.actions if isinstance(a, unified_planning.engines.InstantaneousEndAction)]
+        lower_bounds = {a: 2 + j for j, a in enumerate(end_actions)}
+        trpg = self.mdp.trpg
+        parent = trpg.summary(self.mdp.initial_state())
+        for i, state in enumerate(self.states):
+            # the summary derived from another state is the summary of the state
+            summary = trpg.summary(state, parent)
+            expected = trpg.summary(state)
+            self.assertEqual((summary.unsatisfied, summary.ready), (expected.unsatisfied, expected.ready))
+            for current_time, bounds in ((0, None), (4, None), (1, lower_bounds)):
+                np.random.seed(i)
+                expected = trpg.get_heuristic(state, current_time, bounds)
+                np.random.seed(i)
+                value = trpg.get_heuristic(state, current_time, bounds, summary)
+                self.assertEqual(expected, value, f"different heuristic value from the summary of {state}")
+            parent = summary
+
+
+if __name__ == '__main__':
+    unittest.main()